@@ -1,3 +1,6 @@
+import pytest
+
+
 def pytest_addoption(parser):
     parser.addoption(
         "--test-arg",
@@ -5,3 +8,12 @@ def pytest_addoption(parser):
         default=False,
         help="Used to test custom pytest arguments",
     )
+
+
+@pytest.fixture(autouse=True)
+def bones_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep the on-disk caches used during testing separate from the user's."""
+
+    path = tmp_path_factory.getbasetemp() / "bones-cache"
+    monkeypatch.setenv("NENGO_BONES_CACHE_DIR", str(path))
+    return path
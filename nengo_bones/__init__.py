@@ -2,7 +2,8 @@
 
 __license__ = "Free for non-commercial use; see LICENSE.rst"
 
-from . import config, templates
+import importlib
+
 from .version import copyright as __copyright__
 from .version import version as __version__
 
@@ -31,3 +32,11 @@ all_files = [
     "pkg/py.typed",
     "pkg/version.py",
 ]
+
+
+def __getattr__(name):
+    # these submodules import jinja2 and yaml, so they are only imported when they
+    # are used (so that, e.g., ``bones --help`` does not import them)
+    if name in ("config", "project", "templates"):
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,5 @@
+"""Runs ``bones`` with ``python -m nengo_bones``."""
+
+from nengo_bones.scripts.base import bones
+
+bones(prog_name="bones")
@@ -0,0 +1,178 @@
+"""
+Generates and checks project files from Python.
+
+These functions do the same work as ``bones generate`` and ``bones check``, but
+take the configuration as data and return their results as data, rather than
+printing messages and exiting. Nothing is written to the project unless requested.
+The template environment and formatter can be supplied by the caller, so that
+many projects can be processed by a single process while sharing compiled templates
+and formatter settings.
+
+.. testcode::
+
+   from nengo_bones import api
+
+   config = {
+       "project_name": "Example",
+       "pkg_name": "example",
+       "repo_name": "nengo/example",
+       "contributors_rst": {},
+   }
+   files = api.generate(config, sections=["contributors_rst"])
+   print(files["CONTRIBUTORS.rst"].splitlines()[4])
+
+.. testoutput::
+
+   Example contributors
+"""
+
+import copy
+import os
+from pathlib import Path
+
+from nengo_bones import __version__, all_files, all_sections
+from nengo_bones.project import Project
+from nengo_bones.scripts.check_bones import plan_checks, run_checks
+from nengo_bones.templates import BonesTemplate, write_rendered
+
+
+def _project(config, root, env, formatter):
+    conf_file = None
+    if isinstance(config, (str, os.PathLike)):
+        conf_file, config = config, None
+    if root is None:
+        root = Path.cwd() if conf_file is None else Path(conf_file).parent
+    return Project(conf_file, config=config, root=root, env=env, formatter=formatter)
+
+
+def _section_templates(project, section):
+    # the templates rendered for a config section, with their output names and data
+    # (matching the corresponding `bones generate` commands)
+    config = project.config
+    if section == "ci_scripts":
+        for params in config["ci_scripts"]:
+            params = copy.deepcopy(params)
+            script_name = params.pop("template")
+            output_file = params.pop("output_name", script_name)
+            template = BonesTemplate(
+                f"{script_name}.sh",
+                project.env,
+                root=project.root,
+                formatter=project.formatter,
+            )
+            yield template, f"{output_file}.sh", copy.deepcopy({**config, **params})
+        return
+
+    for filename in all_files:
+        template = BonesTemplate(
+            filename, project.env, root=project.root, formatter=project.formatter
+        )
+        if template.section == section:
+            yield template, None, {
+                "version": __version__,
+                **template.get_render_data(config),
+            }
+
+
+def generate(
+    config, root=None, *, sections=None, output_dir=None, env=None, formatter=None
+):
+    """
+    Render the templated files of a project.
+
+    Unlike ``bones generate``, every file is rendered (whether or not it is up to
+    date), and license notices are not added to existing Python files.
+
+    Parameters
+    ----------
+    config : dict or str or `pathlib.Path`
+        Configuration values (as they would be written in a ``.nengobones.yml``
+        file), or the path of a config file.
+    root : str or `pathlib.Path`, optional
+        Root directory of the project, whose settings are used when formatting
+        Python files (if None, will use the directory containing the config file,
+        or the current directory if ``config`` is a dict).
+    sections : list of str, optional
+        The config sections to render (e.g. ``["setup_cfg", "ci_scripts"]``). If
+        None, all the sections in ``all_sections`` that are in the config are
+        rendered (like ``bones generate``).
+    output_dir : str or `pathlib.Path`, optional
+        If given, the rendered files are written to this directory.
+    env : ``jinja2.Environment``, optional
+        Environment for loading/rendering templates (if None, will use the one
+        returned by `.load_env` for ``root``).
+    formatter : `.Formatter`, optional
+        Formatter applied to rendered Python files (if None, will use the one
+        returned by `.get_formatter` for ``root``).
+
+    Returns
+    -------
+    files : dict
+        Mapping from the path of each rendered file (relative to the output
+        directory, using forward slashes) to its content.
+
+    Raises
+    ------
+    KeyError
+        If one of the ``sections`` is not in the config.
+    """
+
+    project = _project(config, root, env, formatter)
+    if sections is None:
+        sections = [section for section in all_sections if section in project.config]
+
+    files = {}
+    for section in sections:
+        if section not in project.config:
+            raise KeyError(f"No config entry detected for {section}")
+
+        for template, output_name, data in _section_templates(project, section):
+            text = template.render(**data)
+            path = template.output_path("", output_name, **data)
+            files[path.as_posix()] = text
+            if output_dir is not None:
+                write_rendered(Path(output_dir, path), text)
+
+    return files
+
+
+def check(config, root=None, *, verbose=False, jobs=1, env=None, formatter=None):
+    """
+    Check that the generated files of a project are up to date.
+
+    Parameters
+    ----------
+    config : dict or str or `pathlib.Path`
+        Configuration values (as they would be written in a ``.nengobones.yml``
+        file), or the path of a config file.
+    root : str or `pathlib.Path`, optional
+        Directory containing the files to be checked (if None, will use the
+        directory containing the config file, or the current directory if
+        ``config`` is a dict).
+    verbose : bool
+        Include the full diff in the messages of files that are out of date.
+    jobs : int
+        Number of files to check concurrently.
+    env : ``jinja2.Environment``, optional
+        Environment for loading/rendering templates (if None, will use the one
+        returned by `.load_env` for ``root``).
+    formatter : `.Formatter`, optional
+        Formatter applied to rendered Python files (if None, will use the one
+        returned by `.get_formatter` for ``root``).
+
+    Returns
+    -------
+    report : dict
+        Whether all checks ``"passed"``, and the reports for each of the generated
+        ``"files"`` (keyed by filename) and for the check for license
+        ``"notices"`` (None if the project does not add license notices to files).
+        These have the same entries as the report printed by
+        ``bones check --report json``.
+    """
+
+    project = _project(config, root, env, formatter)
+    checks, reports, files_report, notices_report = plan_checks(
+        project, project.root, verbose=verbose
+    )
+    passed = run_checks(checks, reports, jobs=jobs, quiet=True)
+    return {"passed": all(passed), "files": files_report, "notices": notices_report}
@@ -0,0 +1,281 @@
+"""Helpers for the on-disk caches used by NengoBones."""
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+def cache_dir(*subdirs, create=True):
+    """
+    Find the user-level directory in which NengoBones stores cached data.
+
+    The location is taken from the ``NENGO_BONES_CACHE_DIR`` environment variable
+    if it is set, otherwise ``$XDG_CACHE_HOME/nengo-bones`` (defaulting to
+    ``~/.cache/nengo-bones``). It is shared by all projects on the machine, so that
+    cached results can be reused across checkouts.
+
+    Parameters
+    ----------
+    subdirs : str
+        Optional subdirectories (within the cache directory) to return.
+    create : bool
+        Whether to create the directory if it does not exist.
+
+    Returns
+    -------
+    path : `pathlib.Path`
+        The cache directory.
+    """
+
+    root = os.environ.get("NENGO_BONES_CACHE_DIR")
+    if root is None:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME")
+        root = (
+            Path(xdg_cache) if xdg_cache else Path.home() / ".cache"
+        ) / "nengo-bones"
+
+    path = Path(root, *subdirs)
+    if create:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def hash_key(*parts):
+    """
+    Compute a stable hash of some JSON-serializable data.
+
+    Parameters
+    ----------
+    parts : object
+        Data to be hashed. Objects that are not JSON-serializable are converted
+        with ``str``.
+
+    Returns
+    -------
+    key : str
+        Hex digest of the data.
+    """
+
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def load_json(path, default=None):
+    """
+    Load a JSON cache file, returning ``default`` if it is missing or corrupt.
+
+    Parameters
+    ----------
+    path : `pathlib.Path`
+        The cache file.
+    default : object
+        Value returned if the file cannot be loaded.
+    """
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def dump_json(path, data):
+    """
+    Atomically write data to a JSON cache file.
+
+    The file is written to a temporary location and then moved into place, so that
+    concurrent processes never see a partially written file.
+
+    Parameters
+    ----------
+    path : `pathlib.Path`
+        The cache file.
+    data : object
+        JSON-serializable data to store.
+    """
+
+    _atomic_write(path, json.dumps(data).encode("utf-8"))
+
+
+def _atomic_write(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class ContentCache:
+    """
+    A size-limited on-disk store of text, addressed by key.
+
+    Each entry is stored in its own file (named by its key), so that entries can be
+    read and written concurrently by many processes without any locking. When the
+    total size of the entries exceeds ``max_size``, the least recently used entries
+    are removed (the modification time of an entry is updated every time it is
+    read).
+
+    Parameters
+    ----------
+    directory : `pathlib.Path`
+        Directory in which entries are stored.
+    max_size : int
+        Maximum total size (in bytes) of the stored entries.
+    evict_every : int
+        Number of writes between checks of the total size of the cache.
+    """
+
+    def __init__(self, directory, max_size, evict_every=256):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.evict_every = evict_every
+        self._writes = 0
+
+    def _path(self, key):
+        return self.directory / key[:2] / key[2:]
+
+    def get(self, key):
+        """
+        Look up an entry.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry (e.g., the output of `.hash_key`).
+
+        Returns
+        -------
+        text : str or None
+            The stored text, or None if there is no entry for ``key``.
+        """
+
+        path = self._path(key)
+        try:
+            text = path.read_bytes().decode("utf-8")
+            os.utime(path)
+        except (OSError, UnicodeDecodeError):
+            return None
+        return text
+
+    def put(self, key, text):
+        """
+        Store an entry.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry (e.g., the output of `.hash_key`).
+        text : str
+            Text to store.
+        """
+
+        if self.max_size <= 0:
+            return
+
+        try:
+            _atomic_write(self._path(key), text.encode("utf-8"))
+        except OSError:
+            # caching is best-effort; failing to write is not an error
+            return
+
+        # check the size the first time we write, and then periodically
+        if self._writes % self.evict_every == 0:
+            self.evict()
+        self._writes += 1
+
+    def get_json(self, key, default=None):
+        """
+        Look up an entry stored with `.put_json`.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry (e.g., the output of `.hash_key`).
+        default : object
+            Value returned if there is no entry for ``key`` (or it is corrupt).
+
+        Returns
+        -------
+        data : object
+            The stored data.
+        """
+
+        text = self.get(key)
+        if text is None:
+            return default
+        try:
+            return json.loads(text)
+        except ValueError:
+            return default
+
+    def put_json(self, key, data):
+        """
+        Store JSON-serializable data as an entry.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry (e.g., the output of `.hash_key`).
+        data : object
+            JSON-serializable data to store.
+        """
+
+        self.put(key, json.dumps(data))
+
+    def evict(self):
+        """Remove least recently used entries until the cache is below its size."""
+
+        entries = []
+        total = 0
+        for path in self.directory.glob("*/*"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+
+        if total <= self.max_size:
+            return
+
+        # remove entries until we are well below the limit, so that we do not have
+        # to evict again right away
+        target = self.max_size * 0.8
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+@functools.lru_cache(maxsize=None)
+def shared_cache(directory, max_size):
+    """
+    Get a `.ContentCache` shared by everything that uses the same directory.
+
+    Sharing the cache means that the total size of the entries is only checked
+    periodically (see ``ContentCache.evict_every``), rather than every time a new
+    `.ContentCache` is created and written to.
+
+    Parameters
+    ----------
+    directory : `pathlib.Path`
+        Directory in which entries are stored.
+    max_size : int
+        Maximum total size (in bytes) of the stored entries.
+
+    Returns
+    -------
+    cache : `.ContentCache`
+        The (shared) cache.
+    """
+
+    return ContentCache(directory, max_size=max_size)
@@ -1,10 +1,11 @@
 """Handles the processing of nengo-bones configuration settings."""
 
+import copy
 import datetime
+import functools
 from pathlib import Path
 from textwrap import dedent
 
-import black
 import yaml
 
 
@@ -56,7 +57,10 @@ def find_config():
     """
     conf_file = Path.cwd() / ".nengobones.yml"
     if not conf_file.exists():
-        # use black's logic for finding the root of a project
+        # use black's logic for finding the root of a project (imported here
+        # because black is slow to import, and usually not needed)
+        import black  # pylint: disable=import-outside-toplevel
+
         conf_file = black.find_project_root((Path.cwd(),))[0] / ".nengobones.yml"
 
     if not conf_file.exists():
@@ -880,10 +884,60 @@ def load_config(conf_file=None):
         conf_file = find_config()
 
     with open(conf_file, encoding="utf-8") as f:
-        config = yaml.load(f, Loader=yaml.SafeLoader)
+        text = f.read()
+
+    return parse_config(text)
+
+
+def parse_config(text):
+    """
+    Parses config values from the contents of a config file.
+
+    Applies defaults/validation, like `.load_config`.
+
+    Parameters
+    ----------
+    text : str
+        Contents of a config file.
+
+    Returns
+    -------
+    config : dict
+        Dictionary containing configuration values.
+    """
+
+    # the parsed config is cached (which makes a difference in long-running
+    # processes), so we return a copy that callers are free to modify
+    return copy.deepcopy(_parse_config(text, datetime.date.today()))
+
+
+def prepare_config(config):
+    """
+    Applies defaults/validation to config values, like `.load_config`.
+
+    Parameters
+    ----------
+    config : dict
+        Dictionary containing configuration values, as they would be written in a
+        config file. This is not modified.
+
+    Returns
+    -------
+    config : dict
+        Dictionary containing configuration values (with defaults filled in).
+    """
+
+    config = copy.deepcopy(config)
 
     validate_config(config)
 
     fill_defaults(config)
 
     return config
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_config(text, today):
+    # note: `today` is only used as part of the cache key, since the defaults
+    # depend on the current date
+    return prepare_config(yaml.load(text, Loader=yaml.SafeLoader))
@@ -0,0 +1,508 @@
+"""
+Formats Python code in-process with black, docformatter and isort.
+
+Running the formatters through their Python APIs (rather than as external
+processes) avoids paying their startup cost for every file and notebook cell that
+is formatted. The formatters are configured from the project's config files
+(e.g. ``pyproject.toml``), just as they would be when run from the command line
+in the project's root directory.
+
+Formatted output is cached on disk (see `.format_cache`), keyed by the input text,
+the versions of the formatters and the contents of the config files. The cache
+is shared by all checkouts on the machine, and black, docformatter and isort (which
+are slow to import) are only imported if something is not found in the cache.
+"""
+
+import contextlib
+import functools
+import importlib
+import importlib.metadata
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from nengo_bones import cache
+from nengo_bones.version import version as bones_version
+
+# files that the formatters may read their settings from
+config_files = ("pyproject.toml", "setup.cfg", "tox.ini", ".isort.cfg")
+
+# modules generated by NengoBones that are never imported, which are ignored when
+# listing the modules in a project (so that generating them does not change the
+# settings of the formatters)
+generated_modules = ("docs", "setup.py")
+
+# directories that commonly appear in the project root (e.g. as build outputs) but do
+# not contain first-party modules
+non_module_dirs = ("build", "dist")
+
+# packages whose versions affect the formatted output
+formatter_packages = ("black", "docformatter", "isort")
+
+# default maximum size of the formatting cache (in megabytes)
+default_cache_size = 64
+
+# IPython magic functions (starting with % or !) in notebook cells
+_magic_re = re.compile(r"^(\s*)([%!][A-Za-z]+.*)$", flags=re.MULTILINE)
+
+# timings being recorded by each thread (see `record_timings`)
+_recording = threading.local()
+
+
+def _timed(func):
+    # record the time spent in a formatter (if timings are being recorded)
+    @functools.wraps(func)
+    def timed_func(*args, **kwargs):
+        timings = getattr(_recording, "timings", None)
+        if timings is None:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[func.__name__] = (
+                timings.get(func.__name__, 0.0) + time.perf_counter() - start
+            )
+
+    return timed_func
+
+
+@contextlib.contextmanager
+def record_timings():
+    """
+    Record the time spent running each formatter.
+
+    Only formatters run in the current thread while the context is active are
+    timed (formatted output that is found in the cache does not count).
+
+    Yields
+    ------
+    timings : dict
+        Mapping from formatter name (``"black"``, ``"docformatter"`` or
+        ``"isort"``) to the total time spent running it (in seconds). This is
+        filled in as formatters are run.
+    """
+
+    previous = getattr(_recording, "timings", None)
+    _recording.timings = {}
+    try:
+        yield _recording.timings
+    finally:
+        _recording.timings = previous
+
+
+class Formatter:
+    """
+    Formats Python code according to the settings of a project.
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory of the project. Formatter settings are read from the config
+        files in this directory.
+    cache : `.ContentCache`, optional
+        Cache for formatted output (if None, output is not cached).
+
+    Attributes
+    ----------
+    root : `pathlib.Path`
+        Root directory of the project.
+    cache : `.ContentCache` or None
+        Cache for formatted output.
+    """
+
+    def __init__(self, root, cache=None):  # pylint: disable=redefined-outer-name
+        self.root = Path(root).resolve()
+        self.cache = cache
+        self._settings_key = None
+        self._black_mode = None
+        self._isort_config = None
+        self._docformatter_args = None
+
+    @property
+    def settings_key(self):
+        """
+        str: Hash of everything (other than the input) that affects the output.
+
+        This includes the versions of the formatters and the contents of the
+        config files. Isort also uses the names of the modules in the project to
+        determine which imports are first-party, so those are included as well
+        (only names that can be imported are included, so e.g. hidden directories,
+        ``*.egg-info`` directories and ``non_module_dirs`` are ignored).
+
+        Comments in the config files (such as the generation stamps added by
+        `.add_stamp`) are ignored, as they do not affect the formatters, and the
+        modules generated by NengoBones (``generated_modules``) are not included,
+        so that generating files does not change the settings used to format
+        them.
+        """
+        if self._settings_key is None:
+            configs = [_find_pyproject(self.root)]
+            configs += [self.root / filename for filename in config_files]
+            contents = [_strip_comments(_read_text(config)) for config in configs]
+
+            modules = [_list_modules(self.root), _list_modules(self.root / "src")]
+
+            self._settings_key = cache.hash_key(_versions(), contents, modules)
+        return self._settings_key
+
+    def _cached(self, kind, func, source):
+        if self.cache is None:
+            return func(source)
+
+        key = cache.hash_key(kind, self.settings_key, source)
+        formatted = self.cache.get(key)
+        if formatted is None:
+            formatted = func(source)
+            self.cache.put(key, formatted)
+        return formatted
+
+    @property
+    def black_mode(self):
+        """``black.Mode``: Black settings, read from ``pyproject.toml``."""
+        if self._black_mode is None:
+            black = _import("black")
+
+            pyproject = _find_pyproject(self.root)
+            config = {} if pyproject is None else black.parse_pyproject_toml(pyproject)
+
+            target_versions = set()
+            for version in config.get("target_version", []):
+                if version.upper() in black.TargetVersion.__members__:
+                    target_versions.add(black.TargetVersion[version.upper()])
+
+            self._black_mode = black.Mode(
+                target_versions=target_versions,
+                line_length=int(config.get("line_length", black.DEFAULT_LINE_LENGTH)),
+                string_normalization=not config.get("skip_string_normalization", False),
+                magic_trailing_comma=not config.get("skip_magic_trailing_comma", False),
+                preview=config.get("preview", False),
+            )
+        return self._black_mode
+
+    @property
+    def isort_config(self):
+        """``isort.Config``: Isort settings, read from the project config files."""
+        if self._isort_config is None:
+            isort = _import("isort")
+
+            self._isort_config = isort.Config(settings_path=str(self.root))
+        return self._isort_config
+
+    @property
+    def docformatter_args(self):
+        """``argparse.Namespace``: Docformatter settings."""
+        if self._docformatter_args is None:
+            docformatter = _import("docformatter")
+
+            # docformatter uses the first of these files that exists (note that we
+            # always pass `--config`, otherwise it looks in the current directory)
+            config_file = self.root / "pyproject.toml"
+            for filename in docformatter.Configurator.configuration_file_lst:
+                if (self.root / filename).is_file():
+                    config_file = self.root / filename
+                    break
+            configurator = docformatter.Configurator(
+                ["docformatter", "--config", str(config_file), "-"]
+            )
+            configurator.do_parse_arguments()
+            self._docformatter_args = configurator.args
+        return self._docformatter_args
+
+    @_timed
+    def black(self, source):
+        """
+        Format code with black.
+
+        Parameters
+        ----------
+        source : str
+            Code to be formatted.
+
+        Returns
+        -------
+        source : str
+            Formatted code.
+        """
+        black = _import("black")
+
+        try:
+            # note: like the black command line, we check that the formatted code is
+            # equivalent to the input (``fast=False``)
+            return black.format_file_contents(source, fast=False, mode=self.black_mode)
+        except black.NothingChanged:
+            return source
+
+    @_timed
+    def docformatter(self, source):
+        """
+        Format docstrings with docformatter.
+
+        Parameters
+        ----------
+        source : str
+            Code to be formatted.
+
+        Returns
+        -------
+        source : str
+            Formatted code.
+        """
+        docformatter = _import("docformatter")
+
+        args = self.docformatter_args
+        return docformatter.format_code(
+            source,
+            summary_wrap_length=args.wrap_summaries,
+            description_wrap_length=args.wrap_descriptions,
+            force_wrap=args.force_wrap,
+            tab_width=args.tab_width,
+            pre_summary_newline=args.pre_summary_newline,
+            pre_summary_space=args.pre_summary_space,
+            make_summary_multi_line=args.make_summary_multi_line,
+            close_quotes_on_newline=args.close_quotes_on_newline,
+            post_description_blank=args.post_description_blank,
+            line_range=args.line_range,
+            strict=not args.non_strict,
+        )
+
+    @_timed
+    def isort(self, source):
+        """
+        Sort imports with isort.
+
+        Parameters
+        ----------
+        source : str
+            Code to be formatted.
+
+        Returns
+        -------
+        source : str
+            Formatted code.
+        """
+        isort = _import("isort")
+
+        return isort.code(source, config=self.isort_config)
+
+    def format_file(self, source):
+        """
+        Apply all formatters to the contents of a Python file.
+
+        Output is cached, if this formatter has a cache.
+
+        Parameters
+        ----------
+        source : str
+            Code to be formatted.
+
+        Returns
+        -------
+        source : str
+            Formatted code.
+        """
+        return self._cached(
+            "file",
+            lambda source: self.isort(self.docformatter(self.black(source))),
+            source,
+        )
+
+    def format_cell(self, source):
+        """
+        Apply black formatting to a notebook cell.
+
+        IPython magic functions (lines starting with ``%`` or ``!``) are
+        temporarily replaced with comments, since black cannot parse them. Cells
+        that black cannot parse are returned unchanged (syntax errors will be
+        reported by the static checkers). Output is cached, if this formatter has a
+        cache.
+
+        Parameters
+        ----------
+        source : str
+            Content of cell.
+
+        Returns
+        -------
+        source : str
+            Formatted cell contents.
+        """
+
+        return self._cached("cell", self._format_cell, source)
+
+    def _format_cell(self, source):
+        black = _import("black")
+
+        # go through matches backwards so that subbing doesn't change inds
+        magic_pairs = []
+        matches = list(_magic_re.finditer(source))
+        assert len(matches) < 10000, "Too many magic matches"
+
+        masked = source
+        for i, match in enumerate(matches[::-1]):
+            space, magic = match.groups("")
+
+            replacement = f"# MaGiC{i:04d}"
+            magic_pairs.append((magic, replacement))
+            masked = (
+                masked[: match.start(1)] + space + replacement + masked[match.end(2) :]
+            )
+
+        try:
+            masked = self.black(masked)
+        except black.InvalidInput:
+            return source
+
+        # put magic functions back
+        for magic, replacement in magic_pairs:
+            assert replacement in masked, "Magic identifier disappeared"
+            masked = masked.replace(replacement, magic)
+
+        return masked
+
+
+_import_lock = threading.Lock()
+
+
+def _import(name):
+    # importing the formatters from several threads at once can give some threads
+    # a partially initialized module, so we make sure only one thread imports them
+    with _import_lock:
+        return importlib.import_module(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _versions():
+    versions = [bones_version]
+    for package in formatter_packages:
+        try:
+            versions.append(importlib.metadata.version(package))
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def _list_modules(path):
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return None
+
+    modules = []
+    for entry in entries:
+        if entry.name in generated_modules:
+            continue
+        if entry.name.endswith(".py") and entry.is_file():
+            name = entry.name[: -len(".py")]
+        elif entry.is_dir() and entry.name not in non_module_dirs:
+            name = entry.name
+        else:
+            continue
+
+        # names that are not identifiers (e.g. hidden or ``*.egg-info`` directories)
+        # cannot be imported, so they never affect isort
+        if name.isidentifier():
+            modules.append(entry.name)
+    return sorted(modules)
+
+
+def _strip_comments(text):
+    if text is None:
+        return None
+    return "".join(
+        line
+        for line in text.splitlines(keepends=True)
+        if not line.lstrip().startswith(("#", ";"))
+    )
+
+
+def _read_text(path):
+    if path is None:
+        return None
+    try:
+        return Path(path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _find_pyproject(root):
+    # same search as black (which looks for the project root in this directory and
+    # its parents), but without black's caching, so that changes are picked up
+    for directory in (root, *root.parents):
+        if (directory / ".git").exists() or (directory / ".hg").is_dir():
+            break
+        if (directory / "pyproject.toml").is_file():
+            break
+    else:
+        return None
+
+    pyproject = directory / "pyproject.toml"
+    return str(pyproject) if pyproject.is_file() else None
+
+
+def _config_state(root):
+    state = []
+    for filename in config_files:
+        try:
+            st = os.stat(root / filename)
+        except OSError:
+            state.append(None)
+        else:
+            state.append((st.st_mtime_ns, st.st_size))
+    # the modules are also part of the settings (see `Formatter.settings_key`)
+    for path in (root, root / "src"):
+        modules = _list_modules(path)
+        state.append(None if modules is None else tuple(modules))
+    return tuple(state)
+
+
+def format_cache():
+    """
+    Get the cache for formatted output.
+
+    The cache is stored in the ``format`` subdirectory of `.cache_dir`. Its maximum
+    size (in megabytes) is set by the ``NENGO_BONES_FORMAT_CACHE_SIZE`` environment
+    variable (defaulting to ``default_cache_size``); setting it to 0 disables the
+    cache.
+
+    Returns
+    -------
+    cache : `.ContentCache`
+        The (shared) cache.
+    """
+
+    max_size = int(
+        os.environ.get("NENGO_BONES_FORMAT_CACHE_SIZE", str(default_cache_size))
+    )
+    return cache.shared_cache(cache.cache_dir("format"), max_size * 2**20)
+
+
+def get_formatter(root):
+    """
+    Get a (shared) formatter for a project.
+
+    Formatters are cached, so that settings are only read once for each project
+    (or again, if the project's config files change). Their output is cached in
+    `.format_cache`.
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory of the project.
+
+    Returns
+    -------
+    formatter : `.Formatter`
+        Formatter using the project's settings.
+    """
+    root = Path(root).resolve()
+    return _cached_formatter(root, _config_state(root), format_cache())
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_formatter(root, config_state, content_cache):
+    # note: `config_state` is only used as part of the cache key
+    return Formatter(root, cache=content_cache)
@@ -0,0 +1,179 @@
+"""
+Queries the state of a git repository.
+
+This is used to limit work to the files that have changed (e.g., in a pull
+request), rather than processing every file in a project.
+"""
+
+import subprocess
+from pathlib import Path
+
+
+def run_git(*args, cwd=None):
+    """
+    Run a git command and return its output.
+
+    Parameters
+    ----------
+    args : list of str
+        Arguments passed to ``git``.
+    cwd : `pathlib.Path`, optional
+        Directory in which to run the command (defaults to the current directory).
+
+    Returns
+    -------
+    output : str
+        The standard output of the command.
+
+    Raises
+    ------
+    RuntimeError
+        If git is not installed, or the command fails.
+    """
+
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            check=False,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            cwd=cwd,
+        )
+    except OSError as e:
+        raise RuntimeError(f"Could not run git: {e}") from e
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"'git {' '.join(args)}' failed with the following error:\n"
+            f"{result.stderr.strip()}"
+        )
+    return result.stdout
+
+
+def repo_root(cwd=None):
+    """
+    Find the root directory of the git repository containing a directory.
+
+    Parameters
+    ----------
+    cwd : `pathlib.Path`, optional
+        A directory within the repository (defaults to the current directory).
+
+    Returns
+    -------
+    root : `pathlib.Path`
+        Absolute path of the root of the repository.
+    """
+
+    return Path(run_git("rev-parse", "--show-toplevel", cwd=cwd).strip()).resolve()
+
+
+def merge_base(ref, cwd=None):
+    """
+    Find the commit at which the current branch diverged from ``ref``.
+
+    Parameters
+    ----------
+    ref : str
+        A git reference (e.g., a branch name or commit hash).
+    cwd : `pathlib.Path`, optional
+        A directory within the repository (defaults to the current directory).
+
+    Returns
+    -------
+    commit : str
+        Hash of the merge base of ``ref`` and ``HEAD``.
+    """
+
+    return run_git("merge-base", ref, "HEAD", cwd=cwd).strip()
+
+
+def changed_files(ref, cwd=None):
+    """
+    Find the files that have changed since the merge base of ``ref`` and ``HEAD``.
+
+    This includes changes that have been committed, staged or made in the working
+    tree, as well as untracked files (that are not ignored by git).
+
+    Parameters
+    ----------
+    ref : str
+        A git reference (e.g., a branch name or commit hash).
+    cwd : `pathlib.Path`, optional
+        A directory within the repository (defaults to the current directory).
+
+    Returns
+    -------
+    paths : set of `pathlib.Path`
+        Absolute paths of the changed files (including deleted files).
+    """
+
+    root = repo_root(cwd)
+    base = merge_base(ref, cwd=root)
+    diff = run_git("diff", "--name-only", "--no-renames", "-z", base, cwd=root)
+    untracked = run_git("ls-files", "--others", "--exclude-standard", "-z", cwd=root)
+    return {root / name for name in f"{diff}\0{untracked}".split("\0") if len(name) > 0}
+
+
+def show_file(ref, path, cwd=None):
+    """
+    Read the contents of a file at the merge base of ``ref`` and ``HEAD``.
+
+    Parameters
+    ----------
+    ref : str
+        A git reference (e.g., a branch name or commit hash).
+    path : `pathlib.Path`
+        Path of the file.
+    cwd : `pathlib.Path`, optional
+        A directory within the repository (defaults to the current directory).
+
+    Returns
+    -------
+    contents : str or None
+        The contents of the file, or None if the file did not exist.
+    """
+
+    root = repo_root(cwd)
+    base = merge_base(ref, cwd=root)
+    name = Path(path).resolve().relative_to(root).as_posix()
+    try:
+        return run_git("show", f"{base}:{name}", cwd=root)
+    except RuntimeError:
+        return None
+
+
+def list_files(*pathspec, cwd=None):
+    """
+    List the files in a repository that are tracked or not ignored by git.
+
+    Parameters
+    ----------
+    pathspec : list of str
+        Only list files matching these patterns (e.g. ``"*.py"``), relative to
+        ``cwd``. If empty, all files are listed.
+    cwd : `pathlib.Path`, optional
+        A directory within the repository (defaults to the current directory).
+        Only files within this directory are listed.
+
+    Returns
+    -------
+    paths : list of `pathlib.Path`
+        Absolute paths of the files, sorted. Files that are tracked but have
+        been deleted from the working tree are not included.
+    """
+
+    cwd = Path.cwd() if cwd is None else Path(cwd)
+    output = run_git(
+        "ls-files",
+        "--cached",
+        "--others",
+        "--exclude-standard",
+        "-z",
+        "--",
+        *pathspec,
+        cwd=cwd,
+    )
+    root = cwd.resolve()
+    paths = {root / name for name in output.split("\0") if len(name) > 0}
+    return sorted(path for path in paths if path.is_file())
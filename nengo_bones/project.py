@@ -0,0 +1,183 @@
+"""Shared state for a project being processed by NengoBones."""
+
+import fnmatch
+import os
+from pathlib import Path
+
+from nengo_bones import git
+from nengo_bones.config import find_config, load_config, prepare_config
+from nengo_bones.templates import load_env
+
+# directories that are skipped when searching for files outside of a git
+# repository (these mirror the directories pruned in the generated MANIFEST.in, and
+# skipped by pytest and codespell in the generated setup.cfg)
+pruned_dirs = (
+    ".*",
+    "*.egg",
+    "*.egg-info",
+    "_build",
+    "bones-scripts",
+    "build",
+    "dist",
+    "node_modules",
+)
+
+
+class Project:
+    """
+    A project configured with a ``.nengobones.yml`` file.
+
+    This resolves the location of the project once, and loads its configuration
+    and template environment on first use, so that they can be shared by
+    everything that needs them during a single invocation (rather than, e.g.,
+    searching the filesystem for the project root every time an external tool
+    is run).
+
+    Parameters
+    ----------
+    conf_file : str or `pathlib.Path`, optional
+        Filepath for config file (if None, will use the default returned by
+        `.find_config`, unless ``config`` is given).
+    config : dict, optional
+        Configuration values, as they would be written in a config file (see
+        `.prepare_config`). If given, these are used instead of loading
+        ``conf_file``.
+    root : str or `pathlib.Path`, optional
+        Root directory of the project (if None, will be determined as described
+        in `.Project.root`).
+    env : ``jinja2.Environment``, optional
+        Environment for loading/rendering templates (if None, will use the one
+        returned by `.load_env` for ``root``, or for the current directory if
+        ``root`` is not given).
+    formatter : `.Formatter`, optional
+        Formatter applied to rendered Python files (if None, will use the one
+        returned by `.get_formatter` at the time each file is rendered).
+
+    Attributes
+    ----------
+    conf_file : `pathlib.Path` or None
+        Absolute path of the config file (None if ``config`` was given without a
+        ``conf_file``).
+    formatter : `.Formatter` or None
+        Formatter applied to rendered Python files.
+    """
+
+    def __init__(
+        self, conf_file=None, *, config=None, root=None, env=None, formatter=None
+    ):
+        self._root = None if root is None else Path(root).resolve()
+        self._templates_root = self._root
+        if conf_file is None and config is None:
+            conf_file = find_config()
+            if self._root is None:
+                self._root = conf_file.parent
+        elif conf_file is None and self._root is None:
+            self._root = Path.cwd()
+        self.conf_file = None if conf_file is None else Path(conf_file).resolve()
+        self._config = None if config is None else prepare_config(config)
+        self._env = env
+        self.formatter = formatter
+
+    @property
+    def root(self):
+        """
+        `pathlib.Path`: Root directory of the project.
+
+        This is the directory containing the default config file returned by
+        `.find_config` (falling back to the directory containing ``conf_file`` if
+        there is no default config file), unless it was given when creating the
+        project. If ``config`` was given without a ``conf_file`` (or ``root``), this
+        is the current directory. External tools (such as black) are run from this
+        directory, so that they pick up the project's settings.
+        """
+        if self._root is None:
+            try:
+                self._root = find_config().parent
+            except RuntimeError:
+                self._root = self.conf_file.parent
+        return self._root
+
+    @property
+    def config(self):
+        """dict: Configuration values (loaded from ``conf_file``, if not given)."""
+        if self._config is None:
+            self._config = load_config(self.conf_file)
+        return self._config
+
+    @property
+    def env(self):
+        """``jinja2.Environment``: Environment for loading/rendering templates."""
+        if self._env is None:
+            self._env = load_env(self._templates_root)
+        return self._env
+
+
+def find_files(root, pattern):
+    """
+    Find the files in a directory whose names match a pattern.
+
+    If ``root`` is in a git repository, this lists the files that are tracked by
+    git, or are untracked but not ignored. Otherwise, it searches ``root``,
+    skipping the directories matching ``pruned_dirs`` and virtual environments.
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory to search within.
+    pattern : str
+        Pattern matched against the name of each file (e.g. ``"*.py"``).
+
+    Returns
+    -------
+    paths : list of `pathlib.Path`
+        Paths of the matching files.
+    """
+
+    try:
+        paths = git.list_files(pattern, f"*/{pattern}", cwd=root)
+    except RuntimeError:
+        pass
+    else:
+        return [path for path in paths if fnmatch.fnmatch(path.name, pattern)]
+
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if not any(fnmatch.fnmatch(name, pruned) for pruned in pruned_dirs)
+            and not os.path.exists(os.path.join(dirpath, name, "pyvenv.cfg"))
+        )
+        paths.extend(
+            Path(dirpath, name)
+            for name in sorted(filenames)
+            if fnmatch.fnmatch(name, pattern)
+        )
+    return paths
+
+
+def find_projects(root=None):
+    """
+    Find all the projects within a directory.
+
+    Projects are found by searching for ``.nengobones.yml`` files (see
+    `.find_files`). The root directory of each project is the directory containing
+    its config file, and its templates are loaded from the ``.templates`` directory
+    there.
+
+    Parameters
+    ----------
+    root : `pathlib.Path`, optional
+        Directory to search within (defaults to the current directory).
+
+    Returns
+    -------
+    projects : list of `.Project`
+        The projects, sorted by the path of their config files.
+    """
+
+    root = Path.cwd() if root is None else Path(root)
+    return [
+        Project(conf_file, root=conf_file.parent)
+        for conf_file in sorted(find_files(root, ".nengobones.yml"))
+    ]
@@ -1,8 +1,132 @@
 """Base command group that all scripts should import and use."""
 
+import importlib
+import sys
+
 import click
 
 
-@click.group()
+class LazyGroup(click.Group):
+    """
+    A command group that imports its subcommands only when they are needed.
+
+    Subcommands are registered by import path rather than by object, so that
+    running one command does not pay the import cost of all the others. Their
+    short help can be registered along with the import path, so that listing the
+    commands (e.g. in ``--help``) does not import them either.
+
+    Parameters
+    ----------
+    lazy_commands : dict
+        Mapping from command name to a ``"module.path:attribute"`` string
+        identifying the `click.Command` that implements it, or to a
+        ``("module.path:attribute", short_help)`` tuple.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = {}
+        self.lazy_short_help = {}
+        for name, target in ({} if lazy_commands is None else lazy_commands).items():
+            if isinstance(target, tuple):
+                target, self.lazy_short_help[name] = target
+            self.lazy_commands[name] = target
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            self.add_command(self._load_command(cmd_name), name=cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        # same as `click.Group.format_commands`, but using the registered short help
+        # for commands that have not been loaded
+        commands = []
+        for name in self.list_commands(ctx):
+            if name not in self.commands and name in self.lazy_short_help:
+                commands.append((name, None))
+                continue
+            cmd = self.get_command(ctx, name)
+            if cmd is not None and not cmd.hidden:
+                commands.append((name, cmd))
+
+        if len(commands) > 0:
+            limit = formatter.width - 6 - max(len(name) for name, _ in commands)
+            rows = []
+            for name, cmd in commands:
+                if cmd is None:
+                    # a stub command, so that the help is shortened in the same way
+                    # as for a loaded command
+                    cmd = click.Command(name, help=self.lazy_short_help[name])
+                rows.append((name, cmd.get_short_help_str(limit)))
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+    def _load_command(self, cmd_name):
+        module_name, attr = self.lazy_commands[cmd_name].split(":")
+        cmd = getattr(importlib.import_module(module_name), attr)
+        if not isinstance(cmd, click.Command):
+            raise TypeError(
+                f"Lazy command '{cmd_name}' resolved to {cmd!r}, which is not a "
+                "click command"
+            )
+        return cmd
+
+
+class BonesGroup(LazyGroup):
+    """
+    The top-level ``bones`` command group.
+
+    When run from the command line, commands are sent to the ``bones server`` (if
+    one is running) instead of being executed in the current process.
+    """
+
+    def main(self, args=None, **kwargs):  # pylint: disable=arguments-differ
+        if args is None:
+            # pylint: disable=import-outside-toplevel
+            from nengo_bones.scripts import server
+
+            exit_code = server.forward(sys.argv[1:])
+            if exit_code is not None:
+                sys.exit(exit_code)
+
+        return super().main(args, **kwargs)
+
+
+@click.group(
+    cls=BonesGroup,
+    lazy_commands={
+        "bench-startup": (
+            "nengo_bones.scripts.bench_startup:main",
+            "Measure the startup time of all ``bones`` commands.",
+        ),
+        "check": (
+            "nengo_bones.scripts.check_bones:main",
+            "Validates auto-generated project files.",
+        ),
+        "check-deploy": (
+            "nengo_bones.scripts.check_deploy:main",
+            "Validates that the project is ready to be deployed.",
+        ),
+        "format-notebook": (
+            "nengo_bones.scripts.format_notebook:main",
+            "Apply standardized formatting to Jupyter notebooks.",
+        ),
+        "generate": (
+            "nengo_bones.scripts.generate_bones:main",
+            "Loads config file and sets up template environment.",
+        ),
+        "pr-number": (
+            "nengo_bones.scripts.pr_number:main",
+            "Get the next available PR number for a repository.",
+        ),
+        "server": (
+            "nengo_bones.scripts.server:main",
+            "Run ``bones`` commands in a persistent server process.",
+        ),
+    },
+)
 def bones():
     """See below for all commands provided by `bones`."""
@@ -0,0 +1,433 @@
+"""Measures the startup time of all ``bones`` commands."""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+
+_BONES_CODE = "from nengo_bones.scripts.base import bones; bones()"
+
+
+def parse_importtime(output):
+    """
+    Parse the output of ``python -X importtime``.
+
+    Parameters
+    ----------
+    output : str
+        The stderr output of a Python process run with ``-X importtime``.
+
+    Returns
+    -------
+    imports : list of tuple
+        The ``(module, self_us, cumulative_us)`` of each imported module.
+    """
+
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            # header line
+            continue
+        imports.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return imports
+
+
+def package_breakdown(imports):
+    """
+    Sum the import time of each top-level package.
+
+    Parameters
+    ----------
+    imports : list of tuple
+        Output of `.parse_importtime`.
+
+    Returns
+    -------
+    breakdown : dict
+        Mapping from top-level package name to the total time (in microseconds)
+        spent importing the modules in that package.
+    """
+
+    breakdown = {}
+    for module, self_us, _ in imports:
+        package = module.split(".")[0]
+        breakdown[package] = breakdown.get(package, 0) + self_us
+    return dict(sorted(breakdown.items(), key=lambda x: x[1], reverse=True))
+
+
+def measure(args, repeat=5, cwd=None):
+    """
+    Measure the time taken to run a Python process.
+
+    Parameters
+    ----------
+    args : list of str
+        Arguments passed to the Python interpreter (after ``-X importtime``).
+    repeat : int
+        Number of times to run the process (the median run is reported).
+    cwd : str, optional
+        Directory in which to run the process.
+
+    Returns
+    -------
+    result : dict
+        Contains the wall-clock time (``"wall"``, in seconds), the total import
+        time (``"imports"``, in microseconds), the per-package import time
+        (``"packages"``) and the import time of each module (``"modules"``, in the
+        format returned by `.parse_importtime`) of the median run.
+    """
+
+    # make sure we are timing the command itself, not the bones server
+    env = {**os.environ, "NENGO_BONES_NO_SERVER": "1"}
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+            env=env,
+            cwd=cwd,
+            check=False,
+        )
+        wall = time.perf_counter() - start
+        if proc.returncode != 0:
+            raise click.ClickException(
+                f"Command {args} failed with exit code {proc.returncode}:\n"
+                + "\n".join(
+                    line
+                    for line in proc.stderr.splitlines()
+                    if not line.startswith("import time:")
+                )
+            )
+        runs.append((wall, proc.stderr))
+
+    # the median is less sensitive to noise than the fastest run (which depends on
+    # how lucky we were with the state of the machine)
+    wall, output = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    imports = parse_importtime(output)
+    return {
+        "wall": wall,
+        "imports": sum(self_us for _, self_us, _ in imports),
+        "packages": package_breakdown(imports),
+        "modules": imports,
+    }
+
+
+def startup_cases(bones, tmp_dir):
+    """
+    Determine the commands whose startup time will be measured.
+
+    This includes ``--help`` for every ``bones`` command (so new commands are
+    automatically included), and a ``bones check`` on an empty project.
+
+    Parameters
+    ----------
+    bones : `click.Group`
+        The ``bones`` command group.
+    tmp_dir : `pathlib.Path`
+        Directory in which to create the empty project.
+
+    Returns
+    -------
+    cases : dict
+        Mapping from case name to ``bones`` command line arguments.
+    """
+
+    conf_file = tmp_dir / ".nengobones.yml"
+    conf_file.write_text(
+        "project_name: Startup\npkg_name: startup\nrepo_name: startup/startup\n",
+        encoding="utf-8",
+    )
+
+    cases = {"--help": ["--help"]}
+    for name in bones.list_commands(None):
+        cases[f"{name} --help"] = [name, "--help"]
+    cases["check (empty project)"] = [
+        "check",
+        "--root-dir",
+        str(tmp_dir),
+        "--conf-file",
+        str(conf_file),
+    ]
+    return cases
+
+
+def compare(results, baseline, threshold=1.5, slack=0.05):
+    """
+    Find cases whose startup time has regressed relative to a baseline.
+
+    Times are compared relative to the startup time of a bare Python interpreter
+    (which is stored in the results under ``"python"``), so that results are
+    comparable across machines.
+
+    Parameters
+    ----------
+    results : dict
+        Mapping from case name to the output of `.measure`.
+    baseline : dict
+        Previously saved results.
+    threshold : float
+        Maximum allowed ratio between the new and baseline (relative) times.
+    slack : float
+        Additional allowed time (relative to the bare interpreter), so that
+        noise in very short times does not cause failures.
+
+    Returns
+    -------
+    failures : list of str
+        Names of cases that exceeded the threshold.
+    """
+
+    failures = []
+    for name, result in results.items():
+        if name == "python" or name not in baseline:
+            continue
+        relative = result["wall"] / results["python"]["wall"]
+        base_relative = baseline[name]["wall"] / baseline["python"]["wall"]
+        if relative > base_relative * threshold + slack:
+            failures.append(name)
+    return failures
+
+
+def forbidden_imports(results, modules):
+    """
+    Find ``--help`` cases that import any of the given modules.
+
+    Showing help should not need any of the expensive dependencies of a command,
+    so unlike startup times (see `.compare`), this check does not depend on the
+    machine running it.
+
+    Parameters
+    ----------
+    results : dict
+        Mapping from case name to the output of `.measure`.
+    modules : list of str
+        Names of the modules (or packages) that must not be imported.
+
+    Returns
+    -------
+    failures : dict
+        Mapping from the name of each failing case to the forbidden modules it
+        imported.
+    """
+
+    failures = {}
+    for name, result in results.items():
+        if not name.endswith("--help"):
+            continue
+        imported = {module for module, _, _ in result["modules"]}
+        found = [
+            module
+            for module in modules
+            if any(mod == module or mod.startswith(f"{module}.") for mod in imported)
+        ]
+        if len(found) > 0:
+            failures[name] = found
+    return failures
+
+
+def baseline_results(results):
+    """
+    Reduce results to what is stored in a baseline.
+
+    Only the wall-clock times are compared (see `.compare`), and import breakdowns
+    depend on the machine and installation, so they are not stored.
+
+    Parameters
+    ----------
+    results : dict
+        Mapping from case name to the output of `.measure`.
+
+    Returns
+    -------
+    baseline : dict
+        Mapping from case name to the wall-clock time of that case (``"wall"``).
+    """
+
+    return {name: {"wall": result["wall"]} for name, result in results.items()}
+
+
+def _report_regression(result, base_result, top):
+    packages = result["packages"]
+    if "packages" not in base_result:
+        # baselines only store times, so we show where the time is spent now
+        for pkg, us in list(packages.items())[:top]:
+            click.echo(f"    {pkg}: {us / 1000:.1f} ms")
+        return
+
+    base_packages = base_result["packages"]
+    new = [pkg for pkg in packages if pkg not in base_packages]
+    if new:
+        click.echo(f"    new imports: {', '.join(new)}")
+
+    growth = sorted(
+        ((packages[pkg] - base_packages.get(pkg, 0), pkg) for pkg in packages),
+        reverse=True,
+    )
+    for diff, pkg in growth[:top]:
+        if diff > 0:
+            click.echo(f"    {pkg}: +{diff / 1000:.1f} ms")
+
+
+@click.command(name="bench-startup")
+@click.option(
+    "--baseline",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="JSON file containing baseline results to compare against.",
+)
+@click.option(
+    "--update", is_flag=True, help="Save the results as the new baseline and exit."
+)
+@click.option(
+    "--threshold",
+    default=1.5,
+    show_default=True,
+    help="Fail if a command is this many times slower than the baseline.",
+)
+@click.option(
+    "--slack",
+    default=0.05,
+    show_default=True,
+    help="Additional allowed time, relative to the startup time of Python.",
+)
+@click.option(
+    "--report-only",
+    is_flag=True,
+    help="Report regressions without failing.",
+)
+@click.option(
+    "--forbid-import",
+    "forbid_imports",
+    multiple=True,
+    help="Fail if any ``--help`` command imports this module (can be given "
+    "multiple times).",
+)
+@click.option(
+    "--repeat",
+    default=5,
+    show_default=True,
+    help="Number of times to run each command (the median run is used).",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the full results (including per-package and per-module import "
+    "breakdowns) to this file.",
+)
+@click.option(
+    "--top",
+    default=5,
+    show_default=True,
+    help="Number of slowest packages to show for each command.",
+)
+@click.pass_context
+def main(  # noqa: C901
+    ctx,
+    baseline,
+    update,
+    threshold,
+    slack,
+    report_only,
+    forbid_imports,
+    repeat,
+    output,
+    top,
+):
+    """
+    Measure the startup time of all ``bones`` commands.
+
+    Each command is run with ``python -X importtime``, recording the wall-clock
+    time and the time spent importing each package. If a ``--baseline`` file is
+    given, times (relative to the startup time of a bare Python interpreter) are
+    compared to the baseline, and the command fails if any of them exceed the
+    ``--threshold`` (plus ``--slack``). With ``--report-only``, regressions are
+    reported without failing, which is useful on machines whose timings are noisy
+    (such as shared CI runners). Each command is run ``--repeat`` times, and the
+    median run is used.
+
+    The command also fails (even with ``--report-only``) if showing the help for
+    any command imports one of the ``--forbid-import`` modules, which does not
+    depend on timings.
+
+    With ``--update``, only the wall-clock times are saved in the baseline; use
+    ``--output`` to save the full results (including import breakdowns). A full
+    results file can also be used as a baseline, in which case the packages whose
+    import time grew are reported for any regressions.
+
+    To re-baseline (e.g. after a change that intentionally affects startup time),
+    run ``bones bench-startup --baseline <file> --update --repeat 21`` on an
+    otherwise idle machine, and commit the updated baseline file.
+    """
+
+    bones = ctx.find_root().command
+
+    if update and baseline is None:
+        raise click.UsageError("--update requires --baseline")
+
+    base_results = {}
+    if baseline is not None and not update:
+        with open(baseline, encoding="utf-8") as f:
+            base_results = json.load(f)
+
+    results = {"python": measure(["-c", "pass"], repeat=repeat)}
+    python_time = results["python"]["wall"]
+    click.echo(f"python: {python_time * 1000:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, argv in startup_cases(bones, Path(tmp_dir)).items():
+            result = measure(["-c", _BONES_CODE, *argv], repeat=repeat, cwd=tmp_dir)
+            results[name] = result
+
+            line = (
+                f"{name}: {result['wall'] * 1000:.1f} ms "
+                f"({result['wall'] / python_time:.2f}x python)"
+            )
+            if name in base_results:
+                base = base_results[name]["wall"] / base_results["python"]["wall"]
+                line += f", baseline {base:.2f}x"
+            click.echo(line)
+            for pkg, us in list(result["packages"].items())[:top]:
+                click.echo(f"    {pkg}: {us / 1000:.1f} ms")
+
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if update:
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline_results(results), f, indent=2)
+            f.write("\n")
+        click.echo(f"Saved baseline to {baseline}")
+        return
+
+    passed = True
+    for name, modules in forbidden_imports(results, forbid_imports).items():
+        click.secho(f"{name} imported {', '.join(modules)}", fg="red")
+        passed = False
+
+    failures = compare(results, base_results, threshold=threshold, slack=slack)
+    if len(failures) > 0:
+        click.secho(
+            f"Startup time regressed by more than {threshold}x for:",
+            fg="yellow" if report_only else "red",
+        )
+        for name in failures:
+            click.secho(f"  {name}", fg="yellow" if report_only else "red")
+            _report_regression(results[name], base_results[name], top)
+        passed &= report_only
+
+    if not passed:
+        sys.exit(1)
@@ -1,54 +1,91 @@
 """Applies validation to auto-generated files."""
 
 import difflib
+import functools
+import json
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import click
 
-from nengo_bones import __version__, all_files
-from nengo_bones.config import load_config
+from nengo_bones import __version__, all_files, cache, git, templates
+from nengo_bones.config import parse_config
+from nengo_bones.formatter import config_files, record_timings
+from nengo_bones.project import Project, find_projects
 from nengo_bones.scripts import check_notice
-from nengo_bones.scripts.base import bones
-from nengo_bones.templates import BonesTemplate, load_env
+from nengo_bones.templates import BonesTemplate
 
 
-def _check_file(filename, *, config, env, path, verbose):
+def _check_file(  # noqa: C901
+    filename, *, project, path, verbose, echo=click.secho, report=None
+):
+    if report is None:
+        report = {}
+
+    config = project.config
     full_filename = filename.replace("pkg", config["pkg_name"])
-    click.echo(full_filename + ":")
+    echo(full_filename + ":")
 
     # TODO: Ensure that the file is there <=> it is in the config
     if not (path / full_filename).exists():
-        click.echo("  File not found")
+        echo("  File not found")
+        report["status"] = "missing"
         return True
 
     with (path / full_filename).open(encoding="utf-8") as f:
         current_lines = f.readlines()
+        report["bytes_read"] = os.fstat(f.fileno()).st_size
 
     for line in current_lines[:50]:
-        if "Automatically generated by nengo-bones" in line:
+        if templates.header_text in line:
             break
     else:
-        click.echo("  This file was not generated with nengo-bones")
+        echo("  This file was not generated with nengo-bones")
+        report["status"] = "not-generated"
         return True
 
-    template = BonesTemplate(filename, env)
+    template = BonesTemplate(
+        filename, project.env, root=project.root, formatter=project.formatter
+    )
     if template.section not in config:
-        click.secho(
+        echo(
             "  This file contains 'Automatically generated by nengo-bones',\n"
             "  but there is no corresponding configuration in .nengobones.yml.\n"
             "  Please remove this text or configure it in .nengobones.yml.",
             fg="red",
         )
+        report["status"] = "not-configured"
         return False
 
-    new_lines = template.render(**template.get_render_data(config)).splitlines(
-        keepends=True
-    )
+    data = template.get_render_data(config)
+    data["version"] = __version__
 
-    # Strip out ignored lines
-    current_lines = [line for line in current_lines if "# bones: ignore" not in line]
-    new_lines = [line for line in new_lines if "# bones: ignore" not in line]
+    # if the inputs and the body of the file match its stamp, the file is up to date
+    # (so we do not need to render it again, unless we want to show the full diff)
+    stamp = templates.read_stamp(current_lines)
+    if stamp is not None and not verbose:
+        inputs = template.input_hashes(**data)
+        if (
+            inputs is not None
+            and cache.hash_key(inputs).startswith(stamp["inputs"])
+            and templates.body_hash(current_lines) == stamp["body"]
+        ):
+            echo("  Up to date", fg="green")
+            report["status"] = "up-to-date"
+            return True
+
+    start = time.perf_counter()
+    with record_timings() as formatter_times:
+        new_lines = template.render(**data).splitlines(keepends=True)
+    report["render_time"] = time.perf_counter() - start
+    report["formatter_times"] = formatter_times
+
+    # Strip out ignored lines (and generation stamps)
+    current_lines = templates.strip_lines(current_lines)
+    new_lines = templates.strip_lines(new_lines)
 
     diff = list(
         difflib.unified_diff(
@@ -58,58 +95,420 @@ def _check_file(filename, *, config, env, path, verbose):
             tofile=f"new {filename}",
         )
     )
+    report["diff_lines"] = len(diff)
 
     if len(diff) > 0:
-        click.secho(
+        echo(
             f"  Content does not match nengo-bones (version {__version__});\n"
             "  please update by running `bones generate` from\n"
             "  the root directory.",
             fg="red",
         )
         if verbose:
-            click.echo("\n  Full diff")
-            click.echo("  =========")
+            echo("\n  Full diff")
+            echo("  =========")
             for line in diff:
-                click.echo(f"  {line.rstrip()}")
+                echo(f"  {line.rstrip()}")
+        report["status"] = "outdated"
         return False
     else:
-        click.secho("  Up to date", fg="green")
+        echo("  Up to date", fg="green")
+    report["status"] = "up-to-date"
     return True
 
 
-@bones.command(name="check")
+def _check_notices(path, text, echo=click.secho, paths=None, report=None):
+    if report is None:
+        report = {}
+
+    start = time.perf_counter()
+    checked, missing = check_notice.check_notice(
+        path, text, echo=echo, paths=paths, stats=report
+    )
+    report["time"] = time.perf_counter() - start
+    report["files_scanned"] = checked
+    report["missing"] = missing
+    return missing == 0
+
+
+def _changed_config_keys(ref, project):
+    # top-level config keys (including whole sections) that differ from the config
+    # at `ref`, or None if we cannot tell
+    old_text = git.show_file(ref, project.conf_file, cwd=project.conf_file.parent)
+    if old_text is None:
+        return None
+    try:
+        old_config = parse_config(old_text)
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+    config = project.config
+    return {
+        key
+        for key in set(config) | set(old_config)
+        if key not in config or key not in old_config or config[key] != old_config[key]
+    }
+
+
+def _unchanged(filename, *, project, path, changes):
+    """Whether a generated file is unaffected by changes (so need not be checked)."""
+
+    config = project.config
+    template = BonesTemplate(filename, project.env, root=project.root)
+    output = (path / filename.replace("pkg", config["pkg_name"])).resolve()
+    if output in changes["paths"] or not output.exists():
+        return False
+    if template.section not in config or changes["config_keys"] is None:
+        return False
+
+    sources = templates.template_sources(template.env, template.template_file)
+    if sources is None:
+        return False
+
+    # config sections and values used by the template
+    used_keys = {template.section} | templates.template_variables(template.env, sources)
+    # templates overridden in the .templates directory
+    root = Path(project.root).resolve()
+    used_paths = {root / ".templates" / name for name in sources}
+    if filename.endswith(".py"):
+        # license notices are added to (and the formatter is applied to) .py files
+        used_keys.add("license_rst")
+        used_paths |= {root / name for name in config_files}
+    if used_keys & changes["config_keys"] or used_paths & changes["paths"]:
+        return False
+
+    # changes to NengoBones itself are not recorded by git, so we compare the
+    # version that generated the file to the installed version
+    with output.open(encoding="utf-8") as f:
+        head = [f.readline() for _ in range(51)]
+    stamp = templates.read_stamp(head)
+    return stamp is not None and stamp.get("version") == __version__
+
+
+def _unaffected_since(ref, *, project, path):
+    """Find the files that do not need to be checked, given changes since ``ref``."""
+
+    changes = {
+        "paths": git.changed_files(ref, cwd=path),
+        "config_keys": _changed_config_keys(ref, project),
+    }
+    skipped = [
+        filename
+        for filename in all_files
+        if _unchanged(filename, project=project, path=path, changes=changes)
+    ]
+
+    notice_paths = None
+    if changes["config_keys"] is not None and (
+        "license_rst" not in changes["config_keys"]
+    ):
+        # if the license text has not changed, we only need to check the .py files
+        # that have changed
+        root = path.resolve()
+        notice_paths = sorted(
+            p
+            for p in changes["paths"]
+            if p.suffix == ".py" and root in p.parents and p.is_file()
+        )
+
+    return skipped, notice_paths
+
+
+def _buffered(check):
+    # run a check, collecting its messages to be printed later
+    messages = []
+    passed = check(echo=lambda *args, **kwargs: messages.append((args, kwargs)))
+    return passed, messages
+
+
+def plan_checks(project, path, *, verbose=False, skipped=(), notice_paths=None):
+    """
+    Prepare the checks of a project's generated files and license notices.
+
+    Parameters
+    ----------
+    project : `.Project`
+        The project being checked.
+    path : `pathlib.Path`
+        Directory containing the files to be checked.
+    verbose : bool
+        Include the full diff in the messages of files that are out of date.
+    skipped : list of str
+        Files (from ``all_files``) that do not need to be checked.
+    notice_paths : list of `pathlib.Path`, optional
+        The .py files to check for license notices (if None, all .py files are
+        checked; see `.check_notice`).
+
+    Returns
+    -------
+    checks : list of callable
+        The checks to be run (see `.run_checks`).
+    reports : list of dict
+        The report filled in by each check.
+    files_report : dict
+        The reports for all the generated files, keyed by filename (with the status
+        ``"skipped"`` for the files in ``skipped``).
+    notices_report : dict or None
+        The report for the check for license notices (None if the project does not
+        add license notices to files).
+    """
+
+    config = project.config
+    filenames = [filename for filename in all_files if filename not in skipped]
+
+    files_report = {
+        filename.replace("pkg", config["pkg_name"]): {
+            "status": "skipped" if filename in skipped else None,
+            "render_time": None,
+            "formatter_times": {},
+            "diff_lines": None,
+            "bytes_read": 0,
+            "messages": [],
+        }
+        for filename in all_files
+    }
+    reports = [
+        files_report[name.replace("pkg", config["pkg_name"])] for name in filenames
+    ]
+    checks = [
+        functools.partial(
+            _check_file,
+            filename,
+            project=project,
+            path=path,
+            verbose=verbose,
+            report=file_report,
+        )
+        for filename, file_report in zip(filenames, reports)
+    ]
+    notices_report = None
+    if "license_rst" in config and config["license_rst"]["add_to_files"]:
+        notices_report = {"messages": []}
+        reports.append(notices_report)
+        checks.append(
+            functools.partial(
+                _check_notices,
+                path,
+                config["license_rst"]["text"],
+                paths=notice_paths,
+                report=notices_report,
+            )
+        )
+
+    return checks, reports, files_report, notices_report
+
+
+def _echo_header(root_dir, *, project, skipped, since, echo=click.secho):
+    echo(f"root dir: {root_dir}\n")
+    if len(skipped) > 0:
+        echo(f"Skipping files unaffected by changes since {since}:")
+        for filename in skipped:
+            echo(f"  {filename.replace('pkg', project.config['pkg_name'])}")
+        echo()
+    return True
+
+
+def _plan_project(project, path, *, verbose, since):
+    # plan the checks of a project, starting with a check that prints its header
+    if since is None:
+        skipped, notice_paths = [], None
+    else:
+        skipped, notice_paths = _unaffected_since(since, project=project, path=path)
+    checks, reports, files_report, notices_report = plan_checks(
+        project, path, verbose=verbose, skipped=skipped, notice_paths=notice_paths
+    )
+    header = functools.partial(
+        _echo_header, path, project=project, skipped=skipped, since=since
+    )
+    return [header, *checks], [{"messages": []}, *reports], files_report, notices_report
+
+
+def _find_projects(root_dir, conf_files, all_projects):
+    # the projects to check (and the directories containing their files)
+    if not all_projects and len(conf_files) <= 1:
+        project = Project(conf_files[0] if len(conf_files) > 0 else None)
+        return [(project, Path(root_dir))]
+
+    projects = [
+        Project(conf_file, root=Path(conf_file).parent) for conf_file in conf_files
+    ]
+    if all_projects:
+        projects += find_projects(root_dir)
+    if len(projects) == 0:
+        raise click.ClickException("Could not find any .nengobones.yml files")
+    # each project's files are checked in the directory containing its config file
+    paths = {project.conf_file: project for project in projects}
+    return [
+        (project, Path(os.path.relpath(project.root))) for project in paths.values()
+    ]
+
+
+def run_checks(checks, reports, *, jobs=1, quiet=False):
+    """
+    Run checks prepared by `.plan_checks`.
+
+    Parameters
+    ----------
+    checks : list of callable
+        The checks to be run.
+    reports : list of dict
+        The report filled in by each check.
+    jobs : int
+        Number of checks to run concurrently.
+    quiet : bool
+        If True, the messages from each check are added to its report (as
+        ``"messages"``) rather than printed.
+
+    Returns
+    -------
+    passed : list of bool
+        Whether each check passed.
+    """
+
+    if jobs == 1 and not quiet:
+        return [check(echo=click.secho) for check in checks]
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_buffered, check) for check in checks]
+
+        # print the output of each check in order, as soon as it is available (or
+        # add it to the reports, if we are not printing it)
+        passed = []
+        for future, report in zip(futures, reports):
+            check_passed, messages = future.result()
+            for args, kwargs in messages:
+                if quiet:
+                    report["messages"].append(args[0] if len(args) > 0 else "")
+                else:
+                    click.secho(*args, **kwargs)
+            passed.append(check_passed)
+    return passed
+
+
+@click.command(name="check")
 @click.option(
     "--root-dir", default=".", help="Directory containing files to be checked"
 )
-@click.option("--conf-file", default=None, help="Filepath for config file")
+@click.option(
+    "--conf-file",
+    "conf_files",
+    multiple=True,
+    help="Filepath for config file (can be given several times, to check several "
+    "projects).",
+)
+@click.option(
+    "--all",
+    "all_projects",
+    is_flag=True,
+    help="Check every project (directory containing a .nengobones.yml file) within "
+    "the root directory.",
+)
 @click.option(
     "--verbose", is_flag=True, help="Show more information about failed checks."
 )
-def main(root_dir, conf_file, verbose):
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of files to check concurrently.",
+)
+@click.option(
+    "--since",
+    default=None,
+    metavar="REF",
+    help="Only check files affected by changes since the merge base of REF and "
+    "HEAD (according to git).",
+)
+@click.option(
+    "--report",
+    type=click.Choice(["json"]),
+    default=None,
+    help="Print a machine-readable report (including timings for each file) "
+    "instead of the usual output.",
+)
+def main(root_dir, conf_files, all_projects, verbose, jobs, since, report):
     """
     Validates auto-generated project files.
 
     Note: This does not check the ci scripts, because those are generated
     on-the-fly during CI (so any ci files we do find are likely local artifacts).
+
+    With ``--jobs N``, up to ``N`` files are checked concurrently (along with the
+    check for license notices). Output is printed in the same order as when
+    checking serially.
+
+    With ``--since REF``, only the files affected by changes since the merge base
+    of ``REF`` and ``HEAD`` are checked (including uncommitted and untracked
+    changes). These are the generated files whose output has been modified, whose
+    templates (in the ``.templates`` directory) or config values (in
+    ``.nengobones.yml``) have changed, or that were generated by a different
+    version of NengoBones, and the .py files that have been modified (when
+    checking license notices). Note that changes to the installed versions of the
+    formatters applied to generated .py files are not detected.
+
+    With ``--report json``, a JSON report is printed instead of the usual output.
+    For each file, it contains the ``status`` of the check, the time spent
+    rendering the file (``render_time``, which is null if the file was verified
+    by its generation stamp) and running each formatter (``formatter_times``), the
+    number of lines in the diff (``diff_lines``), the number of bytes read
+    (``bytes_read``) and the ``messages`` that would have been printed. The
+    ``notices`` entry contains the number of files scanned (``files_scanned``),
+    missing a license notice (``missing``) and skipped because they were verified
+    by a previous check (``files_cached``), the number of bytes read and the time
+    taken by the check for license notices. All times are in seconds.
+
+    With ``--all`` (or several ``--conf-file`` options), several projects (e.g.
+    the packages in a monorepo) are checked in one run. Each project's files are
+    checked in its own directory (containing its config file). The files of all
+    the projects are checked together (so with ``--jobs N``, up to ``N`` files are
+    checked concurrently, from any of the projects), sharing the loaded templates
+    and formatters. The JSON report then contains the ``files`` and ``notices``
+    (and whether the checks ``passed``) for each project, under ``projects``.
     """
 
-    config = load_config(conf_file)
-    env = load_env()
-    path = Path(root_dir)
+    start = time.perf_counter()
 
-    click.echo("*" * 50)
-    click.echo("Checking content of nengo-bones generated files:")
-    click.echo(f"root dir: {root_dir}\n")
-    passed = [
-        _check_file(filename, config=config, env=env, path=path, verbose=verbose)
-        for filename in all_files
-    ]
+    checks, reports, project_reports = [], [], {}
+    for project, path in _find_projects(root_dir, conf_files, all_projects):
+        project_checks, project_check_reports, files_report, notices_report = (
+            _plan_project(project, path, verbose=verbose, since=since)
+        )
+        project_reports[str(path)] = {
+            "checks": range(len(checks), len(checks) + len(project_checks)),
+            "files": files_report,
+            "notices": notices_report,
+        }
+        checks += project_checks
+        reports += project_check_reports
 
-    if "license_rst" in config and config["license_rst"]["add_to_files"]:
-        _, missing = check_notice.check_notice(path, config["license_rst"]["text"])
-        passed.append(missing == 0)
+    echo = click.echo if report is None else lambda *args, **kwargs: None
+    echo("*" * 50)
+    echo("Checking content of nengo-bones generated files:")
+
+    passed = run_checks(checks, reports, jobs=jobs, quiet=report is not None)
+
+    echo("*" * 50)
 
-    click.echo("*" * 50)
+    if report == "json":
+        for project_report in project_reports.values():
+            project_report["passed"] = all(
+                passed[i] for i in project_report.pop("checks")
+            )
+        output = {
+            "root_dir": root_dir,
+            "version": __version__,
+            "passed": all(passed),
+            "time": time.perf_counter() - start,
+        }
+        if all_projects or len(conf_files) > 1:
+            output["projects"] = project_reports
+        else:
+            project_report = next(iter(project_reports.values()))
+            output["files"] = project_report["files"]
+            output["notices"] = project_report["notices"]
+        click.echo(json.dumps(output, indent=2))
 
     if not all(passed):
         sys.exit(1)
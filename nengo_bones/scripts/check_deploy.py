@@ -7,8 +7,7 @@ from pathlib import Path
 
 import click
 
-from nengo_bones.config import find_config, load_config
-from nengo_bones.scripts.base import bones
+from nengo_bones.project import Project
 
 
 def _ask_git(*args):
@@ -18,14 +17,14 @@ def _ask_git(*args):
 pypirc = Path.home() / ".pypirc"
 
 
-@bones.command(name="check-deploy")
+@click.command(name="check-deploy")
 @click.option("--conf-file", default=None, help="Filepath for config file")
 def main(conf_file):
     """Validates that the project is ready to be deployed."""
 
-    conf_file = find_config() if conf_file is None else conf_file
-    config = load_config(conf_file)
-    root_dir = Path(conf_file).parent
+    project = Project(conf_file)
+    config = project.config
+    root_dir = project.conf_file.parent
 
     version = importlib.import_module(config["pkg_name"]).version
 
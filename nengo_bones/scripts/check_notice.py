@@ -1,14 +1,147 @@
 """Checks that license text is added to all .py files."""
 
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import click
 
+from nengo_bones import cache
+from nengo_bones.project import find_files
 from nengo_bones.templates import add_notice
 
+# maximum size of the cache of files with notices (in bytes)
+notice_cache_size = 2**24
+
+
+def python_files(root):
+    """
+    Find the .py files in a project.
+
+    If ``root`` is in a git repository, this lists the files that are tracked by
+    git, or are untracked but not ignored. Otherwise, it searches ``root``,
+    skipping build directories and virtual environments (see `.find_files`).
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory to search within.
+
+    Returns
+    -------
+    paths : list of `pathlib.Path`
+        Paths of the .py files.
+    """
+
+    return find_files(root, "*.py")
+
+
+def _has_notice(path, expected):
+    # read only as much of the file as we need to compare against the notice
+    with path.open("rb") as f:
+        head = f.read(len(expected))
+    if head == expected:
+        return path, True, len(head)
+
+    if b"\r" in head:
+        # line endings are translated when reading the file as text, so we compare
+        # the text instead (as if we had read the whole file)
+        expected_text = expected.decode("utf-8")
+        with path.open(encoding="utf-8", errors="replace") as f:
+            current_text = f.read(len(expected_text))
+        return (
+            path,
+            current_text == expected_text,
+            len(head) + len(current_text.encode("utf-8")),
+        )
+
+    return path, False, len(head)
+
+
+def _notice_checker(text):
+    # A file has a notice if its first `len(text)` characters match the first
+    # `len(text)` characters of the file with the notice added, which (unless the
+    # notice is shorter than the text) only depends on the notice. So we only need
+    # to read the start of each file.
+    notice = add_notice(text, "")
+    if len(notice) >= len(text):
+        expected = notice[: len(text)].encode("utf-8")
+        return functools.partial(_has_notice, expected=expected)
+    return functools.partial(_has_notice_full, text=text)
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _check_file(path, has_notice, verified):
+    # skip files that have been verified before (and have not changed since)
+    key = _stat_key(path)
+    if key is not None and verified.get(os.path.abspath(path)) == key:
+        return path, True, 0, key, True
+    return (*has_notice(path), key, False)
 
-def check_notice(root, text, fix=False, verbose=False):
+
+def notice_cache_key(root):
+    """
+    Find the key of the record of which files in a project have license notices.
+
+    The records are stored in the ``notice`` subdirectory of `.cache_dir`, as a
+    `.ContentCache` (so the records of projects that have not been checked recently
+    are eventually removed).
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory of the project.
+
+    Returns
+    -------
+    key : str
+        Key of the record in `.notice_cache`.
+    """
+
+    return cache.hash_key(str(Path(root).resolve()))
+
+
+def notice_cache():
+    """Get the cache in which notice records are stored (see `.notice_cache_key`)."""
+
+    return cache.shared_cache(cache.cache_dir("notice"), notice_cache_size)
+
+
+def _has_notice_full(path, text):
+    # compare against the whole modified file (see `check_notice`)
+    current_text = path.read_text()
+    modified = add_notice(text, current_text)
+    return (
+        path,
+        modified[: len(text)] == current_text[: len(text)],
+        len(current_text.encode("utf-8")),
+    )
+
+
+def check_notice(
+    root, text, fix=False, verbose=False, echo=click.secho, paths=None, stats=None
+):
     """
     Check for license notices in all .py files.
 
+    Files that are ignored by git (or, outside of a git repository, that are in
+    build directories or virtual environments) are not checked (see
+    `.python_files`).
+
+    Files that have been found to have the notice are recorded in a cache (see
+    `.notice_cache_key`), keyed by their size, modification time and inode, so
+    that they are not read again until they change. The cache is cleared if the
+    license text changes.
+
     Parameters
     ----------
     root : Path
@@ -19,6 +152,17 @@ def check_notice(root, text, fix=False, verbose=False):
         Add the notice to any file that is missing one.
     verbose : bool
         Print the name of all files checked.
+    echo : callable
+        Function used to print messages (with the same signature as
+        ``click.secho``).
+    paths : list of `pathlib.Path`, optional
+        The .py files to check (if None, the .py files within ``root`` found by
+        `.python_files` are checked).
+    stats : dict, optional
+        If given, the number of bytes read from the files (when checking them) is
+        stored in ``stats["bytes_read"]``, and the number of files that were
+        skipped because they were verified by a previous check is stored in
+        ``stats["files_cached"]``.
 
     Returns
     -------
@@ -28,27 +172,57 @@ def check_notice(root, text, fix=False, verbose=False):
         Number of files missing a notice.
     """
 
-    click.echo("Checking for license text in python files:")
+    echo("Checking for license text in python files:")
+
+    cache_key = notice_cache_key(root)
+    text_key = cache.hash_key(text)
+    cached = notice_cache().get_json(cache_key, default={})
+    verified = cached.get("files", {}) if cached.get("text") == text_key else {}
+    # when checking all files, we start again (so that deleted files are dropped)
+    new_verified = {} if paths is None else dict(verified)
+    # files modified very recently could be modified again without changing their
+    # size or modification time (if the filesystem has coarse timestamps), so we do
+    # not record them
+    recent_ns = time.time_ns() - 2 * 10**9
 
     checked = 0
     missing = 0
-    for path in root.rglob("*.py"):
-        checked += 1
-        current_text = path.read_text()
+    bytes_read = 0
+    files_cached = 0
+    if paths is None:
+        paths = python_files(root)
+    check_file = functools.partial(
+        _check_file, has_notice=_notice_checker(text), verified=verified
+    )
+    # most of the time is spent waiting for I/O, so we check files concurrently
+    with ThreadPoolExecutor() as pool:
+        for path, present, n_bytes, key, was_cached in pool.map(check_file, paths):
+            checked += 1
+            bytes_read += n_bytes
+            files_cached += was_cached
 
-        modified = add_notice(text, current_text)
-
-        if modified[: len(text)] != current_text[: len(text)]:
-            missing += 1
-            if fix:
-                path.write_text(modified)
-                click.secho(f"Fixed: {path}", fg="yellow")
+            if present and key is not None and key[1] < recent_ns:
+                new_verified[os.path.abspath(path)] = key
             else:
-                click.secho(f"Missing: {path}", fg="red")
-        elif verbose:
-            click.secho(f"Present: {path}", fg="green")
+                new_verified.pop(os.path.abspath(path), None)
+
+            if not present:
+                missing += 1
+                if fix:
+                    path.write_text(add_notice(text, path.read_text()))
+                    echo(f"Fixed: {path}", fg="yellow")
+                else:
+                    echo(f"Missing: {path}", fg="red")
+            elif verbose:
+                echo(f"Present: {path}", fg="green")
+
+    if new_verified != verified or cached.get("text") != text_key:
+        notice_cache().put_json(cache_key, {"text": text_key, "files": new_verified})
 
     if missing == 0:
-        click.secho("  Up to date", fg="green")
+        echo("  Up to date", fg="green")
+    if stats is not None:
+        stats["bytes_read"] = bytes_read
+        stats["files_cached"] = files_cached
 
     return checked, missing
@@ -1,37 +1,96 @@
 """Applies standard formatting to Jupyter Notebook (.ipynb) files."""
 
+import contextlib
 import difflib
+import functools
+import importlib.metadata
+import os
 import re
+import shlex
 import subprocess
 import sys
+import tempfile
 import textwrap
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import click
-import nbformat
 
+from nengo_bones import cache, tools
 from nengo_bones.config import find_config
-from nengo_bones.scripts.base import bones
+from nengo_bones.formatter import get_formatter
+from nengo_bones.project import Project
+from nengo_bones.version import version as bones_version
+
+# pylint messages that are not reported for notebooks
+pylint_disable = (
+    "missing-docstring,trailing-whitespace,wrong-import-position,"
+    "unnecessary-semicolon,missing-final-newline"
+)
 
-HAS_PRETTIER = (
-    subprocess.run(
-        "npx --no-install --quiet prettier --version ",
-        shell=True,
-        check=False,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    ).returncode
-    == 0
+# flake8 errors that are not reported for notebooks
+flake8_ignore = "E402,E703,W291,W292,W293,W391"
+
+# files that the static checkers may read their settings from
+checker_config_files = (
+    ".codespellrc",
+    ".flake8",
+    ".pylintrc",
+    "pylintrc",
+    "pyproject.toml",
+    "setup.cfg",
+    "tox.ini",
 )
 
+# maximum size of the cache of verified notebooks (in bytes)
+verified_cache_size = 2**20
 
-def format_notebook(nb, fname, verbose=False, prettier=None):  # noqa: C901
-    """Formats an opened Jupyter notebook."""
+# maximum size of the cache of formatted cells (in bytes)
+formatted_cache_size = 2**22
+
+# maximum size of the cache of static checker results (in bytes)
+checker_cache_size = 2**24
+
+
+def format_notebook(  # noqa: C901
+    nb,
+    fname,
+    verbose=False,
+    prettier=None,
+    project=None,
+    echo=click.secho,
+    static_checker=None,
+    checker_pool=None,
+    incremental=False,
+    checker_results=None,
+):
+    """
+    Formats an opened Jupyter notebook.
+
+    If a ``static_checker`` (see `.StaticChecker`) is given, the notebook is added
+    to it to be checked later, rather than being checked immediately. Otherwise,
+    the static checks are run concurrently, on ``checker_pool`` if given (so that
+    a bounded pool can be shared by many notebooks). If ``checker_results`` (see
+    `.CheckerResults`) is given, checkers are only run if the source they check has
+    changed since they last checked the notebook.
+
+    With ``incremental=True``, only the cells that are new or have changed since
+    the notebook was last formatted are formatted (see `.FormattedCells`). The
+    static checks are still applied to the whole notebook.
+    """
 
     if verbose:
-        click.echo(f"Formatting '{fname}'")
+        echo(f"Formatting '{fname}'")
 
     passed = True
+    root = (Project() if project is None else project).root
+
+    # make sure the tools we shell out to are installed (the results are cached,
+    # so this only starts any processes the first time a tool is used)
+    for tool in ("pylint", "flake8", "codespell"):
+        tools.require_tool(tool, cwd=root)
 
     # --- Remove bad metadata
     # Should pass `nengo/tests/test_examples.py:test_minimal_metadata`
@@ -57,6 +116,12 @@ def format_notebook(nb, fname, verbose=False, prettier=None):  # noqa: C901
     all_code = []  # code cells
     all_markdown = []  # markdown cells
 
+    formatted_cells = None
+    if incremental:
+        formatted_cells = FormattedCells(
+            fname, cache.hash_key(get_formatter(root).settings_key, bool(prettier))
+        )
+
     for cell in nb.cells:
         source = getattr(cell, "source", None)
 
@@ -64,46 +129,91 @@ def format_notebook(nb, fname, verbose=False, prettier=None):  # noqa: C901
             empty.append(cell)
             continue
 
+        format_source = formatted_cells is None or not formatted_cells.is_formatted(
+            cell
+        )
         if cell.cell_type == "code":
-            format_code(cell)
+            format_code(cell, cwd=root, format_source=format_source)
             all_code.append(cell)
         elif cell.cell_type == "markdown":
-            format_markdown(cell, prettier=prettier)
+            format_markdown(
+                cell, prettier=prettier, cwd=root, format_source=format_source
+            )
             all_markdown.append(cell)
 
         # remove empty lines from the end
         cell["source"] = cell["source"].rstrip()
 
+        if formatted_cells is not None:
+            formatted_cells.add(cell)
+
+    if formatted_cells is not None:
+        formatted_cells.save()
+
     # remove empty cells
     for cell in empty:
         nb.cells.remove(cell)
 
+    if static_checker is not None:
+        static_checker.add(fname, nb)
+        return passed
+
     # static checks needs to see the whole file, so we call them on all the code cells
     # together at the end
-    passed &= apply_static_checker(
-        "pylint --from-stdin "
-        "--disable=missing-docstring,trailing-whitespace,wrong-import-position,"
-        f"unnecessary-semicolon,missing-final-newline {fname}",
-        all_code,
-    )
-    passed &= apply_static_checker(
-        "flake8 --extend-ignore=E402,E703,W291,W292,W293,W391 "
-        f"--stdin-display-name={fname} --show-source -",
-        all_code,
-    )
-    passed &= apply_static_checker(
-        "codespell -",
-        all_markdown + all_code,
-    )
+    checks = [
+        functools.partial(
+            _cached_static_checker,
+            f"pylint --from-stdin --disable={pylint_disable} {fname}",
+            all_code,
+            fname,
+            results=checker_results,
+            cwd=root,
+        ),
+        functools.partial(
+            _cached_static_checker,
+            f"flake8 --extend-ignore={flake8_ignore} "
+            f"--stdin-display-name={fname} --show-source -",
+            all_code,
+            fname,
+            results=checker_results,
+            cwd=root,
+        ),
+        functools.partial(
+            _cached_static_checker,
+            "codespell -",
+            all_markdown + all_code,
+            fname,
+            results=checker_results,
+            cwd=root,
+        ),
+    ]
+
+    # the checks are independent, so we run them concurrently (printing their output
+    # in order once they have all finished)
+    if checker_pool is None:
+        with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+            outputs = list(pool.map(_buffered, checks))
+    else:
+        outputs = list(checker_pool.map(_buffered, checks))
+    for check_passed, messages in outputs:
+        for args, options in messages:
+            echo(*args, **options)
+        passed &= check_passed
 
     return passed
 
 
-def format_code(cell):
-    """Format a code cell."""
+def format_code(cell, cwd=None, format_source=True):
+    """
+    Format a code cell.
+
+    If ``format_source`` is False, the source is known to be formatted already,
+    so only the outputs and metadata are cleared.
+    """
 
     # format with black
-    cell["source"] = apply_black(cell["source"])
+    if format_source:
+        cell["source"] = apply_black(cell["source"], cwd=cwd)
 
     # remove any output (print statements, plots, etc.)
     cell.outputs = []
@@ -119,14 +229,22 @@ def format_code(cell):
     clear_cell_metadata_entry(cell, "pycharm")
 
 
-def format_markdown(cell, prettier=None):
-    """Format a markdown cell."""
+def format_markdown(cell, prettier=None, cwd=None, format_source=True):
+    """
+    Format a markdown cell.
+
+    If ``format_source`` is False, the source is known to be formatted already,
+    so only the metadata is cleared.
+    """
 
     # clear useless metadata
     clear_cell_metadata_entry(cell, "deletable", value=True)
     clear_cell_metadata_entry(cell, "editable", value=True)
     clear_cell_metadata_entry(cell, "pycharm")
 
+    if not format_source:
+        return
+
     # clear whitespace at ends of lines
     source = getattr(cell, "source", None)
     if source is not None and len(source) > 0:
@@ -138,6 +256,7 @@ def format_markdown(cell, prettier=None):
         cell["source"] = run_command(
             "npx prettier --parser markdown --print-width 88 --prose-wrap always",
             cell["source"],
+            cwd=cwd,
         ).stdout
 
     # apply text wrapping
@@ -154,14 +273,20 @@ def format_markdown(cell, prettier=None):
     )
 
 
-def apply_black(source):
+def apply_black(source, cwd=None):
     """
     Apply black formatting to a cell.
 
+    Black is run in-process (see `.Formatter.format_cell`), using the settings
+    of the project in ``cwd``.
+
     Parameters
     ----------
     source : str
         Content of cell.
+    cwd : `pathlib.Path`, optional
+        Root directory of the project (if None, will use the directory
+        containing the default config file returned by `.find_config`).
 
     Returns
     -------
@@ -169,34 +294,12 @@ def apply_black(source):
         Formatted cell contents.
     """
 
-    # if we have any IPython magic functions (starting with % or !),
-    # replace them temporarily (black can't handle them)
-    magic_re = re.compile(r"^(\s*)([%!][A-Za-z]+.*)$", flags=re.MULTILINE)
-
-    # go through matches backwards so that subbing doesn't change inds
-    magic_pairs = []
-    matches = list(magic_re.finditer(source))
-    assert len(matches) < 10000, "Too many magic matches"
-
-    for i, match in enumerate(matches[::-1]):
-        space, magic = match.groups("")
-
-        replacement = f"# MaGiC{i:04d}"
-        magic_pairs.append((magic, replacement))
-        source = source[: match.start(1)] + space + replacement + source[match.end(2) :]
-
-    # run black
-    source = run_command("black -q -", source).stdout
-
-    # put magic functions back
-    for magic, replacement in magic_pairs:
-        assert replacement in source, "Magic identifier disappeared"
-        source = source.replace(replacement, magic)
-
-    return source
+    return get_formatter(find_config().parent if cwd is None else cwd).format_cell(
+        source
+    )
 
 
-def run_command(command, inputs):
+def run_command(command, inputs, cwd=None):
     """
     Run a command in external shell with input piped from string.
 
@@ -206,6 +309,9 @@ def run_command(command, inputs):
         Shell command to be executed.
     inputs : str
         Input that will be piped to command through stdin.
+    cwd : `pathlib.Path`, optional
+        Directory from which to run the command (if None, will use the directory
+        containing the default config file returned by `.find_config`).
 
     Returns
     -------
@@ -221,11 +327,11 @@ def run_command(command, inputs):
         stderr=subprocess.STDOUT,
         shell=True,
         check=False,
-        cwd=find_config().parent,
+        cwd=find_config().parent if cwd is None else cwd,
     )
 
 
-def apply_static_checker(command, cells):
+def apply_static_checker(command, cells, cwd=None, echo=click.secho):
     """
     Apply static checks to code in cells.
 
@@ -235,6 +341,11 @@ def apply_static_checker(command, cells):
         Command line code to be executed on content of cells.
     cells : list
         List of notebook code cells.
+    cwd : `pathlib.Path`, optional
+        Directory from which to run the command (see `.run_command`).
+    echo : callable
+        Function used to print errors (with the same signature as
+        ``click.secho``).
 
     Returns
     -------
@@ -242,25 +353,325 @@ def apply_static_checker(command, cells):
         True if static checks passed, else False
     """
 
-    def sanitize(source):
-        return "\n".join(
-            line
-            for line in source.splitlines()
-            if not line.startswith("%") and not line.startswith("!")
-        )
+    result = run_command(command, _join_cells(cells), cwd=cwd)
+
+    if result.returncode != 0:
+        echo(f"{command.split()[0]} errors detected:")
+        echo(result.stdout)
+
+    return result.returncode == 0
+
+
+def _cached_static_checker(
+    command, cells, fname, results=None, cwd=None, echo=click.secho
+):
+    # apply a static checker (see `apply_static_checker`), reusing its previous result
+    # for the same source from `results` (a `CheckerResults`) if there is one
+    source = _join_cells(cells)
+    cached = None if results is None else results.get(command, fname, source)
+    if cached is None:
+        messages = []
+        passed = apply_static_checker(command, cells, cwd=cwd, echo=messages.append)
+        if results is not None:
+            results.put(command, fname, source, passed, messages)
+    else:
+        passed, messages = cached
+
+    for message in messages:
+        echo(message)
+    return passed
 
+
+def _sanitize(source):
+    # remove IPython magic functions
+    return "\n".join(
+        line
+        for line in source.splitlines()
+        if not line.startswith("%") and not line.startswith("!")
+    )
+
+
+def _join_cells(cells):
     # note: we put two blank lines between each cell so that cells that
     # begin/end with a function/class definition will have the right whitespace
     # when concatenated
-    all_source = "\n\n\n".join(sanitize(c["source"]) for c in cells)
+    return "\n\n\n".join(_sanitize(c["source"]) for c in cells)
 
-    result = run_command(command, all_source)
 
-    if result.returncode != 0:
-        click.echo(f"{command.split()[0]} errors detected:")
-        click.echo(result.stdout)
+class StaticChecker:
+    """
+    Applies static checks to the code in many notebooks at once.
+
+    Rather than running each checker once per notebook (paying its startup cost
+    every time), the code cells of each notebook are written to a temporary module,
+    and each checker is run once on all of the modules (pylint with
+    ``--jobs=0``, so that modules are checked in parallel). Errors are then mapped
+    back to the notebook, cell and line they refer to.
+
+    The temporary modules are written next to their notebooks, so that
+    directory-dependent settings (such as flake8's ``per-file-ignores``) and import
+    resolution apply to them as they would to the notebooks. They are given unique
+    names (containing the process id), so that concurrent runs do not overwrite each
+    other's modules, and a ``.py`` extension, so that modules left behind by a run
+    that was killed are not mistaken for notebooks. The text checked by codespell is
+    written to a temporary directory, since codespell reads each notebook from stdin
+    when checking notebooks separately (so its path-dependent settings never apply to
+    notebooks).
 
-    return result.returncode == 0
+    Parameters
+    ----------
+    cwd : `pathlib.Path`, optional
+        Directory from which to run the checkers (see `.run_command`).
+    results : `.CheckerResults`, optional
+        If given, checkers are only run on notebooks whose checked source has
+        changed since that checker last checked them.
+    """
+
+    # the checkers that are run (in the order their errors are reported)
+    tools = ("pylint", "flake8", "codespell")
+
+    # paths of the temporary files, and the line number, in checker output
+    _location_re = re.compile(r"^.*_bones_check_\w+?_(\d+)\.(?:py|txt):(\d+)(.*)$")
+
+    def __init__(self, cwd=None, results=None):
+        self.cwd = cwd
+        self.results = results
+        self.notebooks = {}
+        self._lock = threading.Lock()
+
+    def add(self, fname, nb):
+        """
+        Add a (formatted) notebook to be checked.
+
+        Parameters
+        ----------
+        fname : str or `pathlib.Path`
+            Filename of the notebook (used in error messages).
+        nb : ``nbformat.NotebookNode``
+            The notebook.
+        """
+
+        # cells are numbered from 1, in the order they appear in the notebook
+        code = [(i, c) for i, c in enumerate(nb.cells, 1) if c.cell_type == "code"]
+        markdown = [
+            (i, c) for i, c in enumerate(nb.cells, 1) if c.cell_type == "markdown"
+        ]
+        with self._lock:
+            self.notebooks[str(fname)] = (code, markdown + code)
+
+    def __getstate__(self):
+        # the lock cannot be pickled (when sending a checker to a worker process)
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def update(self, other):
+        """
+        Add the notebooks that have been added to another checker.
+
+        Parameters
+        ----------
+        other : `.StaticChecker`
+            The other checker (e.g., a copy of this checker used by another
+            process).
+        """
+
+        with self._lock:
+            self.notebooks.update(other.notebooks)
+
+    def run(self):
+        """
+        Run the static checks on all the notebooks that have been added.
+
+        Returns
+        -------
+        results : dict
+            Mapping from the filename of each notebook to whether its static checks
+            passed, and the messages describing any errors (a list of str). If a
+            checker fails without reporting an error in a notebook, its output is
+            stored under the key None.
+        """
+
+        names = sorted(self.notebooks)
+        cached = {
+            tool: {name: self._cached(tool, name) for name in names}
+            for tool in self.tools
+        }
+        checked = self._check(
+            {
+                tool: [name for name in names if cached[tool][name] is None]
+                for tool in self.tools
+            }
+        )
+
+        results = {name: (True, []) for name in names}
+        for tool in self.tools:
+            errors = checked.get(tool, {})
+            for name in names:
+                if cached[tool][name] is not None:
+                    passed, messages = cached[tool][name]
+                else:
+                    passed = name not in errors
+                    messages = (
+                        []
+                        if passed
+                        else [f"{tool} errors detected:", "\n".join(errors[name])]
+                    )
+                    if self.results is not None and None not in errors:
+                        # only results that could be attributed to notebooks are
+                        # stored (the checker may not have run properly otherwise)
+                        self.results.put(
+                            f"batch {tool}",
+                            name,
+                            self._source(tool, name),
+                            passed,
+                            messages,
+                        )
+                if not passed:
+                    results[name] = (False, results[name][1] + messages)
+            if None in errors:
+                messages = results.get(None, (False, []))[1]
+                messages.extend([f"{tool} errors detected:", "\n".join(errors[None])])
+                results[None] = (False, messages)
+
+        return results
+
+    def _source(self, tool, name):
+        # the source seen by a checker (see `_join_cells`)
+        code, all_cells = self.notebooks[name]
+        return _join_cells(c for _, c in (all_cells if tool == "codespell" else code))
+
+    def _cached(self, tool, name):
+        if self.results is None:
+            return None
+        return self.results.get(f"batch {tool}", name, self._source(tool, name))
+
+    def _check(self, unchecked):
+        # run each checker on the notebooks that it has not checked before, returning
+        # the lines of the errors (if any) in each notebook (see `_collect`)
+        names = sorted(set().union(*unchecked.values()))
+        if len(names) == 0:
+            # the checkers would check the current directory if given no files
+            return {}
+
+        token = f"{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        with tempfile.TemporaryDirectory() as tmp_dir, contextlib.ExitStack() as stack:
+            modules, texts, cells = {}, {}, {}
+            for i, name in enumerate(names):
+                code, all_cells = self.notebooks[name]
+                # the modules are written next to the notebooks (see above), and
+                # removed once the checks have finished
+                filename = f"_bones_check_{token}_{i:04d}"
+                if name in unchecked["pylint"] or name in unchecked["flake8"]:
+                    modules[name] = Path(name).resolve().with_name(f"{filename}.py")
+                    stack.callback(modules[name].unlink, missing_ok=True)
+                    modules[name].write_text(
+                        self._source("pylint", name), encoding="utf-8"
+                    )
+                if name in unchecked["codespell"]:
+                    texts[name] = Path(tmp_dir, f"{filename}.txt")
+                    texts[name].write_text(
+                        self._source("codespell", name), encoding="utf-8"
+                    )
+                cells[i] = (name, _cell_starts(code), _cell_starts(all_cells))
+
+            code_starts = {i: (name, starts) for i, (name, starts, _) in cells.items()}
+            text_starts = {i: (name, starts) for i, (name, _, starts) in cells.items()}
+            commands = {
+                "pylint": (
+                    f"pylint --jobs=0 --score=n --disable={pylint_disable},"
+                    "duplicate-code,cyclic-import --msg-template="
+                    "'{path}:{line}:{column}: {msg_id}: {msg} ({symbol})'",
+                    modules,
+                    code_starts,
+                ),
+                "flake8": (
+                    f"flake8 --extend-ignore={flake8_ignore} --show-source",
+                    modules,
+                    code_starts,
+                ),
+                "codespell": ("codespell", texts, text_starts),
+            }
+            checks = [
+                (
+                    tool,
+                    " ".join(
+                        [commands[tool][0]]
+                        + [
+                            shlex.quote(str(commands[tool][1][name]))
+                            for name in unchecked[tool]
+                        ]
+                    ),
+                    commands[tool][2],
+                )
+                for tool in self.tools
+                if len(unchecked[tool]) > 0
+            ]
+
+            # the checkers are independent, so we run them concurrently (and then
+            # collect their errors in order)
+            with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+                outputs = list(
+                    pool.map(
+                        lambda check: run_command(check[1], "", cwd=self.cwd), checks
+                    )
+                )
+
+        return {
+            tool: self._collect(result, notebooks)
+            for (tool, _, notebooks), result in zip(checks, outputs)
+        }
+
+    def _collect(self, result, notebooks):
+        # the lines of the errors reported by a checker in each notebook
+        if result.returncode == 0:
+            return {}
+
+        errors = {}
+        name = None
+        for line in result.stdout.splitlines():
+            match = self._location_re.match(line)
+            if match is not None:
+                name, starts = notebooks[int(match.group(1))]
+                lineno = int(match.group(2))
+                cell, start = _find_cell(starts, lineno)
+                line = (
+                    f"{name} (cell {cell}, line {lineno - start + 1}){match.group(3)}"
+                )
+            elif line.startswith("*************") or len(line.strip()) == 0:
+                # pylint module headers (we group errors by notebook instead)
+                continue
+            # other lines (e.g. the source shown by flake8) belong to the previous
+            # error (if there is one)
+            errors.setdefault(name, []).append(line)
+
+        if len(errors) == 0:
+            errors[None] = [result.stdout]
+        return errors
+
+
+def _cell_starts(cells):
+    # the line at which each cell starts when the cells are joined (see `_join_cells`)
+    starts = []
+    line = 1
+    for number, cell in cells:
+        starts.append((number, line))
+        line += _sanitize(cell["source"]).count("\n") + 3
+    return starts
+
+
+def _find_cell(starts, line):
+    # the cell containing a line (and the line at which that cell starts)
+    cell, start = 0, 1
+    for number, number_start in starts:
+        if number_start > line:
+            break
+        cell, start = number, number_start
+    return cell, start
 
 
 def clear_cell_metadata_entry(cell, key, value="_ANY_"):
@@ -282,16 +693,386 @@ def clear_cell_metadata_entry(cell, key, value="_ANY_"):
         del metadata[key]
 
 
-def format_file(fname, target_version=4, verbose=False, check=False, prettier=None):
-    """Formats a file containing a Jupyter notebook."""
+class FormattedCells:
+    """
+    Records the cells of a notebook that have been formatted.
+
+    Cells are identified by their ids (added in version 4.5 of the notebook format),
+    and recorded along with a hash of their formatted source. A cell whose source
+    has not changed since it was last formatted does not need to be formatted
+    again. Cells without ids are always formatted.
+
+    The records for each notebook are stored in the ``cells`` subdirectory of
+    `.cache_dir` (as a `.ContentCache`, so the records of notebooks that have not
+    been formatted recently are eventually removed), and are discarded if the
+    formatting settings change.
+
+    Parameters
+    ----------
+    fname : str or `pathlib.Path`
+        Filename of the notebook.
+    settings_key : str
+        Hash of the settings (other than the source) that affect the formatted
+        output.
+    """
+
+    def __init__(self, fname, settings_key):
+        self.cache = cache.shared_cache(cache.cache_dir("cells"), formatted_cache_size)
+        self.key = cache.hash_key(str(Path(fname).resolve()))
+        self.settings_key = settings_key
+        cached = self.cache.get_json(self.key, default={})
+        self.cells = (
+            cached.get("cells", {}) if cached.get("settings") == settings_key else {}
+        )
+        self._formatted = {}
+
+    def is_formatted(self, cell):
+        """
+        Check whether a cell was formatted the last time the notebook was formatted.
+
+        Parameters
+        ----------
+        cell : ``nbformat.NotebookNode``
+            The cell (before formatting).
+
+        Returns
+        -------
+        formatted : bool
+            True if the cell has the same source as when it was last formatted.
+        """
+
+        cell_id = cell.get("id")
+        return cell_id is not None and self.cells.get(cell_id) == _cell_key(cell)
+
+    def add(self, cell):
+        """
+        Record a formatted cell.
+
+        Parameters
+        ----------
+        cell : ``nbformat.NotebookNode``
+            The cell (after formatting).
+        """
+
+        cell_id = cell.get("id")
+        if cell_id is not None:
+            self._formatted[cell_id] = _cell_key(cell)
+
+    def save(self):
+        """Store the cells recorded with `.add` (replacing the previous records)."""
+
+        if self._formatted != self.cells:
+            self.cache.put_json(
+                self.key, {"settings": self.settings_key, "cells": self._formatted}
+            )
+            self.cells = self._formatted
+        self._formatted = {}
+
+
+def _cell_key(cell):
+    return cache.hash_key(cell.cell_type, cell["source"])
+
+
+class VerifiedNotebooks:
+    """
+    Records the notebooks that have been verified as formatted and lint-clean.
+
+    Notebooks are identified by a hash of their contents, their path within the
+    project, the NengoBones version, the versions and settings of the formatters and
+    static checkers, and the formatting options, so a notebook that has been verified
+    before (in any checkout on the machine) does not need to be formatted or checked
+    again. The static checkers' settings are read from the config files in the
+    notebook's directory and each of its parents up to the project root, since the
+    checkers use the nearest config file to the files they check.
+
+    The cache is stored in the ``notebooks`` subdirectory of `.cache_dir`. On CI,
+    ``NENGO_BONES_CACHE_DIR`` can be set to a directory that is saved and restored
+    between runs.
+
+    Notebooks are first marked as verified with `.add` (once they have been
+    formatted), and only recorded in the cache with `.commit` (once their static
+    checks have passed).
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory of the project.
+    prettier : bool
+        Whether markdown cells are formatted with Prettier.
+    target_version : int
+        Version of notebook format that notebooks are saved in.
+    """
+
+    def __init__(self, root, prettier=False, target_version=4):
+        self.root = Path(root).resolve()
+        checkers = ("pylint", "flake8", "codespell") + (
+            ("prettier",) if prettier else ()
+        )
+        self.settings_key = cache.hash_key(
+            bones_version,
+            get_formatter(root).settings_key,
+            _checker_versions(),
+            [tools.probe_key(tool, cwd=root) for tool in checkers],
+            [pylint_disable, flake8_ignore],
+            bool(prettier),
+            target_version,
+        )
+        self.cache = cache.shared_cache(
+            cache.cache_dir("notebooks"), verified_cache_size
+        )
+        self._pending = {}
+        self._configs = {}
+
+    def _key(self, fname, text):
+        return cache.hash_key(
+            self.settings_key, _path_key(fname, self.root, self._configs), text
+        )
+
+    def is_verified(self, fname, text):
+        """
+        Check whether a notebook has been verified before.
+
+        Parameters
+        ----------
+        fname : str or `pathlib.Path`
+            Filename of the notebook.
+        text : str
+            Contents of the notebook file.
+
+        Returns
+        -------
+        verified : bool
+            True if a notebook with these contents (and the same settings) has been
+            verified.
+        """
+
+        return self.cache.get(self._key(fname, text)) is not None
+
+    def add(self, fname, text):
+        """
+        Mark a notebook as formatted (pending its static checks).
+
+        Parameters
+        ----------
+        fname : str or `pathlib.Path`
+            Filename of the notebook.
+        text : str
+            Contents of the (formatted) notebook file.
+        """
+
+        self._pending[str(fname)] = self._key(fname, text)
+
+    def update(self, other):
+        """
+        Mark the notebooks marked with `.add` on another instance.
+
+        Parameters
+        ----------
+        other : `.VerifiedNotebooks`
+            The other instance (e.g., a copy of this instance used by another
+            process).
+        """
+
+        self._pending.update(other._pending)
+
+    def commit(self, fname):
+        """
+        Record a notebook marked with `.add` as verified.
+
+        Parameters
+        ----------
+        fname : str or `pathlib.Path`
+            Filename of the notebook.
+        """
+
+        key = self._pending.pop(str(fname), None)
+        if key is not None:
+            self.cache.put(key, str(fname))
+
+
+class CheckerResults:
+    """
+    Records the results of running the static checkers on notebooks.
+
+    Results are identified by a hash of the checker (and the way it was run), the
+    source it checked (i.e., the joined code cells, or all cells for codespell), the
+    notebook's path within the project, and the versions and settings of the
+    checkers (read as described in `.VerifiedNotebooks`). A checker is therefore
+    not run again on a notebook when only parts of the notebook that it does not
+    check have changed (such as markdown cells, for pylint and flake8).
+
+    The results are stored in the ``checks`` subdirectory of `.cache_dir`.
+
+    Parameters
+    ----------
+    root : `pathlib.Path`
+        Root directory of the project.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self.settings_key = cache.hash_key(
+            bones_version,
+            _checker_versions(),
+            [
+                tools.probe_key(tool, cwd=root)
+                for tool in ("pylint", "flake8", "codespell")
+            ],
+            [pylint_disable, flake8_ignore],
+        )
+        self.cache = cache.shared_cache(cache.cache_dir("checks"), checker_cache_size)
+        self._configs = {}
+
+    def _key(self, checker, fname, source):
+        # the filename is included as given, since it appears in the messages
+        return cache.hash_key(
+            self.settings_key,
+            checker,
+            str(fname),
+            _path_key(fname, self.root, self._configs),
+            source,
+        )
+
+    def get(self, checker, fname, source):
+        """
+        Look up the result of a checker.
+
+        Parameters
+        ----------
+        checker : str
+            Identifies the checker and the way it was run.
+        fname : str or `pathlib.Path`
+            Filename of the notebook.
+        source : str
+            The source that was checked.
+
+        Returns
+        -------
+        result : tuple or None
+            Whether the checks passed, and the messages describing any errors (a
+            list of str), or None if the checker has not checked this source.
+        """
+
+        result = self.cache.get_json(self._key(checker, fname, source))
+        return None if result is None else tuple(result)
+
+    def put(self, checker, fname, source, passed, messages):
+        """
+        Record the result of a checker.
+
+        Parameters
+        ----------
+        checker : str
+            Identifies the checker and the way it was run.
+        fname : str or `pathlib.Path`
+            Filename of the notebook.
+        source : str
+            The source that was checked.
+        passed : bool
+            Whether the checks passed.
+        messages : list of str
+            Messages describing any errors.
+        """
+
+        self.cache.put_json(self._key(checker, fname, source), [passed, messages])
+
+
+def _path_key(fname, root, configs):
+    # the path of a notebook within the project, and the checker config files that
+    # apply to it (see `_dir_configs`)
+    path = Path(fname).resolve()
+    try:
+        relative = path.relative_to(root)
+    except ValueError:
+        relative = path
+    return relative.as_posix(), _dir_configs(path.parent, root, configs)
+
+
+def _dir_configs(dname, root, configs):
+    # contents of the checker config files in a directory and its parents (up to the
+    # project root, or the filesystem root for files outside the project), memoized
+    # in `configs`
+    if dname not in configs:
+        contents = [_read_config(dname / name) for name in checker_config_files]
+        if dname not in (root, dname.parent):
+            contents.extend(_dir_configs(dname.parent, root, configs))
+        configs[dname] = contents
+    return configs[dname]
+
+
+@functools.lru_cache(maxsize=None)
+def _checker_versions():
+    # versions of the static checkers (if they are installed as Python packages)
+    versions = []
+    for package in ("pylint", "flake8", "codespell"):
+        try:
+            versions.append(importlib.metadata.version(package))
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def _read_config(path):
+    try:
+        return path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def format_file(
+    fname,
+    target_version=4,
+    verbose=False,
+    check=False,
+    prettier=None,
+    project=None,
+    echo=click.secho,
+    static_checker=None,
+    checker_pool=None,
+    verified=None,
+    incremental=False,
+    checker_results=None,
+):
+    """
+    Formats a file containing a Jupyter notebook.
+
+    If ``verified`` (see `.VerifiedNotebooks`) is given, notebooks that have been
+    verified before are skipped, and notebooks that are formatted (or, with
+    ``check``, already formatted) are marked as verified.
+
+    With ``incremental=True``, only cells that have changed since the notebook was
+    last formatted are formatted, and with ``checker_results``, only the static
+    checks whose source has changed are run (see `.format_notebook`).
+    """
 
     with open(fname, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+        text = f.read()
+
+    if verified is not None and verified.is_verified(fname, text):
+        if verbose:
+            echo(f"'{fname}' has not changed since it was last verified")
+        return True
+
+    # nbformat is slow to import, so we only import it when it is needed
+    import nbformat  # pylint: disable=import-outside-toplevel
+
+    nb = nbformat.reads(text, as_version=4)
 
     if check:
         current = nbformat.writes(nb).splitlines()
 
-    passed = format_notebook(nb, fname, verbose=verbose, prettier=prettier)
+    passed = format_notebook(
+        nb,
+        fname,
+        verbose=verbose,
+        prettier=prettier,
+        project=project,
+        echo=echo,
+        static_checker=static_checker,
+        checker_pool=checker_pool,
+        incremental=incremental,
+        checker_results=checker_results,
+    )
 
     if check:
         diff = list(
@@ -304,19 +1085,25 @@ def format_file(fname, target_version=4, verbose=False, check=False, prettier=No
         )
 
         if len(diff) > 0:
-            click.secho(
+            echo(
                 f"{fname} has not been formatted; please run `bones format-notebook`",
                 fg="red",
             )
             if verbose:
-                click.echo("\nFull diff")
-                click.echo("=========")
+                echo("\nFull diff")
+                echo("=========")
                 for line in diff:
-                    click.echo(line.strip("\n"))
+                    echo(line.strip("\n"))
             passed = False
     else:
         with open(fname, "w", encoding="utf-8") as f:
             nbformat.write(nb, f, version=target_version)
+        if verified is not None:
+            with open(fname, "r", encoding="utf-8") as f:
+                text = f.read()
+
+    if passed and verified is not None:
+        verified.add(fname, text)
 
     return passed
 
@@ -325,37 +1112,170 @@ def format_dir(dname, **kwargs):
     """Format all notebooks in a directory."""
 
     assert dname.is_dir()
-    str_dname = str(dname)
-    if str_dname.endswith(".ipynb_checkpoints") or str_dname.endswith("_build"):
-        click.echo(f"Ignoring directory '{dname}'")
-        return True
-
-    return format_paths(
-        [
-            fpath
-            for fpath in dname.glob("[!.]*")
-            if fpath.is_dir() or fpath.suffix == ".ipynb"
-        ],
-        **kwargs,
-    )
+    return format_paths([dname], **kwargs)
 
 
-def format_paths(fnames, **kwargs):
-    """Format all notebooks in list of notebook files and directories."""
+def _ignore_dir(dname, echo=click.secho):
+    echo(f"Ignoring directory '{dname}'")
+    return True
 
-    passed = True
 
+def _format_tasks(fnames, kwargs):
+    # a task for each notebook (and ignored directory), in the order they are found,
+    # along with the notebook filename (None for ignored directories)
     for fname in fnames:
         fname = Path(fname)
-        if fname.is_dir():
-            passed &= format_dir(fname, **kwargs)
+        if not fname.is_dir():
+            yield fname, functools.partial(format_file, fname, **kwargs)
+        elif str(fname).endswith(".ipynb_checkpoints") or str(fname).endswith("_build"):
+            yield None, functools.partial(_ignore_dir, fname)
         else:
-            passed &= format_file(fname, **kwargs)
+            yield from _format_tasks(
+                [
+                    fpath
+                    for fpath in fname.glob("[!.]*")
+                    if fpath.is_dir() or fpath.suffix == ".ipynb"
+                ],
+                kwargs,
+            )
+
+
+def _buffered(task):
+    # run a task, collecting its messages to be printed later
+    messages = []
+    passed = task(echo=lambda *args, **kwargs: messages.append((args, kwargs)))
+    return passed, messages
+
+
+def _run_task(task):
+    # run a task in a worker process (see `_run_tasks`), also returning the copies of
+    # the verified notebooks and static checker that the task added notebooks to
+    passed, messages = _buffered(task)
+    keywords = getattr(task, "keywords", {})
+    return passed, messages, keywords.get("verified"), keywords.get("static_checker")
+
 
+def _run_tasks(tasks, jobs, verified=None, static_checker=None):
+    # run tasks in `jobs` processes, returning their results and buffered messages
+    if jobs == 1:
+        return [_buffered(task) for task in tasks]
+
+    # formatting is mostly done in-process (by black), so threads would be limited by
+    # the GIL; each task gets a copy of its arguments in a worker process, so the
+    # notebooks that tasks add to `verified` and `static_checker` are copied back
+    outputs = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for passed, messages, task_verified, task_checker in pool.map(_run_task, tasks):
+            if verified is not None and task_verified is not None:
+                verified.update(task_verified)
+            if static_checker is not None and task_checker is not None:
+                static_checker.update(task_checker)
+            outputs.append((passed, messages))
+    return outputs
+
+
+def _echo_outputs(fnames, outputs, verified=None):
+    # print the buffered messages from tasks (see `_buffered`), in order, recording
+    # the notebooks that passed as verified
+    passed = True
+    for fname, (task_passed, messages) in zip(fnames, outputs):
+        for args, options in messages:
+            click.secho(*args, **options)
+        if task_passed and fname is not None and verified is not None:
+            verified.commit(fname)
+        passed &= task_passed
     return passed
 
 
-@bones.command(name="format-notebook")
+def format_paths(fnames, jobs=1, batch=False, use_cache=False, **kwargs):
+    """
+    Format all notebooks in list of notebook files and directories.
+
+    With ``jobs`` greater than 1, up to that many notebooks are formatted
+    concurrently (in separate processes). The messages for each notebook are
+    printed together, in the same order as when formatting serially.
+
+    With ``batch=True``, the static checks for all notebooks are run together
+    once the notebooks have been formatted (see `.StaticChecker`), rather than
+    separately for each notebook.
+
+    With ``use_cache=True``, notebooks that have been verified as formatted and
+    lint-clean by a previous run are skipped (see `.VerifiedNotebooks`). In other
+    notebooks, only the cells that have changed since they were last formatted are
+    formatted (see `.FormattedCells`), and only the static checkers whose source
+    has changed are run (see `.CheckerResults`).
+    """
+
+    project = kwargs.get("project")
+    if project is None and (batch or use_cache):
+        project = Project()
+    root = None if project is None else project.root
+
+    verified = None
+    checker_results = None
+    if use_cache:
+        verified = VerifiedNotebooks(
+            root,
+            prettier=kwargs.get("prettier", False),
+            target_version=kwargs.get("target_version", 4),
+        )
+        checker_results = CheckerResults(root)
+        kwargs = {
+            **kwargs,
+            "verified": verified,
+            "incremental": True,
+            "checker_results": checker_results,
+        }
+
+    if not batch:
+        if jobs > 1:
+            # each worker process runs the static checks for its notebooks
+            tasks = list(_format_tasks(fnames, kwargs))
+            outputs = _run_tasks([task for _, task in tasks], jobs, verified=verified)
+            return _echo_outputs([fname for fname, _ in tasks], outputs, verified)
+
+        # the static checks for each notebook are run on a pool shared by all
+        # notebooks
+        with ThreadPoolExecutor(max_workers=3) as checker_pool:
+            kwargs = {**kwargs, "checker_pool": checker_pool}
+            tasks = list(_format_tasks(fnames, kwargs))
+            passed = True
+            for fname, task in tasks:
+                task_passed = task(echo=click.secho)
+                if task_passed and fname is not None and verified is not None:
+                    verified.commit(fname)
+                passed &= task_passed
+            return passed
+
+    static_checker = StaticChecker(cwd=root, results=checker_results)
+    tasks = list(_format_tasks(fnames, {**kwargs, "static_checker": static_checker}))
+    outputs = _run_tasks(
+        [task for _, task in tasks],
+        jobs,
+        verified=verified,
+        static_checker=static_checker,
+    )
+    results = static_checker.run()
+
+    # add the static check errors to the output for each notebook
+    for i, (fname, _) in enumerate(tasks):
+        if fname is not None and str(fname) in results:
+            checks_passed, check_messages = results[str(fname)]
+            outputs[i] = (
+                outputs[i][0] and checks_passed,
+                outputs[i][1] + [((message,), {}) for message in check_messages],
+            )
+
+    # output from the checkers that could not be attributed to any notebook
+    fnames = [fname for fname, _ in tasks]
+    if None in results:
+        fnames.append(None)
+        outputs.append((False, [((message,), {}) for message in results[None][1]]))
+
+    return _echo_outputs(fnames, outputs, verified)
+
+
+@click.command(name="format-notebook")
 @click.argument("files", required=True, nargs=-1)
 @click.option("--target-version", default=4, help="Version of notebook format to save.")
 @click.option(
@@ -371,14 +1291,58 @@ def format_paths(fnames, **kwargs):
     default=False,
     help="Enable/disable markdown cell formatting with Prettier.",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of notebooks to format concurrently.",
+)
+@click.option(
+    "--batch/--no-batch",
+    default=False,
+    help="Run each static checker once on all notebooks (rather than once for "
+    "each notebook).",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="Skip notebooks that have been verified as formatted and lint-clean, and "
+    "cells that have been formatted, by a previous run.",
+)
 def main(files, **kwargs):
-    """Apply standardized formatting to Jupyter notebooks."""
+    """
+    Apply standardized formatting to Jupyter notebooks.
+
+    With ``--jobs N``, up to ``N`` notebooks are formatted (and checked)
+    concurrently, in separate processes. The output for each notebook is printed
+    together, in the same order as when formatting serially.
+
+    With ``--batch``, the static checks (pylint, flake8 and codespell) are run
+    once on the code from all of the notebooks, after they have been formatted,
+    with errors reported by notebook and cell (rather than being run separately
+    for each notebook). The code is checked in temporary ``.py`` files written
+    next to the notebooks, so settings that match on the notebook's filename or
+    extension (rather than its directory) do not apply to them.
+
+    Notebooks that have been verified as formatted and lint-clean are recorded in
+    a cache (in the ``notebooks`` subdirectory of ``$NENGO_BONES_CACHE_DIR``), and
+    skipped until they (or the tools and settings used to check them) change. In
+    other notebooks, only the cells that have changed since they were last
+    formatted are formatted again, and each static checker is only run again if
+    the cells it checks have changed. Use ``--no-cache`` to format and check all
+    notebooks.
+    """
+
+    project = Project()
 
-    if kwargs["prettier"] and not HAS_PRETTIER:
+    if kwargs["prettier"] and not tools.has_tool("prettier", cwd=project.root):
         # user explicitly asked for prettier, but it is not installed, so fail
         raise ValueError("Cannot format markdown with Prettier; it is not installed.")
 
-    passed = format_paths(files, **kwargs)
+    passed = format_paths(files, project=project, **kwargs)
 
     if not passed:
         sys.exit(1)
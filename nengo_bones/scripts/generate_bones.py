@@ -1,15 +1,28 @@
 """Scripts for auto-generating nengo-bones files."""
 
+import copy
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import click
 
-from nengo_bones import __version__, all_sections
-from nengo_bones.config import find_config, load_config
-from nengo_bones.scripts.base import bones
+from nengo_bones import __version__, all_sections, cache, watch
+from nengo_bones.project import Project, find_projects
 from nengo_bones.scripts.check_notice import check_notice
-from nengo_bones.templates import BonesTemplate, load_env
+from nengo_bones.templates import BonesTemplate
+
+# sections generating Python files, in the order they are generated. The formatters
+# read their settings from (and check which modules exist in) the project, so these
+# are generated after all other files (and version.py, which may create the package,
+# before the files that import it), so that they are formatted with the same
+# settings as when they are checked.
+python_sections = ("version_py", "docs_conf_py", "setup_py")
+
+# maximum size of the cache of manifests (in bytes)
+manifest_cache_size = 2**20
 
 
 def render_template(ctx, output_file):
@@ -23,19 +36,251 @@ def render_template(ctx, output_file):
     output_file : str
         Filename for the rendered output file.
     """
-    template = BonesTemplate(output_file, ctx.obj["env"])
-    template.render_to_file(
-        ctx.obj["output_dir"],
+    project = ctx.obj["project"]
+    template = BonesTemplate(
+        output_file, ctx.obj["env"], root=project.root, formatter=project.formatter
+    )
+    generate_file(
+        ctx,
+        template,
         version=__version__,
         **template.get_render_data(ctx.obj["config"]),
     )
 
 
-@bones.group(name="generate", invoke_without_command=True)
-@click.option("--conf-file", default=None, help="Filepath for config file")
+def manifest_key(output_dir):
+    """
+    Find the key of the manifest recording the inputs of the files generated in a
+    directory.
+
+    Manifests are stored in the ``generate`` subdirectory of `.cache_dir`, as a
+    `.ContentCache` (so the manifests of directories that have not been generated
+    recently are eventually removed).
+
+    Parameters
+    ----------
+    output_dir : str
+        Directory containing the generated files.
+
+    Returns
+    -------
+    key : str
+        Key of the manifest in `.manifest_cache`.
+    """
+
+    return cache.hash_key(str(Path(output_dir).resolve()))
+
+
+def manifest_cache():
+    """Get the cache in which manifests are stored (see `.manifest_key`)."""
+
+    return cache.shared_cache(cache.cache_dir("generate"), manifest_cache_size)
+
+
+def _file_state(path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def outdated_reason(entry, inputs, output_path):
+    """
+    Determine why a generated file needs to be regenerated.
+
+    Parameters
+    ----------
+    entry : dict or None
+        The manifest entry recorded when the file was last generated.
+    inputs : dict or None
+        The current inputs of the file (see `.BonesTemplate.input_hashes`).
+    output_path : `pathlib.Path`
+        Path of the generated file.
+
+    Returns
+    -------
+    reason : str or None
+        Why the file needs to be regenerated, or None if it is up to date.
+    """
+
+    if entry is None:
+        return "not previously generated"
+    if not output_path.exists():
+        return "file is missing"
+    if _file_state(output_path) != entry["file"]:
+        return "file was modified"
+    if inputs is None:
+        return "template dependencies are dynamic"
+
+    changed = sorted(
+        name
+        for name in set(inputs) | set(entry["inputs"])
+        if inputs.get(name) != entry["inputs"].get(name)
+    )
+    if len(changed) > 0:
+        return f"{', '.join(changed)} changed"
+
+    return None
+
+
+def generate_file(ctx, template, output_name=None, **data):
+    """
+    Render a template to file, unless the file is already up to date.
+
+    A file is up to date if none of its inputs have changed since it was last
+    generated (as recorded in the manifest), and it has not been modified since.
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    template : `.BonesTemplate`
+        The template to render.
+    output_name : str, optional
+        An alternative filename for the rendered file.
+    data : dict
+        Will be passed on to the ``render`` function.
+    """
+
+    output_path = template.output_path(ctx.obj["output_dir"], output_name, **data)
+    key = str(output_path.resolve())
+    formatted = output_path.suffix == ".py"
+    if formatted != ctx.obj["formatting"]:
+        # the formatters read their settings from the config files, so formatted
+        # files must see all the (unformatted) files rendered before them, and
+        # unformatted files cannot be rendered while formatted files are (formatted
+        # files do not change the settings, so can be rendered concurrently)
+        wait_for_renders(ctx)
+        ctx.obj["formatting"] = formatted
+    if formatted and not output_path.parent.exists():
+        # the formatters also check which modules exist in the project, so we create
+        # any new package before anything else is formatted
+        wait_for_renders(ctx)
+        output_path.parent.mkdir(parents=True)
+    inputs = template.input_hashes(**data)
+
+    if ctx.obj["force"]:
+        reason = "forced"
+    else:
+        reason = outdated_reason(ctx.obj["manifest"].get(key), inputs, output_path)
+    if reason is None:
+        ctx.obj["up_to_date"] += 1
+        return
+
+    ctx.obj["echo"](f"Generating {output_path} ({reason})")
+    ctx.obj["generated"] += 1
+
+    def render():
+        template.render_to_file(ctx.obj["output_dir"], output_name=output_name, **data)
+        ctx.obj["manifest"][key] = {
+            "inputs": inputs,
+            "file": _file_state(output_path),
+        }
+
+    submit(ctx, render)
+
+
+def submit(ctx, func, *args, **kwargs):
+    """
+    Run a rendering task, on the worker pool if ``--jobs`` is greater than 1.
+
+    Tasks run on the pool must not print any output or depend on one another,
+    since they may run in any order. Their results are collected (in the order
+    they were submitted) by `.finish`.
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    func : callable
+        The task to run.
+    args : list
+        Positional arguments passed to ``func``.
+    kwargs : dict
+        Keyword arguments passed to ``func``.
+    """
+
+    if ctx.obj["pool"] is None:
+        func(*args, **kwargs)
+    else:
+        ctx.obj["pending"].append(ctx.obj["pool"].submit(func, *args, **kwargs))
+
+
+def wait_for_renders(ctx):
+    """
+    Wait for all rendering tasks submitted with `.submit` to complete.
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    """
+
+    for future in ctx.obj["pending"]:
+        future.result()
+
+
+def after_render(ctx, func, *args, **kwargs):
+    """
+    Run a task once all rendering tasks submitted with `.submit` are complete.
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    func : callable
+        The task to run.
+    args : list
+        Positional arguments passed to ``func``.
+    kwargs : dict
+        Keyword arguments passed to ``func``.
+    """
+
+    if ctx.obj["pool"] is None:
+        func(*args, **kwargs)
+    else:
+        ctx.obj["after_render"].append((func, args, kwargs))
+
+
+@click.group(name="generate", invoke_without_command=True)
+@click.option(
+    "--conf-file",
+    "conf_files",
+    multiple=True,
+    help="Filepath for config file (can be given several times, to generate the "
+    "files of several projects).",
+)
+@click.option(
+    "--all",
+    "all_projects",
+    is_flag=True,
+    help="Generate the files of every project (directory containing a "
+    ".nengobones.yml file) within the current directory.",
+)
 @click.option("--output-dir", default=".", help="Output directory for scripts")
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of files to render concurrently.",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Regenerate all files, even if their inputs have not changed.",
+)
+@click.option(
+    "--watch",
+    "watch_files",
+    is_flag=True,
+    help="Keep running, and regenerate files whenever the config file or templates "
+    "change.",
+)
 @click.pass_context
-def main(ctx, conf_file, output_dir):
+def main(ctx, conf_files, all_projects, output_dir, jobs, force, watch_files):
     """
     Loads config file and sets up template environment.
 
@@ -61,31 +306,264 @@ def main(ctx, conf_file, output_dir):
        Additional license info
        =======================
        ...
+
+    Files are only regenerated if their inputs (the config, the templates and
+    the NengoBones version) have changed since they were last generated, or if
+    they have been modified since then; the reason for regenerating each file is
+    printed. Use ``--force`` to regenerate all files.
+
+    With ``--jobs N``, up to ``N`` files are rendered and formatted concurrently.
+    The generated files (and any messages) are the same as when rendering
+    serially.
+
+    With ``--watch``, this keeps running after generating the files, and whenever
+    the config file or a template in the ``.templates`` folder changes, the files
+    that depend on it are regenerated. The config, templates and formatters are
+    kept loaded between changes, so files are regenerated quickly.
+
+    With ``--all`` (or several ``--conf-file`` options), the files of several
+    projects (e.g. the packages in a monorepo) are generated in one run. Each
+    project's files are generated in its own directory (containing its config
+    file), with ``--output-dir`` relative to that directory, and its templates
+    are loaded from the ``.templates`` folder there. The projects share the loaded
+    templates and formatters, and with ``--jobs N``, up to ``N`` projects are
+    generated concurrently (with the output of each project printed together, in
+    order).
     """
 
     ctx.ensure_object(dict)
 
-    config = load_config(conf_file)
+    if all_projects or len(conf_files) > 1:
+        if watch_files:
+            raise click.UsageError("--watch can only be used with a single project")
+        conf_files = [Path(conf_file) for conf_file in conf_files]
+        if all_projects:
+            conf_files += [project.conf_file for project in find_projects()]
+        generate_projects(
+            conf_files, _sections(ctx), output_dir=output_dir, jobs=jobs, force=force
+        )
+        # the projects have been generated, so we do not run the subcommand
+        ctx.exit()
 
     Path(output_dir).mkdir(exist_ok=True)
 
-    ctx.obj["config"] = config
+    ctx.obj["conf_file"] = conf_files[0] if len(conf_files) > 0 else None
+    ctx.obj["root"] = None
+    ctx.obj["echo"] = click.secho
     ctx.obj["output_dir"] = output_dir
-    ctx.obj["env"] = load_env()
+    ctx.obj["jobs"] = jobs
+    ctx.obj["pool"] = None
+    ctx.obj["force"] = force
+    ctx.obj["watch"] = watch_files
+    ctx.obj["manifest"] = manifest_cache().get_json(
+        manifest_key(output_dir), default={}
+    )
+    start_run(ctx)
+    config = ctx.obj["config"]
+    if jobs > 1:
+        ctx.obj["pool"] = ThreadPoolExecutor(max_workers=jobs)
+        ctx.call_on_close(ctx.obj["pool"].shutdown)
+
+    for cfg_name in _sections(ctx):
+        if cfg_name in config:
+            if ctx.invoked_subcommand is None:
+                ctx.invoke(globals()[cfg_name])
+        else:
+            click.echo(f"No config entry detected for {cfg_name}, skipping")
+            if ctx.invoked_subcommand is not None:
+                sys.exit(1)
 
-    def check_cfg(name):
-        name = name.replace("-", "_")
-        if name not in config:
-            click.echo(f"No config entry detected for {name}, skipping")
-            return False
-        return True
 
+def _sections(ctx):
+    # the config sections to generate (all of them, unless a subcommand was given)
     if ctx.invoked_subcommand is None:
-        for cfg_name in all_sections:
-            if check_cfg(cfg_name):
-                ctx.invoke(globals()[cfg_name])
-    elif not check_cfg(ctx.invoked_subcommand):
-        sys.exit(1)
+        return [
+            section for section in all_sections if section not in python_sections
+        ] + list(python_sections)
+    return [ctx.invoked_subcommand.replace("-", "_")]
+
+
+def generate_projects(conf_files, sections, *, output_dir=".", jobs=1, force=False):
+    """
+    Generate the files of several projects.
+
+    Parameters
+    ----------
+    conf_files : list of `pathlib.Path`
+        The config files of the projects.
+    sections : list of str
+        The config sections to generate (sections that are not in a project's
+        config are skipped).
+    output_dir : str
+        Output directory, relative to the directory containing each config file.
+    jobs : int
+        Number of projects to generate concurrently.
+    force : bool
+        Regenerate all files, even if their inputs have not changed.
+    """
+
+    if len(conf_files) == 0:
+        raise click.ClickException("Could not find any .nengobones.yml files")
+
+    # duplicates (e.g. from --all and --conf-file) would be generated concurrently
+    conf_files = list(
+        dict.fromkeys(Path(conf_file).resolve() for conf_file in conf_files)
+    )
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(
+                _generate_project,
+                conf_file,
+                sections,
+                output_dir=output_dir,
+                force=force,
+            )
+            for conf_file in conf_files
+        ]
+
+        # print the output of each project in order, as soon as it is available
+        for future in futures:
+            for args, kwargs in future.result():
+                click.secho(*args, **kwargs)
+
+
+def _generate_project(conf_file, sections, *, output_dir, force):
+    messages = []
+    project_dir = Path(os.path.relpath(conf_file.parent))
+    output_dir = project_dir / output_dir
+    output_dir.mkdir(exist_ok=True)
+
+    ctx = click.Context(main, obj={})
+    ctx.obj["conf_file"] = conf_file
+    ctx.obj["root"] = conf_file.parent
+    ctx.obj["echo"] = lambda *args, **kwargs: messages.append((args, kwargs))
+    ctx.obj["output_dir"] = str(output_dir)
+    ctx.obj["jobs"] = 1
+    ctx.obj["pool"] = None
+    ctx.obj["force"] = force
+    ctx.obj["watch"] = False
+    ctx.obj["manifest"] = manifest_cache().get_json(
+        manifest_key(output_dir), default={}
+    )
+
+    ctx.obj["echo"](f"Project in {project_dir}:")
+    with ctx:
+        start_run(ctx)
+        for section in sections:
+            if section in ctx.obj["config"]:
+                ctx.invoke(globals()[section])
+            else:
+                ctx.obj["echo"](f"No config entry detected for {section}, skipping")
+        finish_run(ctx)
+    return messages
+
+
+def start_run(ctx):
+    """
+    Load the project, and prepare to generate files.
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    """
+
+    project = Project(ctx.obj["conf_file"], root=ctx.obj["root"])
+    ctx.obj["project"] = project
+    ctx.obj["config"] = project.config
+    ctx.obj["env"] = project.env
+    ctx.obj["pending"] = []
+    ctx.obj["formatting"] = False
+    ctx.obj["after_render"] = []
+    ctx.obj["generated"] = 0
+    ctx.obj["up_to_date"] = 0
+
+
+@main.result_callback()
+@click.pass_context
+def finish(ctx, *_, **__):
+    """Wait for all rendering tasks to complete, and run any follow-up tasks."""
+
+    finish_run(ctx)
+
+    if ctx.obj["watch"]:
+        watch_project(ctx)
+
+
+def finish_run(ctx):
+    """
+    Wait for all rendering tasks to complete, and run any follow-up tasks.
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    """
+
+    # collect results in submission order, so that errors are deterministic
+    wait_for_renders(ctx)
+
+    if ctx.obj["generated"] > 0:
+        manifest_cache().put_json(
+            manifest_key(ctx.obj["output_dir"]), ctx.obj["manifest"]
+        )
+    if ctx.obj["up_to_date"] > 0:
+        ctx.obj["echo"](f"{ctx.obj['up_to_date']} file(s) already up to date")
+
+    for func, args, kwargs in ctx.obj["after_render"]:
+        func(*args, **kwargs)
+
+
+def watch_project(ctx, watcher=None):
+    """
+    Regenerate files whenever the config file or templates change.
+
+    Only the files whose inputs have changed are regenerated (see
+    `.generate_file`). This runs until interrupted (e.g. with Ctrl+C).
+
+    Parameters
+    ----------
+    ctx : `click.Context`
+        CLI context, containing information specified upstream.
+    watcher : `.Watcher`, optional
+        Watcher used to detect changes (if None, will use the one returned by
+        `.watch.watcher`).
+    """
+
+    project = ctx.obj["project"]
+    if watcher is None:
+        watcher = watch.watcher(
+            files=[project.conf_file], directories=[Path(".templates").resolve()]
+        )
+    sections = _sections(ctx)
+
+    click.echo(
+        f"Watching {project.conf_file.name} and .templates for changes "
+        "(press Ctrl+C to stop)"
+    )
+    with watcher:
+        try:
+            while True:
+                changed = watcher.wait()
+                names = ", ".join(sorted(str(path.name) for path in changed))
+                click.echo(f"\nDetected changes to {names}")
+
+                start = time.perf_counter()
+                # --force only applies to the first run
+                ctx.obj["force"] = False
+                try:
+                    start_run(ctx)
+                    for section in sections:
+                        if section in ctx.obj["config"]:
+                            ctx.invoke(globals()[section])
+                    finish_run(ctx)
+                except Exception as e:  # pylint: disable=broad-except
+                    # keep watching, so that the error can be fixed
+                    click.secho(f"Error: {e}", fg="red")
+                    continue
+                click.echo(f"Finished in {time.perf_counter() - start:.2f}s")
+        except KeyboardInterrupt:
+            click.echo("Stopped watching")
 
 
 @main.command()
@@ -95,13 +573,23 @@ def ci_scripts(ctx):
 
     config = ctx.obj["config"]
     for params in config["ci_scripts"]:
+        # copy the data, so that the config is not modified while (possibly
+        # concurrently) rendering the scripts
+        params = copy.deepcopy(params)
         script_name = params.pop("template")
         output_file = params.pop("output_name", script_name)
-        BonesTemplate(f"{script_name}.sh", ctx.obj["env"]).render_to_file(
-            ctx.obj["output_dir"],
+        template = BonesTemplate(
+            f"{script_name}.sh",
+            ctx.obj["env"],
+            root=ctx.obj["project"].root,
+            formatter=ctx.obj["project"].formatter,
+        )
+        generate_file(
+            ctx,
+            template,
             output_name=f"{output_file}.sh",
             # pass top-level config and script-specific params
-            **{**config, **params},
+            **copy.deepcopy({**config, **params}),
         )
 
 
@@ -113,8 +601,14 @@ def license_rst(ctx):
     render_template(ctx, "LICENSE.rst")
 
     if ctx.obj["config"]["license_rst"]["add_to_files"]:
-        check_notice(
-            find_config().parent, ctx.obj["config"]["license_rst"]["text"], fix=True
+        # this modifies python files, so wait until they have all been rendered
+        after_render(
+            ctx,
+            check_notice,
+            ctx.obj["project"].root,
+            ctx.obj["config"]["license_rst"]["text"],
+            fix=True,
+            echo=ctx.obj["echo"],
         )
 
 
@@ -4,7 +4,6 @@ import click
 import requests
 
 from nengo_bones.config import load_config
-from nengo_bones.scripts.base import bones
 
 
 def get_issue_count(repo):
@@ -16,7 +15,7 @@ def get_issue_count(repo):
     return int(response.json()[0]["number"])
 
 
-@bones.command(name="pr-number")
+@click.command(name="pr-number")
 @click.argument("repo", required=False, default=None)
 @click.option("--conf-file", default=None, help="Filepath for config file")
 def main(repo, conf_file):
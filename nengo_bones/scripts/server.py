@@ -0,0 +1,520 @@
+"""
+Runs ``bones`` commands in a persistent server process.
+
+Most of the time taken by a command like ``bones check`` is spent starting the
+interpreter, importing black/jinja2/nbformat/yaml, parsing ``.nengobones.yml``
+and building the jinja environment. The server does all of that once and then
+keeps it warm, executing commands forwarded from the ``bones`` command line over a
+local unix socket and streaming their output back.
+
+The socket is only accessible to the user running the server, and the server only
+accepts connections from that user (where the platform lets us check), since
+forwarded commands run as that user. Clients that cannot get a response from the
+server quickly (e.g. because it is busy running another command) run the command
+themselves instead.
+
+Note that this module is imported whenever ``bones`` is run from the command line,
+so it should not import anything expensive at the top level.
+"""
+
+import io
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import click
+
+from nengo_bones.cache import cache_dir
+from nengo_bones.version import version
+
+# commands that will be sent to the server, if it is running
+forwarded_commands = ("check", "format-notebook", "generate")
+
+# seconds that a client waits for the server to accept its connection before
+# running the command itself
+ready_timeout = 1.0
+
+# seconds that the server waits on a client (to send its request or receive output)
+client_timeout = 10.0
+
+# message types sent between the client and server
+_READY = b"y"
+_REQUEST = b"r"
+_STATUS = b"?"
+_STOP = b"s"
+_STDOUT = b"o"
+_STDERR = b"e"
+_EXIT = b"x"
+_REJECTED = b"n"
+_HEADER = struct.Struct("!cI")
+
+
+def socket_path():
+    """
+    Find the socket on which the server listens.
+
+    This is read from the ``NENGO_BONES_SERVER_SOCKET`` environment variable if
+    it is set, otherwise the socket is placed in the NengoBones cache directory.
+    """
+
+    path = os.environ.get("NENGO_BONES_SERVER_SOCKET")
+    # this is called every time ``bones`` is run, so we do not create the cache
+    # directory here (the server creates it when it starts)
+    return cache_dir(create=False) / "server.sock" if path is None else Path(path)
+
+
+def _send(sock, kind, payload=b""):
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _recv(sock):
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None, None
+    kind, size = _HEADER.unpack(header)
+    payload = _recv_exact(sock, size)
+    return (None, None) if payload is None else (kind, payload)
+
+
+def _connect(path, timeout=None):
+    """
+    Connect to the server, and wait until it is ready to receive a request.
+
+    Returns None if there is no server, or if it does not respond within
+    ``timeout`` seconds (in which case the server will not run anything for this
+    connection, since no request has been sent).
+    """
+
+    if not hasattr(socket, "AF_UNIX") or not path.exists():
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        kind, _ = _recv(sock)
+    except OSError:
+        kind = None
+    if kind != _READY:
+        sock.close()
+        return None
+    return sock
+
+
+def _peer_uid(conn):
+    """Find the user on the other end of a socket (None if we cannot tell)."""
+
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = struct.Struct("3i")
+    _, uid, _ = creds.unpack(
+        conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, creds.size)
+    )
+    return uid
+
+
+def forward(argv):
+    """
+    Run a command on the server, if one is running.
+
+    Parameters
+    ----------
+    argv : list of str
+        Command line arguments (not including the program name).
+
+    Returns
+    -------
+    exit_code : int or None
+        The exit code of the command, or None if the command was not run by the
+        server (and should be run in the current process instead).
+    """
+
+    if (
+        os.environ.get("NENGO_BONES_NO_SERVER")
+        or len(argv) == 0
+        or argv[0] not in forwarded_commands
+        # long-running commands would tie up the server
+        or "--watch" in argv
+    ):
+        return None
+
+    sock = _connect(socket_path(), timeout=ready_timeout)
+    if sock is None:
+        return None
+    # once the server has accepted the connection, commands can take as long as
+    # they need
+    sock.settimeout(None)
+
+    request = {
+        "argv": list(argv),
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+        "executable": sys.executable,
+        "version": version,
+        "tty": {"stdout": sys.stdout.isatty(), "stderr": sys.stderr.isatty()},
+    }
+    outputs = {_STDOUT: sys.stdout, _STDERR: sys.stderr}
+
+    started = False
+    with sock:
+        try:
+            _send(sock, _REQUEST, json.dumps(request).encode("utf-8"))
+            while True:
+                kind, payload = _recv(sock)
+                if kind in outputs:
+                    started = True
+                    stream = outputs[kind]
+                    stream.buffer.write(payload)
+                    stream.flush()
+                elif kind == _EXIT:
+                    return int(payload)
+                elif kind == _REJECTED or not started:
+                    return None
+                else:
+                    break
+        except OSError:
+            if not started:
+                return None
+
+    click.secho("Lost connection to the bones server", fg="red", err=True)
+    return 1
+
+
+class _SocketWriter(io.RawIOBase):
+    """Raw stream that sends everything written to it over a socket."""
+
+    def __init__(self, sock, kind, tty, lock):
+        super().__init__()
+        self.sock = sock
+        self.kind = kind
+        self.tty = tty
+        self.lock = lock
+        self.broken = False
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self.tty
+
+    def write(self, b):
+        data = bytes(b)
+        if not self.broken:
+            try:
+                with self.lock:
+                    _send(self.sock, self.kind, data)
+            except OSError:
+                # the client went away; keep going so that the command can finish
+                self.broken = True
+        return len(data)
+
+
+def _run_request(conn, bones, request):
+    """Run a forwarded command, sending its output back to the client."""
+
+    lock = threading.Lock()
+    streams = {
+        name: io.TextIOWrapper(
+            _SocketWriter(conn, kind, request["tty"][name], lock),
+            encoding="utf-8",
+            errors="replace",
+            write_through=True,
+        )
+        for name, kind in (("stdout", _STDOUT), ("stderr", _STDERR))
+    }
+
+    saved_cwd = os.getcwd()
+    saved_env = dict(os.environ)
+    saved_streams = sys.stdout, sys.stderr
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.stdout, sys.stderr = streams["stdout"], streams["stderr"]
+
+        try:
+            bones.main(args=request["argv"], prog_name="bones")
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                exit_code = 0 if e.code is None else e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            exit_code = 1
+    finally:
+        for stream in streams.values():
+            stream.flush()
+        sys.stdout, sys.stderr = saved_streams
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+
+    return exit_code
+
+
+def _handle_connection(conn, bones, stats):
+    """
+    Respond to a single client connection.
+
+    Returns False if the server should shut down.
+    """
+
+    peer_uid = _peer_uid(conn)
+    if peer_uid is not None and peer_uid != os.getuid():
+        # only the user running the server can run commands on it
+        return True
+
+    # a client that stops responding should not block other clients
+    conn.settimeout(client_timeout)
+    try:
+        return _handle_request(conn, bones, stats)
+    except OSError:
+        return True
+
+
+def _handle_request(conn, bones, stats):
+    """Receive a request from a client and respond to it."""
+
+    _send(conn, _READY)
+    kind, payload = _recv(conn)
+    if kind == _STOP:
+        return False
+
+    if kind == _STATUS:
+        info = {
+            "pid": os.getpid(),
+            "version": version,
+            "executable": sys.executable,
+            "requests": stats["requests"],
+            "uptime": time.time() - stats["started"],
+        }
+        _send(conn, _STDOUT, json.dumps(info).encode("utf-8"))
+    elif kind == _REQUEST:
+        request = json.loads(payload)
+        if request["version"] != version or request["executable"] != sys.executable:
+            # client is from a different environment, so it should not use this server
+            _send(conn, _REJECTED)
+            return True
+
+        exit_code = _run_request(conn, bones, request)
+        stats["requests"] += 1
+        try:
+            _send(conn, _EXIT, str(exit_code).encode("utf-8"))
+        except OSError:
+            pass
+
+    return True
+
+
+def _remove_stale_socket(path):
+    """Remove a socket left behind by a server that did not shut down cleanly."""
+
+    if not path.exists():
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            # note: we do not wait for the server to be ready, since it may be
+            # busy with another client
+            sock.connect(str(path))
+        except OSError:
+            pass
+        else:
+            raise click.ClickException(f"A bones server is already running on {path}")
+    path.unlink()
+
+
+def serve(path, bones, idle_timeout=None):
+    """
+    Run the server until it is stopped or idle for ``idle_timeout`` seconds.
+
+    Parameters
+    ----------
+    path : `pathlib.Path`
+        Socket on which to listen for requests.
+    bones : `click.Group`
+        The ``bones`` command group, used to run forwarded commands.
+    idle_timeout : float, optional
+        Shut down after this many seconds without a request (None to run forever).
+    """
+
+    # import all the forwarded commands (and their dependencies) up front
+    for name in forwarded_commands:
+        bones.get_command(None, name)
+
+    path = Path(path)
+    _remove_stale_socket(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    stats = {"requests": 0, "started": time.time()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        # only the current user can connect to the socket (the umask makes sure
+        # that no one else can connect before the permissions are set)
+        umask = os.umask(0o077)
+        try:
+            server.bind(str(path))
+        finally:
+            os.umask(umask)
+        path.chmod(0o600)
+        server.listen()
+        server.settimeout(idle_timeout)
+        try:
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    break
+
+                with conn:
+                    if not _handle_connection(conn, bones, stats):
+                        # remove the socket before replying, so that it is gone
+                        # by the time `bones server stop` returns
+                        path.unlink(missing_ok=True)
+                        _send(conn, _EXIT, b"0")
+                        break
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def _query(path, kind):
+    sock = _connect(path, timeout=client_timeout)
+    if sock is None:
+        return None, None
+    with sock:
+        _send(sock, kind)
+        return _recv(sock)
+
+
+@click.group(name="server")
+@click.option(
+    "--socket",
+    "socket_file",
+    default=None,
+    help="Socket used to communicate with the server "
+    "(defaults to $NENGO_BONES_SERVER_SOCKET or the nengo-bones cache directory).",
+)
+@click.pass_context
+def main(ctx, socket_file):
+    """
+    Run ``bones`` commands in a persistent server process.
+
+    While a server is running, the ``bones generate``, ``bones check`` and
+    ``bones format-notebook`` commands are sent to it rather than being executed in
+    a new process, which avoids paying the startup cost of those commands every
+    time they are run. If no server is running, commands run as normal.
+
+    Set the ``NENGO_BONES_NO_SERVER`` environment variable to disable
+    sending commands to the server.
+    """
+
+    ctx.ensure_object(dict)
+    ctx.obj["socket"] = socket_path() if socket_file is None else Path(socket_file)
+
+
+@main.command()
+@click.option(
+    "--idle-timeout",
+    default=3600.0,
+    help="Shut down after this many seconds without a request (0 to never shut down).",
+)
+@click.option("--background", is_flag=True, help="Run the server in the background.")
+@click.pass_context
+def start(ctx, idle_timeout, background):
+    """Start the server."""
+
+    path = ctx.obj["socket"]
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise click.ClickException("The bones server is not supported on this platform")
+
+    if background:
+        # the working directory is kept off the server's import path, so that files
+        # in the directory it was started from (e.g. a project) cannot shadow the
+        # modules it imports (`-P` does only that, but `-I` is needed before Python
+        # 3.11, which also ignores PYTHON* variables and user site-packages)
+        # pylint: disable=consider-using-with
+        proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-P" if sys.version_info >= (3, 11) else "-I",
+                "-m",
+                "nengo_bones",
+                "server",
+                "--socket",
+                str(path.resolve()),
+                "start",
+                "--idle-timeout",
+                str(idle_timeout),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+        # wait for the server to start listening
+        for _ in range(300):
+            if _query(path, _STATUS)[0] is not None:
+                click.echo(f"Started bones server on {path}")
+                return
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+        raise click.ClickException("Bones server failed to start")
+
+    click.echo(f"Starting bones server on {path}")
+    serve(
+        path,
+        bones=ctx.find_root().command,
+        idle_timeout=idle_timeout if idle_timeout > 0 else None,
+    )
+
+
+@main.command()
+@click.pass_context
+def stop(ctx):
+    """Stop the server."""
+
+    path = ctx.obj["socket"]
+    kind, _ = _query(path, _STOP)
+    click.echo("Stopped bones server" if kind is not None else "No server running")
+
+
+@main.command()
+@click.pass_context
+def status(ctx):
+    """Show information about the running server."""
+
+    path = ctx.obj["socket"]
+    kind, payload = _query(path, _STATUS)
+    if kind is None:
+        click.echo("No server running")
+        sys.exit(1)
+
+    info = json.loads(payload)
+    click.echo(f"Bones server running on {path}")
+    click.echo(f"  pid: {info['pid']}")
+    click.echo(f"  version: {info['version']}")
+    click.echo(f"  python: {info['executable']}")
+    click.echo(f"  requests handled: {info['requests']}")
+    click.echo(f"  uptime: {info['uptime']:.0f}s")
@@ -1,14 +1,33 @@
 """Handles the processing of nengo-bones templates using jinja2."""
 
+import copy
 import datetime
+import functools
+import os
+import shutil
 import stat
-import subprocess
+import tempfile
 from collections import defaultdict
 from pathlib import Path
 
 import jinja2
+import jinja2.meta
 
+from nengo_bones import cache
 from nengo_bones.config import find_config
+from nengo_bones.formatter import get_formatter
+from nengo_bones.version import version as bones_version
+
+builtin_templates_dir = Path(__file__).parent / "templates"
+
+# text identifying files generated by nengo-bones
+header_text = "Automatically generated by nengo-bones"
+
+# text identifying generation stamps (see `add_stamp`)
+stamp_text = "nengo-bones-stamp:"
+
+# number of characters of each hash stored in generation stamps
+stamp_length = 12
 
 
 class BonesTemplate:
@@ -26,6 +45,13 @@ class BonesTemplate:
         Filename for the rendered output file.
     env : ``jinja2.Environment``
         Initialized jinja environment for loading/rendering templates.
+    root : `pathlib.Path`, optional
+        Root directory of the project, whose settings are used when formatting
+        rendered Python files (if None, will use the directory containing the
+        default config file returned by `.find_config`).
+    formatter : `.Formatter`, optional
+        Formatter applied to rendered Python files (if None, will use the one
+        returned by `.get_formatter` for ``root``).
 
     Attributes
     ----------
@@ -33,6 +59,10 @@ class BonesTemplate:
         Initialized jinja environment for loading/rendering templates.
     output_file : str
         Filename for the rendered output file.
+    root : `pathlib.Path`
+        Root directory of the project, whose formatter settings are used.
+    formatter : `.Formatter`
+        Formatter applied to rendered Python files.
     section : str
         The heading for the section in the config file containing config
         options specific to the template being rendered.
@@ -40,12 +70,21 @@ class BonesTemplate:
         Filename for the input template file.
     """
 
-    __slots__ = ("env", "output_file", "section", "template_file")
+    __slots__ = (
+        "env",
+        "output_file",
+        "_root",
+        "_formatter",
+        "section",
+        "template_file",
+    )
     extra_render_data = defaultdict(list)
 
-    def __init__(self, output_file, env):
+    def __init__(self, output_file, env, root=None, formatter=None):
         self.output_file = output_file
         self.env = env
+        self._root = root
+        self._formatter = formatter
 
         section = output_file.lstrip(".")
         section = section.replace("pkg/", "")  # Don't require `pkg_` prefix
@@ -57,6 +96,23 @@ class BonesTemplate:
 
         self.template_file = f"{output_file}.template"
 
+    @property
+    def root(self):
+        """`pathlib.Path`: Root directory of the project."""
+        if self._root is None:
+            # only search for the project root if we actually need it
+            self._root = find_config().parent
+        return self._root
+
+    @property
+    def formatter(self):
+        """`.Formatter`: Formatter applied to rendered Python files."""
+        if self._formatter is None:
+            # we do not keep this, so that changes to the project's settings (e.g.
+            # by rendering its pyproject.toml) are picked up
+            return get_formatter(self.root)
+        return self._formatter
+
     @classmethod
     def add_render_data(cls, filename):
         """
@@ -97,6 +153,11 @@ class BonesTemplate:
         data : dict
             A dictionary that can be passed to `.render` and `.render_to_file`.
         """
+        # note: we copy the config because the render data adders modify nested
+        # sections, and other templates (possibly rendering concurrently) should not
+        # see those changes
+        config = copy.deepcopy(config)
+
         data = {}
         # TODO: separate "top-level" config into its own section?
         data.update(config)
@@ -111,6 +172,9 @@ class BonesTemplate:
         """
         Render this template to a string.
 
+        If the rendered file has a nengo-bones header, a stamp is added after the
+        header (see `.add_stamp`).
+
         Parameters
         ----------
         data : dict
@@ -124,24 +188,65 @@ class BonesTemplate:
             if "license_rst" in data and data["license_rst"]["add_to_files"]:
                 rendered = add_notice(data["license_rst"]["text"], rendered)
 
-            for tool in ["black -q -", "docformatter -", "isort -"]:
-                rendered = subprocess.run(
-                    tool.split(),
-                    input=rendered,
-                    stdout=subprocess.PIPE,
-                    encoding="utf-8",
-                    check=True,
-                    cwd=find_config().parent,
-                ).stdout
+            rendered = self.formatter.format_file(rendered)
+
+        inputs = self.input_hashes(**data)
+        if inputs is not None:
+            rendered = add_stamp(
+                rendered, cache.hash_key(inputs), version=inputs["version"]
+            )
 
         return rendered
 
-    def render_to_file(self, output_dir, output_name=None, **data):
+    def input_hashes(self, **data):
         """
-        Render a template to file.
+        Hash everything that determines the output of this template.
 
-        .. note:: Rendered shell scripts (files with the ``.sh extension``)
-                  are automatically marked as executable.
+        Parameters
+        ----------
+        data : dict
+            Will be passed on to the ``render`` function.
+
+        Returns
+        -------
+        hashes : dict or None
+            Hashes of the render ``data`` used by the templates (``"config"``; see
+            `.template_variables`), the sources of this
+            template and every template it extends, includes or imports
+            (``"templates"``), the NengoBones version (``"version"``) and, for
+            Python files, the formatter settings (``"formatter"``). None if the
+            template references other templates dynamically (in which case we
+            cannot tell which templates it depends on).
+        """
+        sources = template_sources(self.env, self.template_file)
+        if sources is None:
+            return None
+
+        # only the data used by the templates can change the output (so, e.g.,
+        # changing one section of the config does not affect other files)
+        used = template_variables(self.env, sources)
+        if self.output_file.endswith(".py"):
+            used.add("license_rst")  # see `render`
+
+        # `today` (see `add_version_py_data`) is only used for its date, so we do not
+        # want the time of day to count as a change
+        data = {
+            key: val.date() if isinstance(val, datetime.datetime) else val
+            for key, val in data.items()
+            if key in used
+        }
+        hashes = {
+            "config": cache.hash_key(data),
+            "templates": cache.hash_key(sources),
+            "version": bones_version,
+        }
+        if self.output_file.endswith(".py"):
+            hashes["formatter"] = self.formatter.settings_key
+        return hashes
+
+    def output_path(self, output_dir, output_name=None, **data):
+        """
+        Determine the path of the rendered file.
 
         Parameters
         ----------
@@ -152,6 +257,11 @@ class BonesTemplate:
             This overrides the class's internal ``output_file`` attribute.
         data : dict
             Will be passed on to the ``render`` function.
+
+        Returns
+        -------
+        output_path : `pathlib.Path`
+            Path of the rendered file.
         """
         if output_name is None:
             output_name = self.output_file
@@ -161,14 +271,59 @@ class BonesTemplate:
         if output_name.startswith("pkg/"):
             assert "pkg_name" in data
             output_name = output_name.replace("pkg/", f"{data['pkg_name']}/")
-        output_path = Path(output_dir, output_name)
+        return Path(output_dir, output_name)
+
+    def render_to_file(self, output_dir, output_name=None, **data):
+        """
+        Render a template to file.
+
+        .. note:: Rendered shell scripts (files with the ``.sh extension``)
+                  are automatically marked as executable.
+
+        Parameters
+        ----------
+        output_dir : str
+            Directory in which the rendered file should be placed.
+        output_name : str, optional
+            An alternative filename for the rendered file.
+            This overrides the class's internal ``output_file`` attribute.
+        data : dict
+            Will be passed on to the ``render`` function.
+        """
+        output_path = self.output_path(output_dir, output_name, **data)
+        write_rendered(output_path, self.render(**data))
+
+
+def write_rendered(output_path, text):
+    """
+    Write a rendered file.
+
+    The file is not written if it already has the given content (so that its
+    modification time only changes when its content does).
+
+    .. note:: Rendered shell scripts (files with the ``.sh extension``)
+              are automatically marked as executable.
+
+    Parameters
+    ----------
+    output_path : `pathlib.Path`
+        Path of the rendered file (parent directories are created if needed).
+    text : str
+        Content of the rendered file.
+    """
+    output_path = Path(output_path)
+    try:
+        unchanged = output_path.read_bytes() == text.encode("utf-8")
+    except OSError:
+        unchanged = False
+    if not unchanged:
         output_path.parent.mkdir(exist_ok=True, parents=True)
-        output_path.write_text(self.render(**data), encoding="utf-8")
+        output_path.write_text(text, encoding="utf-8")
 
-        # We mark all `.sh` files as executable
-        if output_path.suffix == ".sh":
-            st = output_path.stat()
-            output_path.chmod(st.st_mode | stat.S_IEXEC)
+    # We mark all `.sh` files as executable
+    if output_path.suffix == ".sh":
+        st = output_path.stat()
+        output_path.chmod(st.st_mode | stat.S_IEXEC)
 
 
 @BonesTemplate.add_render_data("manifest_in")
@@ -229,31 +384,335 @@ def add_version_py_data(data):
     )
 
 
-def load_env():
-    """Creates a jinja environment for loading/rendering templates."""
+def load_env(root=None):
+    """
+    Creates a jinja environment for loading/rendering templates.
 
-    bones_toplevel = Path(__file__).parent
+    Templates in the ``.templates`` directory of ``root`` override the built-in
+    templates.
 
-    # Load overridden templates first.
-    # Builtins are referenced with templates/*.template
-    override_dirs = []
-    override_dirs.append(".templates")
-    override_dirs.append(bones_toplevel)
-    override_loader = jinja2.FileSystemLoader(override_dirs)
-    # If those fail, use the builtins
-    builtin_loader = jinja2.FileSystemLoader(bones_toplevel / "templates")
+    Built-in templates are precompiled (see `.compile_builtin_templates`), and
+    templates in the ``.templates`` directory are compiled through a bytecode
+    cache stored in `.cache_dir`, so that templates are only compiled once (rather
+    than every time ``bones`` runs).
+
+    Environments are cached (keyed on ``root`` and the state of its ``.templates``
+    directory), so that long-running processes can reuse the templates that have
+    already been compiled. All projects without a ``.templates`` directory share
+    the same environment.
+
+    Parameters
+    ----------
+    root : str or `pathlib.Path`, optional
+        Root directory of the project (if None, will use the current directory).
+    """
+
+    root = os.getcwd() if root is None else os.path.abspath(root)
+    try:
+        overrides_mtime = os.stat(os.path.join(root, ".templates")).st_mtime_ns
+    except OSError:
+        # projects without overridden templates can all share the same environment
+        return _create_env(None, None)
+
+    return _create_env(root, overrides_mtime)
 
+
+def _make_env(loader, bytecode_cache=None):
     env = jinja2.Environment(
-        loader=jinja2.ChoiceLoader([override_loader, builtin_loader]),
+        loader=loader,
+        bytecode_cache=bytecode_cache,
         trim_blocks=True,
         lstrip_blocks=True,
         keep_trailing_newline=True,
     )
     env.filters["rstrip"] = lambda s, chars: s.rstrip(chars)
-
     return env
 
 
+@functools.lru_cache(maxsize=32)
+def _create_env(root, overrides_mtime):
+    # note: `overrides_mtime` is only used as part of the cache key (and `root` is
+    # None if there are no overridden templates)
+    builtin_loader = PrecompiledLoader(
+        compile_builtin_templates(), jinja2.FileSystemLoader(builtin_templates_dir)
+    )
+
+    # Load overridden templates first (if there are any).
+    # Builtins are referenced with templates/*.template
+    loaders = (
+        [] if root is None else [jinja2.FileSystemLoader(Path(root, ".templates"))]
+    )
+    # If those fail, use the builtins
+    return _make_env(
+        jinja2.ChoiceLoader(
+            [
+                *loaders,
+                jinja2.PrefixLoader({"templates": builtin_loader}),
+                builtin_loader,
+            ]
+        ),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(str(cache.cache_dir("bytecode"))),
+    )
+
+
+class PrecompiledLoader(jinja2.ModuleLoader):
+    """
+    Loads precompiled templates.
+
+    Unlike ``jinja2.ModuleLoader``, this also gives access to the template
+    sources (e.g., for `.template_sources`).
+
+    Parameters
+    ----------
+    path : `pathlib.Path`
+        Directory containing the compiled templates.
+    source_loader : ``jinja2.BaseLoader``
+        Loader for the sources of the compiled templates.
+    """
+
+    has_source_access = True
+
+    def __init__(self, path, source_loader):
+        super().__init__(path)
+        self.source_loader = source_loader
+
+    def get_source(self, environment, template):
+        return self.source_loader.get_source(environment, template)
+
+    def list_templates(self):
+        return self.source_loader.list_templates()
+
+
+def compile_builtin_templates():
+    """
+    Compile the built-in templates, if they have not been compiled already.
+
+    Compiled templates are stored in the ``templates`` subdirectory of
+    `.cache_dir`, keyed on the NengoBones and jinja versions and the state of the
+    template files, so that they are compiled once for each installed version.
+
+    Returns
+    -------
+    path : `pathlib.Path`
+        Directory containing the compiled templates.
+    """
+
+    state = []
+    for path in sorted(builtin_templates_dir.rglob("*.template")):
+        st = path.stat()
+        state.append((str(path), st.st_mtime_ns, st.st_size))
+    key = cache.hash_key(bones_version, jinja2.__version__, state)
+    target = cache.cache_dir("templates") / key
+
+    if not target.is_dir():
+        # compile into a temporary directory and then move it into place, so that
+        # other processes never see a partially compiled directory
+        tmp_dir = Path(tempfile.mkdtemp(dir=target.parent, prefix=f".{key}."))
+        try:
+            _make_env(jinja2.FileSystemLoader(builtin_templates_dir)).compile_templates(
+                tmp_dir, extensions=["template"], zip=None, ignore_errors=False
+            )
+            os.replace(tmp_dir, target)
+        except OSError:
+            # another process finished compiling first
+            if not target.is_dir():
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return target
+
+
+def template_sources(env, name):
+    """
+    Load the source of a template and all the templates it depends on.
+
+    Dependencies (templates that are extended, included or imported) are found
+    recursively, and loaded through the environment's loader, so that overridden
+    templates are respected.
+
+    Parameters
+    ----------
+    env : ``jinja2.Environment``
+        Environment for loading templates.
+    name : str
+        Name of the template.
+
+    Returns
+    -------
+    sources : dict or None
+        Mapping from template name to source for the template and all its
+        dependencies, or None if any of them references a template dynamically.
+    """
+
+    sources = {}
+    to_load = [name]
+    while to_load:
+        name = to_load.pop()
+        if name in sources:
+            continue
+        sources[name] = env.loader.get_source(env, name)[0]
+        references = _referenced_templates(env, sources[name])
+        if None in references:
+            return None
+        to_load.extend(references)
+    return sources
+
+
+@functools.lru_cache(maxsize=128)
+def _referenced_templates(env, source):
+    return tuple(jinja2.meta.find_referenced_templates(env.parse(source)))
+
+
+def template_variables(env, sources):
+    """
+    Find the variables used by a set of templates.
+
+    Parameters
+    ----------
+    env : ``jinja2.Environment``
+        Environment for loading templates.
+    sources : dict
+        Mapping from template name to source (see `.template_sources`).
+
+    Returns
+    -------
+    variables : set of str
+        Names of all the (undeclared) variables used by the templates, i.e. the
+        render data that they depend on.
+    """
+
+    variables = set()
+    for source in sources.values():
+        variables.update(_undeclared_variables(env, source))
+    return variables
+
+
+@functools.lru_cache(maxsize=128)
+def _undeclared_variables(env, source):
+    return frozenset(jinja2.meta.find_undeclared_variables(env.parse(source)))
+
+
+def _header_index(lines):
+    for i, line in enumerate(lines[:50]):
+        if header_text in line:
+            return i
+    return None
+
+
+def _stamp_index(lines):
+    for i, line in enumerate(lines[:51]):
+        if stamp_text in line:
+            return i
+    return None
+
+
+def strip_lines(lines):
+    """
+    Remove lines that are not compared when checking generated files.
+
+    These are the generation stamp and lines marked with ``# bones: ignore``.
+
+    Parameters
+    ----------
+    lines : list of str
+        Lines of a generated file.
+
+    Returns
+    -------
+    lines : list of str
+        Lines that should be compared.
+    """
+    stamp = _stamp_index(lines)
+    return [
+        line
+        for i, line in enumerate(lines)
+        if i != stamp and "# bones: ignore" not in line
+    ]
+
+
+def body_hash(lines):
+    """
+    Hash the content of a generated file (see `.strip_lines`).
+
+    Parameters
+    ----------
+    lines : list of str
+        Lines of a generated file (including line endings).
+
+    Returns
+    -------
+    hash : str
+        Hash of the file body.
+    """
+    return cache.hash_key("".join(strip_lines(lines)))[:stamp_length]
+
+
+def add_stamp(text, inputs, version=None):
+    """
+    Add a generation stamp to the content of a generated file.
+
+    The stamp is placed after the "Automatically generated by nengo-bones" header
+    (using the same comment prefix), and records a hash of the inputs to the
+    file, a hash of its body (see `.body_hash`) and the version of NengoBones
+    that generated it, so that `bones check` can verify that a file is up to date
+    without rendering it again (see `.read_stamp`).
+
+    Parameters
+    ----------
+    text : str
+        Content of the generated file.
+    inputs : str
+        Hash of the inputs to the file.
+    version : str, optional
+        Version of NengoBones that generated the file.
+
+    Returns
+    -------
+    text : str
+        Content of the generated file with the stamp added (unchanged if the
+        file has no header).
+    """
+    lines = text.splitlines(keepends=True)
+    header = _header_index(lines)
+    if header is None:
+        return text
+
+    prefix = lines[header][: lines[header].index(header_text)]
+    stamp = (
+        f"{prefix}{stamp_text} inputs={inputs[:stamp_length]} body={body_hash(lines)}"
+    )
+    if version is not None:
+        stamp += f" version={version}"
+    lines.insert(header + 1, f"{stamp}\n")
+    return "".join(lines)
+
+
+def read_stamp(lines):
+    """
+    Read the generation stamp from the content of a generated file.
+
+    Parameters
+    ----------
+    lines : list of str
+        Lines of a generated file.
+
+    Returns
+    -------
+    stamp : dict or None
+        The ``"inputs"`` and ``"body"`` hashes stored in the stamp (and the
+        ``"version"`` of NengoBones that generated the file, if recorded), or None
+        if the file does not have a stamp.
+    """
+    index = _stamp_index(lines)
+    if index is None:
+        return None
+    line = lines[index]
+    fields = line[line.index(stamp_text) + len(stamp_text) :].split()
+    stamp = dict(field.split("=", 1) for field in fields if "=" in field)
+    return stamp if {"inputs", "body"} <= set(stamp) else None
+
+
 def add_notice(license_text, current_text):
     """Add license text to file contents."""
 
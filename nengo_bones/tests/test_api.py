@@ -0,0 +1,97 @@
+# pylint: disable=missing-docstring
+
+import pytest
+
+from nengo_bones import api
+from nengo_bones.tests.utils import write_file
+
+config = {
+    "project_name": "Dumdum",
+    "pkg_name": "dummy",
+    "repo_name": "dummy_org/dummy",
+    "contributors_rst": {},
+    "license": "mit",
+    "license_rst": {},
+    "version_py": {"type": "calver", "release": False},
+    "ci_scripts": [{"template": "static", "output_name": "lint"}],
+}
+
+
+class FakeFormatter:
+    settings_key = "fake"
+
+    def __init__(self):
+        self.sources = []
+
+    def format_file(self, source):
+        self.sources.append(source)
+        return f"{source}# formatted\n"
+
+
+def test_generate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    files = api.generate(config)
+    assert sorted(files) == ["CONTRIBUTORS.rst", "LICENSE.rst", "dummy/version.py"]
+    assert "Dumdum contributors" in files["CONTRIBUTORS.rst"]
+    assert "MIT License" in files["LICENSE.rst"]
+    # nothing is written
+    assert len(list(tmp_path.iterdir())) == 0
+
+    files = api.generate(config, sections=["ci_scripts", "license_rst"])
+    assert sorted(files) == ["LICENSE.rst", "lint.sh"]
+
+    with pytest.raises(KeyError, match="No config entry detected for setup_py"):
+        api.generate(config, sections=["setup_py"])
+
+    # the caller can supply the formatter
+    formatter = FakeFormatter()
+    files = api.generate(config, sections=["version_py"], formatter=formatter)
+    assert files["dummy/version.py"].endswith("# formatted\n")
+    assert len(formatter.sources) == 1
+
+
+def test_generate_output_dir(tmp_path):
+    files = api.generate(config, root=tmp_path, output_dir=tmp_path / "out")
+    for name, text in files.items():
+        assert (tmp_path / "out" / name).read_text(encoding="utf-8") == text
+
+
+def test_check(tmp_path):
+    write_file(
+        tmp_path=tmp_path,
+        filename=".nengobones.yml",
+        contents="""
+        project_name: Dumdum
+        pkg_name: dummy
+        repo_name: dummy_org/dummy
+        contributors_rst: {}
+        """,
+    )
+    api.generate(tmp_path / ".nengobones.yml", output_dir=tmp_path)
+
+    report = api.check(tmp_path / ".nengobones.yml")
+    assert report["passed"]
+    assert report["files"]["CONTRIBUTORS.rst"]["status"] == "up-to-date"
+    assert report["files"]["setup.py"]["status"] == "missing"
+    assert report["notices"] is None
+
+    with (tmp_path / "CONTRIBUTORS.rst").open("a", encoding="utf-8") as f:
+        f.write("extra line\n")
+    report = api.check(tmp_path / ".nengobones.yml", verbose=True)
+    assert not report["passed"]
+    file_report = report["files"]["CONTRIBUTORS.rst"]
+    assert file_report["status"] == "outdated"
+    assert any("-extra line" in message for message in file_report["messages"])
+
+    # files are checked against the given config (not the config file)
+    report = api.check(
+        {
+            "project_name": "Other",
+            "pkg_name": "dummy",
+            "repo_name": "dummy_org/dummy",
+            "contributors_rst": {},
+        },
+        root=tmp_path,
+    )
+    assert report["files"]["CONTRIBUTORS.rst"]["status"] == "outdated"
@@ -0,0 +1,105 @@
+# pylint: disable=missing-docstring
+
+import subprocess
+import sys
+import warnings
+
+import click
+import pytest
+from click.testing import CliRunner
+
+from nengo_bones.scripts.base import LazyGroup, bones
+from nengo_bones.tests.utils import assert_exit
+
+
+def test_help_lists_all_commands():
+    result = CliRunner().invoke(bones, ["--help"])
+    assert_exit(result, 0)
+    for cmd in ("check", "check-deploy", "format-notebook", "generate", "pr-number"):
+        assert f"  {cmd} " in result.output
+
+
+@pytest.mark.parametrize("width", [50, 80, 1000])
+def test_registered_short_help(width):
+    # the short help registered for each command (which is shown by `bones --help`
+    # without loading the command) matches the help of the command itself
+    def make_group():
+        return LazyGroup(
+            name="bones",
+            lazy_commands={
+                name: (target, bones.lazy_short_help[name])
+                for name, target in bones.lazy_commands.items()
+            },
+        )
+
+    lazy = make_group()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        lazy_help = CliRunner().invoke(lazy, ["--help"], terminal_width=width)
+    assert_exit(lazy_help, 0)
+    assert len(lazy.commands) == 0
+
+    loaded = make_group()
+    for name in loaded.lazy_commands:
+        cmd = loaded.get_command(None, name)
+        assert cmd.get_short_help_str(width) == click.Command(
+            name, help=loaded.lazy_short_help[name]
+        ).get_short_help_str(width)
+    loaded_help = CliRunner().invoke(loaded, ["--help"], terminal_width=width)
+    assert_exit(loaded_help, 0)
+    assert lazy_help.output == loaded_help.output
+
+
+@pytest.mark.parametrize(
+    "argv, loaded, not_loaded",
+    [
+        (
+            ["check", "--help"],
+            "nengo_bones.scripts.check_bones",
+            ["nengo_bones.scripts.format_notebook", "nbformat", "requests"],
+        ),
+        (
+            ["pr-number", "--help"],
+            "nengo_bones.scripts.pr_number",
+            ["nengo_bones.scripts.generate_bones", "nbformat", "black"],
+        ),
+        (
+            ["--help"],
+            "nengo_bones.scripts.base",
+            [
+                "nengo_bones.scripts.check_bones",
+                "nengo_bones.scripts.format_notebook",
+                "nengo_bones.scripts.server",
+                "black",
+                "jinja2",
+                "nbformat",
+                "pylint",
+                "yaml",
+            ],
+        ),
+    ],
+)
+def test_commands_load_lazily(argv, loaded, not_loaded):
+    code = (
+        "import sys\n"
+        "from nengo_bones.scripts.base import bones\n"
+        f"try:\n    bones({argv!r})\n"
+        "except SystemExit:\n    pass\n"
+        f"assert {loaded!r} in sys.modules\n"
+        f"for mod in {not_loaded!r}:\n"
+        "    assert mod not in sys.modules, mod\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE)
+
+
+def test_lazy_group_bad_target():
+    @click.group(
+        cls=LazyGroup, lazy_commands={"bad": "nengo_bones.scripts.base:LazyGroup"}
+    )
+    def cli():
+        pass
+
+    with pytest.raises(TypeError, match="is not a click command"):
+        cli.get_command(None, "bad")
+
+    assert cli.get_command(None, "missing") is None
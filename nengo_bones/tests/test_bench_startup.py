@@ -0,0 +1,141 @@
+# pylint: disable=missing-docstring
+
+import json
+
+from click.testing import CliRunner
+
+from nengo_bones.scripts import bench_startup
+from nengo_bones.scripts.base import bones
+from nengo_bones.tests.utils import assert_exit
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   yaml.error\n"
+        "import time:        50 |        150 | yaml\n"
+        "import time:        20 |         20 | click\n"
+        "some other output\n"
+    )
+    imports = bench_startup.parse_importtime(output)
+    assert imports == [("yaml.error", 100, 100), ("yaml", 50, 150), ("click", 20, 20)]
+    assert bench_startup.package_breakdown(imports) == {"yaml": 150, "click": 20}
+
+
+def test_compare():
+    baseline = {"python": {"wall": 0.1}, "a": {"wall": 0.2}, "b": {"wall": 0.2}}
+
+    # times are relative to python startup, so a uniformly slower machine is fine
+    results = {"python": {"wall": 0.2}, "a": {"wall": 0.4}, "b": {"wall": 0.8}}
+    assert bench_startup.compare(results, baseline, threshold=1.5) == ["b"]
+    assert not bench_startup.compare(results, baseline, threshold=2.5)
+
+    # new cases are not compared
+    results["c"] = {"wall": 10}
+    assert not bench_startup.compare(results, baseline, threshold=2.5)
+
+
+def test_forbidden_imports():
+    results = {
+        "python": {"modules": [("yaml", 1, 1)]},
+        "--help": {"modules": [("click", 1, 1), ("jinja2.ext", 1, 1)]},
+        "check --help": {"modules": [("click", 1, 1), ("jinja2x", 1, 1)]},
+    }
+
+    # only `--help` cases are checked, and submodules of forbidden modules count
+    assert bench_startup.forbidden_imports(results, ["jinja2", "yaml"]) == {
+        "--help": ["jinja2"]
+    }
+    assert not bench_startup.forbidden_imports(results, ["black"])
+
+
+def test_bench_startup(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    output = tmp_path / "output.json"
+
+    result = CliRunner().invoke(
+        bones,
+        [
+            "bench-startup",
+            "--repeat",
+            "1",
+            "--baseline",
+            str(baseline),
+            "--update",
+            "--output",
+            str(output),
+        ],
+    )
+    assert_exit(result, 0)
+    results = json.loads(baseline.read_text())
+    for name in ("python", "check --help", "generate --help", "check (empty project)"):
+        assert name in results
+    # the baseline only stores times (the full results are in the output)
+    assert all(set(res) == {"wall"} for res in results.values())
+    full_results = json.loads(output.read_text())
+    assert "click" in full_results["check --help"]["packages"]
+    modules = [module for module, _, _ in full_results["check --help"]["modules"]]
+    assert "click" in modules and "click.core" in modules
+
+    # make the baseline impossibly fast, so that the check fails
+    for name, res in results.items():
+        if name != "python":
+            res["wall"] = results["python"]["wall"] * 0.1
+    baseline.write_text(json.dumps(results))
+
+    result = CliRunner().invoke(
+        bones, ["bench-startup", "--repeat", "1", "--baseline", str(baseline)]
+    )
+    assert_exit(result, 1)
+    assert "Startup time regressed" in result.output
+    # without import breakdowns in the baseline, the current breakdown is shown
+    assert "  check --help\n    " in result.output
+    assert "new imports" not in result.output
+
+    # regressions can be reported without failing
+    result = CliRunner().invoke(
+        bones,
+        [
+            "bench-startup",
+            "--repeat",
+            "1",
+            "--baseline",
+            str(baseline),
+            "--report-only",
+        ],
+    )
+    assert_exit(result, 0)
+    assert "Startup time regressed" in result.output
+
+    # forbidden imports fail even when only reporting regressions
+    result = CliRunner().invoke(
+        bones,
+        [
+            "bench-startup",
+            "--repeat",
+            "1",
+            "--baseline",
+            str(baseline),
+            "--report-only",
+            "--forbid-import",
+            "nbformat",
+            "--forbid-import",
+            "click",
+        ],
+    )
+    assert_exit(result, 1)
+    assert "check --help imported click\n" in result.output
+    assert "nbformat" not in result.output
+
+    # full results can also be used as a baseline, to compare import breakdowns
+    for name, res in full_results.items():
+        if name != "python":
+            res["wall"] = full_results["python"]["wall"] * 0.1
+            res["packages"] = {}
+    output.write_text(json.dumps(full_results))
+
+    result = CliRunner().invoke(
+        bones, ["bench-startup", "--repeat", "1", "--baseline", str(output)]
+    )
+    assert_exit(result, 1)
+    assert "  check --help\n    new imports: " in result.output
@@ -0,0 +1,53 @@
+# pylint: disable=missing-docstring
+
+import os
+
+from nengo_bones import cache
+
+
+def test_content_cache(tmp_path):
+    content_cache = cache.ContentCache(tmp_path, max_size=1000)
+
+    key = cache.hash_key("some", "input")
+    assert content_cache.get(key) is None
+    content_cache.put(key, "output ∆")
+    assert content_cache.get(key) == "output ∆"
+
+    # cache is shared with other instances using the same directory
+    assert cache.ContentCache(tmp_path, max_size=1000).get(key) == "output ∆"
+
+    # disabled cache does not store anything
+    content_cache = cache.ContentCache(tmp_path / "disabled", max_size=0)
+    content_cache.put(key, "output")
+    assert content_cache.get(key) is None
+
+
+def test_content_cache_json(tmp_path):
+    content_cache = cache.ContentCache(tmp_path, max_size=1000)
+
+    key = cache.hash_key("data")
+    assert content_cache.get_json(key, default={}) == {}
+    content_cache.put_json(key, {"cells": [1, 2]})
+    assert content_cache.get_json(key) == {"cells": [1, 2]}
+
+    # corrupt entries are ignored
+    content_cache.put(key, "{")
+    assert content_cache.get_json(key, default={}) == {}
+
+
+def test_content_cache_eviction(tmp_path):
+    content_cache = cache.ContentCache(tmp_path, max_size=250, evict_every=1)
+
+    keys = [cache.hash_key(i) for i in range(5)]
+    for i, key in enumerate(keys[:2]):
+        content_cache.put(key, "x" * 100)
+        os.utime(content_cache._path(key), ns=(i * 10**9, i * 10**9))
+
+    # reading an entry marks it as recently used
+    assert content_cache.get(keys[0]) is not None
+
+    # exceeding the size evicts the least recently used entries
+    content_cache.put(keys[2], "x" * 100)
+    assert content_cache.get(keys[0]) is not None
+    assert content_cache.get(keys[1]) is None
+    assert content_cache.get(keys[2]) is not None
@@ -1,9 +1,14 @@
 # pylint: disable=missing-docstring
 
+import json
+
 from click.testing import CliRunner
 
+from nengo_bones import all_files, git, templates
+from nengo_bones.scripts import check_bones
 from nengo_bones.scripts.base import bones
-from nengo_bones.tests.utils import assert_exit, write_file
+from nengo_bones.templates import BonesTemplate
+from nengo_bones.tests.utils import assert_exit, make_has_line, write_file
 
 
 def _write_nengo_yml(tmp_path, nengo_yml=None):
@@ -37,7 +42,7 @@ def _generate_valid_file(tmp_path):
     assert_exit(result, 0)
 
 
-def _run_check_bones(tmp_path):
+def _run_check_bones(tmp_path, *args):
     cmdline_args = [
         "check",
         "--root-dir",
@@ -45,6 +50,7 @@ def _run_check_bones(tmp_path):
         "--conf-file",
         str(tmp_path / ".nengobones.yml"),
         "--verbose",
+        *args,
     ]
     return CliRunner().invoke(bones, cmdline_args)
 
@@ -120,7 +126,8 @@ def test_bones_ignore_comment(tmp_path):
     assert_exit(result, 0)
     with (tmp_path / "dummy" / "version.py").open(encoding="utf-8") as f:
         lines = f.readlines()
-    lines[13] = "version_info = (0, 0, 0)  # bones: ignore\n"
+    index = next(i for i, line in enumerate(lines) if line.startswith("version_info"))
+    lines[index] = "version_info = (0, 0, 0)  # bones: ignore\n"
     with (tmp_path / "dummy" / "version.py").open("w", encoding="utf-8") as f:
         f.writelines(lines)
     result = _run_check_bones(tmp_path)
@@ -145,3 +152,296 @@ def test_license_check(tmp_path):
     result = _run_check_bones(tmp_path)
     assert_exit(result, 1)
     assert "Missing" in result.output
+
+
+def test_jobs(tmp_path, monkeypatch):
+    _write_nengo_yml(
+        tmp_path,
+        nengo_yml="""
+            project_name: Dumdum
+            pkg_name: dummy
+            repo_name: dummy_org/dummy
+            contributors_rst: {}
+            license_rst:
+              add_to_files: true
+            version_py:
+              type: calver
+              release: false
+        """,
+    )
+    # note: generate adds license notices in the current project
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(bones, ["generate"])
+    assert_exit(result, 0)
+    with (tmp_path / "CONTRIBUTORS.rst").open("a") as f:
+        f.write("x")
+    (tmp_path / "file.py").touch()
+
+    serial = _run_check_bones(tmp_path)
+    assert_exit(serial, 1)
+    parallel = _run_check_bones(tmp_path, "--jobs", "4")
+    assert_exit(parallel, 1)
+
+    assert "CONTRIBUTORS.rst:\n  Content does not match" in parallel.output
+    assert "version.py:\n  Up to date" in parallel.output
+    assert "Missing" in parallel.output
+    assert parallel.output == serial.output
+
+
+def test_stamp(tmp_path, monkeypatch):
+    _write_nengo_yml(tmp_path)
+    _generate_valid_file(tmp_path)
+    contributors = tmp_path / "CONTRIBUTORS.rst"
+    assert "nengo-bones-stamp: inputs=" in contributors.read_text(encoding="utf-8")
+
+    # without --verbose, files matching their stamp are checked without rendering
+    def fail_render(*args, **kwargs):
+        raise AssertionError("render should not be called")
+
+    monkeypatch.setattr(BonesTemplate, "render", fail_render)
+    result = CliRunner().invoke(
+        bones,
+        [
+            "check",
+            "--root-dir",
+            str(tmp_path),
+            "--conf-file",
+            str(tmp_path / ".nengobones.yml"),
+        ],
+    )
+    assert_exit(result, 0)
+    assert "CONTRIBUTORS.rst:\n  Up to date" in result.output
+
+    # with --verbose, files are always rendered
+    result = _run_check_bones(tmp_path)
+    assert isinstance(result.exception, AssertionError)
+    monkeypatch.undo()
+
+    # files without a stamp (e.g. from older versions) are compared to the render
+    text = contributors.read_text(encoding="utf-8")
+    unstamped = "".join(templates.strip_lines(text.splitlines(keepends=True)))
+    contributors.write_text(unstamped, encoding="utf-8")
+    result = _run_check_bones(tmp_path)
+    assert_exit(result, 0)
+
+    # if the body does not match the stamp, the file is compared to the render
+    contributors.write_text(text + "Extra line\n", encoding="utf-8")
+    result = _run_check_bones(tmp_path)
+    assert_exit(result, 1)
+    assert "+Extra line" not in result.output
+    assert "-Extra line" in result.output
+
+
+def test_since(tmp_path, monkeypatch):
+    _write_nengo_yml(
+        tmp_path,
+        nengo_yml="""
+            project_name: Dumdum
+            pkg_name: dummy
+            repo_name: dummy_org/dummy
+            contributors_rst: {}
+            license_rst:
+              add_to_files: true
+              text: License text
+        """,
+    )
+    # note: generate adds license notices in the current project
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "committed.py").write_text("x = 1\n", encoding="utf-8")
+    result = CliRunner().invoke(bones, ["generate"])
+    assert_exit(result, 0)
+    # a file missing a notice that has not changed since the reference
+    (tmp_path / "unchanged.py").write_text("x = 1\n", encoding="utf-8")
+
+    git.run_git("init", "-q", cwd=tmp_path)
+    git.run_git("add", ".", cwd=tmp_path)
+    git.run_git(
+        "-c",
+        "user.name=Name",
+        "-c",
+        "user.email=a@b.c",
+        "commit",
+        "-qm",
+        "Initial",
+        cwd=tmp_path,
+    )
+
+    # nothing has changed
+    result = _run_check_bones(tmp_path, "--since", "HEAD")
+    assert_exit(result, 0)
+    assert "since HEAD:\n  CONTRIBUTORS.rst\n  LICENSE.rst\n" in result.output
+    assert "CONTRIBUTORS.rst:\n" not in result.output
+    assert "Missing" not in result.output
+
+    # only files affected by the changes are checked
+    (tmp_path / "new.py").write_text("x = 1\n", encoding="utf-8")
+    with (tmp_path / ".nengobones.yml").open("a", encoding="utf-8") as f:
+        f.write("author: Someone\n")
+    result = _run_check_bones(tmp_path, "--since", "HEAD")
+    assert_exit(result, 1)
+    assert "since HEAD:\n  CONTRIBUTORS.rst\n\n" in result.output
+    assert "LICENSE.rst:\n  Content does not match" in result.output
+    assert f"Missing: {tmp_path / 'new.py'}" in result.output
+    assert "unchanged.py" not in result.output
+    assert "committed.py" not in result.output
+
+    # if the license text changes, all files are checked for notices
+    conf_text = (tmp_path / ".nengobones.yml").read_text(encoding="utf-8")
+    (tmp_path / ".nengobones.yml").write_text(
+        conf_text.replace("License text", "New license text"), encoding="utf-8"
+    )
+    result = _run_check_bones(tmp_path, "--since", "HEAD")
+    assert_exit(result, 1)
+    assert f"Missing: {tmp_path / 'unchanged.py'}" in result.output
+    assert f"Missing: {tmp_path / 'committed.py'}" in result.output
+
+    # files generated by a different version of NengoBones are always checked
+    monkeypatch.setattr(check_bones, "__version__", "0.0.0")
+    result = _run_check_bones(tmp_path, "--since", "HEAD")
+    assert "CONTRIBUTORS.rst:\n  Up to date" in result.output
+
+
+def test_report(tmp_path, monkeypatch):
+    _write_nengo_yml(
+        tmp_path,
+        nengo_yml="""
+            project_name: Dumdum
+            pkg_name: dummy
+            repo_name: dummy_org/dummy
+            contributors_rst: {}
+            license_rst:
+              add_to_files: true
+            version_py:
+              type: calver
+              release: false
+        """,
+    )
+    # note: generate adds license notices in the current project
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(bones, ["generate"])
+    assert_exit(result, 0)
+    with (tmp_path / "CONTRIBUTORS.rst").open("a") as f:
+        f.write("x")
+    (tmp_path / "file.py").touch()
+
+    result = _run_check_bones(tmp_path, "--report", "json")
+    assert_exit(result, 1)
+    report = json.loads(result.output)
+    assert not report["passed"]
+    assert set(report["files"]) == {
+        filename.replace("pkg", "dummy") for filename in all_files
+    }
+
+    contributors = report["files"]["CONTRIBUTORS.rst"]
+    assert contributors["status"] == "outdated"
+    assert contributors["diff_lines"] > 0
+    assert contributors["bytes_read"] == (tmp_path / "CONTRIBUTORS.rst").stat().st_size
+    assert contributors["render_time"] > 0
+    assert "Content does not match" in contributors["messages"][1]
+
+    version = report["files"]["dummy/version.py"]
+    assert version["status"] == "up-to-date"
+    assert version["diff_lines"] == 0
+    assert set(version["formatter_times"]) <= {"black", "docformatter", "isort"}
+
+    assert report["files"]["setup.py"]["status"] == "missing"
+
+    notices = report["notices"]
+    assert notices["files_scanned"] == 2
+    assert notices["missing"] == 1
+    # only the start of each file is read
+    assert 0 < notices["bytes_read"] < (tmp_path / "dummy/version.py").stat().st_size
+    assert notices["time"] > 0
+
+
+def test_projects(tmp_path, monkeypatch):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        _write_nengo_yml(tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(bones, ["generate", "--all"])
+    assert_exit(result, 0)
+
+    result = CliRunner().invoke(bones, ["check", "--all", "--jobs", "4"])
+    assert_exit(result, 0)
+    has_line = make_has_line(result.output.splitlines())
+    assert has_line("root dir: a")
+    assert has_line("CONTRIBUTORS.rst:")
+    assert has_line("  Up to date")
+    assert has_line("root dir: b")
+    assert has_line("CONTRIBUTORS.rst:")
+    assert has_line("  Up to date")
+
+    with (tmp_path / "b/CONTRIBUTORS.rst").open("a") as f:
+        f.write("x")
+    result = CliRunner().invoke(
+        bones,
+        [
+            "check",
+            "--conf-file",
+            "a/.nengobones.yml",
+            "--conf-file",
+            "b/.nengobones.yml",
+            "--report",
+            "json",
+        ],
+    )
+    assert_exit(result, 1)
+    report = json.loads(result.output)
+    assert not report["passed"]
+    assert set(report["projects"]) == {"a", "b"}
+    assert report["projects"]["a"]["passed"]
+    assert report["projects"]["a"]["files"]["CONTRIBUTORS.rst"]["status"] == (
+        "up-to-date"
+    )
+    assert not report["projects"]["b"]["passed"]
+    assert report["projects"]["b"]["files"]["CONTRIBUTORS.rst"]["status"] == (
+        "outdated"
+    )
+
+
+def test_projects_since(tmp_path, monkeypatch):
+    for name in ("a", "b"):
+        (tmp_path / name / ".templates").mkdir(parents=True)
+        _write_nengo_yml(
+            tmp_path / name,
+            nengo_yml="""
+            project_name: Dumdum
+            pkg_name: dummy
+            repo_name: dummy_org/dummy
+            license_rst: {}
+            """,
+        )
+        write_file(
+            tmp_path / name,
+            ".templates/LICENSE.rst.template",
+            '{% include "templates/LICENSE.rst.template" %}\n',
+        )
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(bones, ["generate", "--all"])
+    assert_exit(result, 0)
+
+    git.run_git("init", "-q", cwd=tmp_path)
+    git.run_git("add", ".", cwd=tmp_path)
+    git.run_git(
+        "-c",
+        "user.name=Name",
+        "-c",
+        "user.email=a@b.c",
+        "commit",
+        "-qm",
+        "Initial",
+        cwd=tmp_path,
+    )
+
+    result = CliRunner().invoke(bones, ["check", "--all", "--since", "HEAD"])
+    assert_exit(result, 0)
+    assert result.output.count("since HEAD:\n  LICENSE.rst\n") == 2
+
+    # changing the template overridden in one project checks its file
+    with (tmp_path / "b/.templates/LICENSE.rst.template").open("a") as f:
+        f.write("Extra text\n")
+    result = CliRunner().invoke(bones, ["check", "--all", "--since", "HEAD"])
+    assert_exit(result, 1)
+    assert result.output.count("since HEAD:\n  LICENSE.rst\n") == 1
+    assert "LICENSE.rst:\n  Content does not match" in result.output
@@ -1,6 +1,12 @@
 # pylint: disable=missing-docstring
 
-from nengo_bones.scripts.check_notice import check_notice
+import os
+import time
+
+import pytest
+
+from nengo_bones import git
+from nengo_bones.scripts.check_notice import check_notice, python_files
 from nengo_bones.tests.utils import write_file
 
 
@@ -40,3 +46,103 @@ def test_add_missing_notice(tmp_path):
     checked, missing = check_notice(tmp_path, "license text")
     assert checked == 1
     assert missing == 0
+
+
+def test_check_notice_reads_header(tmp_path):
+    text = "License text\n\nMore license text"
+    notice = "# License text\n#\n# More license text\n\n"
+    (tmp_path / "present.py").write_text(notice + "x = 1\n" * 1000)
+    (tmp_path / "crlf.py").write_bytes(
+        (notice + "x = 1\n").replace("\n", "\r\n").encode()
+    )
+    (tmp_path / "short.py").write_text("# License")
+    (tmp_path / "missing.py").write_text("x = 1\n" * 1000)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "nested.py").write_text(notice)
+
+    stats = {}
+    checked, missing = check_notice(tmp_path, text, stats=stats)
+    assert checked == 5
+    assert missing == 2
+
+    # only the start of each file is read
+    assert stats["bytes_read"] < 10 * len(text)
+
+    # notices shorter than the license text (where the comparison also depends on
+    # the file) are still checked
+    checked, missing = check_notice(
+        tmp_path, "a" + " " * 20, paths=[tmp_path / "missing.py"]
+    )
+    assert checked == 1
+    assert missing == 1
+
+
+@pytest.mark.parametrize("use_git", [True, False])
+def test_python_files(use_git, tmp_path):
+    for filename in [
+        "a.py",
+        "pkg/b.py",
+        "pkg/c.txt",
+        "docs/conf.py",
+        "build/lib/a.py",
+        "docs/_build/x.py",
+        ".tox/py38/lib/x.py",
+        "node_modules/x/x.py",
+        "venv/lib/x.py",
+        "venv/pyvenv.cfg",
+    ]:
+        (tmp_path / filename).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / filename).touch()
+
+    if use_git:
+        git.run_git("init", "-q", cwd=tmp_path)
+        (tmp_path / ".gitignore").write_text(
+            "build/\n_build/\n.tox/\nnode_modules/\nvenv/\n"
+        )
+        git.run_git("add", "a.py", cwd=tmp_path)
+        (tmp_path / "a.py").unlink()
+
+    expected = (
+        ["docs/conf.py", "pkg/b.py"]
+        if use_git
+        else ["a.py", "docs/conf.py", "pkg/b.py"]
+    )
+    assert python_files(tmp_path) == [tmp_path.resolve() / name for name in expected]
+
+
+def test_notice_cache(tmp_path):
+    def make_old(path):
+        # files modified very recently are not cached
+        os.utime(path, ns=(time.time_ns() - 10**10,) * 2)
+
+    text = "License text"
+    for name in ["a.py", "b.py"]:
+        (tmp_path / name).write_text(f"# {text}\n\nx = 1\n")
+        make_old(tmp_path / name)
+    (tmp_path / "missing.py").write_text("x = 1\n")
+    make_old(tmp_path / "missing.py")
+
+    stats = {}
+    assert check_notice(tmp_path, text, stats=stats) == (3, 1)
+    assert stats["files_cached"] == 0
+
+    # verified files are not read again
+    assert check_notice(tmp_path, text, stats=stats) == (3, 1)
+    assert stats["files_cached"] == 2
+    assert stats["bytes_read"] == len("x = 1\n")
+
+    # modified files are read again
+    (tmp_path / "a.py").write_text("x = 1\n")
+    assert check_notice(tmp_path, text, stats=stats) == (3, 2)
+    assert stats["files_cached"] == 1
+
+    # changing the text invalidates the cache, and only the files that are
+    # missing the new notice are fixed
+    new_text = "New license text"
+    (tmp_path / "c.py").write_text(f"# {new_text}\n\nx = 1\n")
+    make_old(tmp_path / "c.py")
+    c_mtime = (tmp_path / "c.py").stat().st_mtime_ns
+    assert check_notice(tmp_path, new_text, fix=True, stats=stats) == (4, 3)
+    assert stats["files_cached"] == 0
+    assert (tmp_path / "c.py").stat().st_mtime_ns == c_mtime
+    assert (tmp_path / "b.py").read_text().startswith(f"# {new_text}\n\n# {text}")
@@ -1,15 +1,17 @@
 # pylint: disable=missing-docstring
 
 import re
+import shutil
 
 import nbformat
 import pytest
 from click.testing import CliRunner
 from nbconvert.preprocessors import ExecutePreprocessor
 
+from nengo_bones import tools
 from nengo_bones.scripts import format_notebook
 from nengo_bones.scripts.base import bones
-from nengo_bones.tests.utils import assert_exit
+from nengo_bones.tests.utils import assert_exit, write_file
 
 
 def check_notebook(nb_path, correct):
@@ -120,11 +122,12 @@ def test_format_notebook(tmp_path):
     assert_exit(result, 0)
 
 
-@pytest.mark.xfail(
-    not format_notebook.HAS_PRETTIER,
-    reason="prettier not installed",
-)
 def test_format_notebook_prettier(tmp_path):
+    # note: we check for prettier here (rather than in an xfail marker), so that the
+    # results of the check are cached in the test cache directory (see conftest.py)
+    if not tools.has_tool("prettier"):
+        pytest.xfail("prettier not installed")
+
     nb = nbformat.v4.new_notebook()
     nb["cells"] = [
         nbformat.v4.new_markdown_cell("prettier\nwill\nunwrap\nthese\nlines"),
@@ -145,7 +148,7 @@ def test_format_notebook_prettier(tmp_path):
 
 
 def test_format_notebook_noprettier_error(tmp_path, monkeypatch):
-    monkeypatch.setattr(format_notebook, "HAS_PRETTIER", False)
+    monkeypatch.setattr(tools, "has_tool", lambda name, **_: name != "prettier")
 
     result = CliRunner().invoke(bones, ["format-notebook", str(tmp_path), "--prettier"])
     assert_exit(result, 1)
@@ -187,6 +190,277 @@ def test_format_dir_ignore(tmpdir):
     rootdir.mkdir("my.ipynb_checkpoints")
     rootdir.mkdir("format_this_dir")
     result = CliRunner().invoke(bones, ["format-notebook", str(rootdir)])
+    assert_exit(result, 0)
     assert re.search("Ignoring directory '[^']*_build'", result.output)
     assert re.search(r"Ignoring directory '[^']*my\.ipynb_checkpoints'", result.output)
     assert not re.search(r"Ignoring directory '[^']*format_this_dir'", result.output)
+
+
+def test_format_notebook_jobs(tmp_path):
+    for i in range(4):
+        nb = nbformat.v4.new_notebook()
+        nb["cells"] = [
+            nbformat.v4.new_markdown_cell(f"Notebook {i}"),
+            nbformat.v4.new_code_cell("print(undefined)" if i % 2 else "x = 1  "),
+        ]
+        (tmp_path / f"dir{i % 2}").mkdir(exist_ok=True)
+        with (tmp_path / f"dir{i % 2}" / f"nb{i}.ipynb").open("w") as f:
+            nbformat.write(nb, f)
+    (tmp_path / "dir0" / "_build").mkdir()
+
+    def format_notebooks(*args):
+        result = CliRunner().invoke(
+            bones, ["format-notebook", str(tmp_path), "--check", "--verbose", *args]
+        )
+        assert_exit(result, 1)
+        return result.output
+
+    output = format_notebooks("--batch")
+    assert "F821" in output
+    assert "Ignoring directory" in output
+
+    # the output is the same (and in the same order) when formatting concurrently
+    assert format_notebooks("--batch", "--jobs", "4") == output
+
+    # the static checks for each notebook are run concurrently without --batch, but
+    # their output is still printed in order
+    output = format_notebooks("--no-batch")
+    assert output.count("pylint errors detected") == 2
+    for nb_output in output.split("Formatting")[1:]:
+        if "errors detected" in nb_output:
+            assert nb_output.index("pylint errors") < nb_output.index("flake8 errors")
+    assert format_notebooks("--no-batch", "--jobs", "4") == output
+
+
+def test_format_notebook_batch(tmp_path):
+    for name, cells in [
+        (
+            "first",
+            [
+                nbformat.v4.new_markdown_cell("Title"),
+                nbformat.v4.new_code_cell("x = 1"),
+                nbformat.v4.new_markdown_cell("some reasearch"),
+                nbformat.v4.new_code_cell("y = 2\nprint(undefined)"),
+            ],
+        ),
+        ("second", [nbformat.v4.new_code_cell("def test():\n    a = b")]),
+    ]:
+        nb = nbformat.v4.new_notebook()
+        nb["cells"] = cells
+        with (tmp_path / f"{name}.ipynb").open("w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+
+    result = CliRunner().invoke(bones, ["format-notebook", str(tmp_path), "--batch"])
+    assert_exit(result, 1)
+
+    # errors are reported by notebook, cell and line
+    first = tmp_path / "first.ipynb"
+    second = tmp_path / "second.ipynb"
+    assert f"{first} (cell 4, line 2):6: E0602" in result.output  # pylint
+    assert f"{first} (cell 4, line 2):7: F821" in result.output  # flake8
+    assert f"{first} (cell 3, line 1): reasearch" in result.output  # codespell
+    assert f"{second} (cell 1, line 2):8: E0602" in result.output
+    assert "_bones_check_" not in result.output
+    assert sorted(tmp_path.iterdir()) == [first, second]
+
+    # the same errors are detected when checking each notebook separately
+    result = CliRunner().invoke(bones, ["format-notebook", str(tmp_path)])
+    assert_exit(result, 1)
+    assert f"{first}:5:6: E0602" in result.output
+    assert f"{second}:2:8: E0602" in result.output
+
+
+@pytest.mark.parametrize("batch", ["--batch", "--no-batch"])
+def test_format_notebook_batch_config(batch, tmp_path, monkeypatch):
+    write_file(tmp_path, ".nengobones.yml", "project_name: Dummy\npkg_name: dummy\n")
+    write_file(
+        tmp_path, "setup.cfg", "[flake8]\nper-file-ignores =\n    ignored/*:F821\n"
+    )
+    for dirname in ["checked", "ignored"]:
+        nb = nbformat.v4.new_notebook()
+        nb["cells"] = [nbformat.v4.new_code_cell("print(undefined)")]
+        (tmp_path / dirname).mkdir()
+        with (tmp_path / dirname / "notebook.ipynb").open("w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+    monkeypatch.chdir(tmp_path)
+
+    # path-scoped settings apply to the notebooks in both modes
+    result = CliRunner().invoke(bones, ["format-notebook", ".", batch, "--no-cache"])
+    assert_exit(result, 1)
+    flake8_errors = [line for line in result.output.splitlines() if "F821" in line]
+    assert len(flake8_errors) == 1
+    assert "checked" in flake8_errors[0] and "ignored" not in flake8_errors[0]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+@pytest.mark.parametrize("batch", ["--batch", "--no-batch"])
+def test_format_notebook_cache(batch, jobs, tmp_path):
+    def write_notebook(name, source):
+        nb = nbformat.v4.new_notebook()
+        nb["cells"] = [nbformat.v4.new_code_cell(source)]
+        with (tmp_path / name).open("w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+
+    write_notebook("clean.ipynb", f"print('{batch}')")
+    write_notebook("lint.ipynb", f"print(undefined, '{batch}')")
+
+    def format_notebooks(*args):
+        return CliRunner().invoke(
+            bones,
+            ["format-notebook", str(tmp_path), "--verbose", batch, "-j", jobs, *args],
+        )
+
+    result = format_notebooks()
+    assert_exit(result, 1)
+    assert "last verified" not in result.output
+
+    # only the notebook that passed is skipped
+    result = format_notebooks("--check")
+    assert_exit(result, 1)
+    assert f"'{tmp_path / 'clean.ipynb'}' has not changed" in result.output
+    assert f"'{tmp_path / 'lint.ipynb'}' has not changed" not in result.output
+    assert "F821" in result.output
+
+    # notebooks are checked again once they change
+    write_notebook("clean.ipynb", f"print('{batch}')  ")
+    result = format_notebooks("--check")
+    assert_exit(result, 1)
+    assert "last verified" not in result.output
+    assert "clean.ipynb has not been formatted" in result.output
+
+    # the cache can be disabled
+    result = format_notebooks()
+    assert_exit(result, 1)
+    result = format_notebooks("--check", "--no-cache")
+    assert_exit(result, 1)
+    assert "last verified" not in result.output
+    assert "F821" in result.output
+
+
+def test_format_notebook_cache_paths(tmp_path, monkeypatch):
+    write_file(tmp_path, ".nengobones.yml", "project_name: Dummy\npkg_name: dummy\n")
+    write_file(
+        tmp_path, "setup.cfg", "[flake8]\nper-file-ignores =\n    ignored/*:E501\n"
+    )
+    nb = nbformat.v4.new_notebook()
+    nb["cells"] = [nbformat.v4.new_code_cell(f'X = "{"x" * 80}"')]
+    for dirname in ["checked", "ignored"]:
+        (tmp_path / dirname).mkdir()
+    with (tmp_path / "ignored" / "notebook.ipynb").open("w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+    monkeypatch.chdir(tmp_path)
+
+    def check(path):
+        return CliRunner().invoke(
+            bones, ["format-notebook", path, "--check", "--verbose"]
+        )
+
+    result = check("ignored/notebook.ipynb")
+    assert_exit(result, 0)
+    assert "last verified" not in result.output
+    assert_exit(check("ignored/notebook.ipynb"), 0)
+
+    # the same notebook in another directory is checked again
+    shutil.copy(tmp_path / "ignored" / "notebook.ipynb", tmp_path / "checked")
+    result = check("checked/notebook.ipynb")
+    assert_exit(result, 1)
+    assert "E501" in result.output
+
+    # as is a notebook whose directory gains its own config file
+    write_file(tmp_path / "ignored", ".pylintrc", "[MESSAGES CONTROL]\n")
+    result = check("ignored/notebook.ipynb")
+    assert_exit(result, 0)
+    assert "last verified" not in result.output
+
+
+@pytest.mark.parametrize("batch", ["--batch", "--no-batch"])
+def test_format_notebook_checker_cache(batch, tmp_path, monkeypatch):
+    commands = []
+    run_command = format_notebook.run_command
+
+    def logged_run_command(command, inputs, cwd=None):
+        commands.append(command.split()[0])
+        return run_command(command, inputs, cwd=cwd)
+
+    monkeypatch.setattr(format_notebook, "run_command", logged_run_command)
+
+    def write_notebook(markdown, code):
+        nb = nbformat.v4.new_notebook()
+        nb["cells"] = [
+            nbformat.v4.new_markdown_cell(markdown),
+            nbformat.v4.new_code_cell(code),
+        ]
+        with (tmp_path / "notebook.ipynb").open("w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+
+    def format_notebooks():
+        commands.clear()
+        result = CliRunner().invoke(bones, ["format-notebook", str(tmp_path), batch])
+        return result, sorted(commands)
+
+    write_notebook("Title", "print(undefined)")
+    result, first_commands = format_notebooks()
+    assert_exit(result, 1)
+    assert first_commands == ["codespell", "flake8", "pylint"]
+    output = result.output
+
+    # only codespell checks markdown cells, so the other checkers are not run again
+    # (and the cached errors are still reported)
+    write_notebook("Another title", "print(undefined)")
+    result, cached_commands = format_notebooks()
+    assert_exit(result, 1)
+    assert cached_commands == ["codespell"]
+    assert result.output == output
+
+    # all the checkers are run when code cells change
+    write_notebook("Another title", "print(undefined, 1)")
+    result, changed_commands = format_notebooks()
+    assert_exit(result, 1)
+    assert changed_commands == first_commands
+    assert "F821" in result.output
+
+
+def test_format_notebook_incremental(tmp_path, monkeypatch):
+    formatted = []
+
+    def apply_black(source, cwd=None):
+        formatted.append(source)
+        return source.replace("'", '"')
+
+    monkeypatch.setattr(format_notebook, "apply_black", apply_black)
+
+    nb = nbformat.v4.new_notebook()
+    nb["cells"] = [
+        nbformat.v4.new_code_cell("x = 'a'"),
+        nbformat.v4.new_markdown_cell("Some text   "),
+        nbformat.v4.new_code_cell("print(x)"),
+    ]
+    nb_path = tmp_path / "test.ipynb"
+
+    def format_cells(*args):
+        with nb_path.open("w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+        formatted.clear()
+        result = CliRunner().invoke(
+            bones, ["format-notebook", str(nb_path), "--no-batch", *args]
+        )
+        assert_exit(result, 0)
+        with nb_path.open(encoding="utf-8") as f:
+            return [cell["source"] for cell in nbformat.read(f, as_version=4).cells]
+
+    assert format_cells() == ['x = "a"', "Some text", "print(x)"]
+    assert formatted == ["x = 'a'", "print(x)"]
+
+    # only cells that changed are formatted again (outputs are still cleared)
+    nb["cells"][0]["source"] = 'x = "a"'
+    nb["cells"][1]["source"] = "Some text"
+    nb["cells"][2]["source"] = "print('x')"
+    nb["cells"][0]["outputs"] = [nbformat.v4.new_output("stream", text="a\n")]
+    assert format_cells() == ['x = "a"', "Some text", 'print("x")']
+    assert formatted == ["print('x')"]
+    with nb_path.open(encoding="utf-8") as f:
+        assert nbformat.read(f, as_version=4).cells[0]["outputs"] == []
+
+    # all cells are formatted without the cache
+    format_cells("--no-cache")
+    assert formatted == ['x = "a"', "print('x')"]
@@ -0,0 +1,174 @@
+# pylint: disable=missing-docstring
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from nengo_bones import cache
+from nengo_bones.formatter import Formatter, get_formatter, record_timings
+
+UNFORMATTED = '''import sys
+import os
+def f( x ):
+    """   Summary of a function that is quite long, and whose summary will need to be wrapped.
+
+    A description."""
+    return {'x':x}
+'''
+
+
+def run_tools(source, cwd):
+    for tool in ["black", "docformatter", "isort"]:
+        args = [sys.executable, "-m", tool, "-"]
+        if tool == "black":
+            args.insert(3, "-q")
+        source = subprocess.run(
+            args,
+            input=source,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+            check=True,
+            cwd=cwd,
+        ).stdout
+    return source
+
+
+@pytest.mark.parametrize(
+    "pyproject",
+    [
+        None,
+        "[tool.black]\nline-length = 60\nskip-string-normalization = true\n\n"
+        "[tool.docformatter]\nwrap-summaries = 60\npre-summary-newline = true\n\n"
+        "[tool.isort]\nforce_single_line = true\n",
+    ],
+)
+def test_matches_command_line(pyproject, tmp_path):
+    if pyproject is not None:
+        (tmp_path / "pyproject.toml").write_text(pyproject, encoding="utf-8")
+
+    formatted = Formatter(tmp_path).format_file(UNFORMATTED)
+    assert formatted != UNFORMATTED
+    assert formatted == run_tools(UNFORMATTED, cwd=tmp_path)
+
+
+def test_generated_files_unchanged():
+    # files generated by nengo-bones should already be formatted
+    root = Path(__file__).parents[2]
+    formatter = get_formatter(root)
+    for filename in ["setup.py", "docs/conf.py", "nengo_bones/version.py"]:
+        source = (root / filename).read_text(encoding="utf-8")
+        assert formatter.format_file(source) == source
+
+
+def test_format_cell(tmp_path):
+    formatter = Formatter(tmp_path)
+
+    assert (
+        formatter.format_cell("%matplotlib inline\nx=[1,\n  2]\n  !ls -l")
+        == "%matplotlib inline\nx = [1, 2]\n!ls -l\n"
+    )
+
+    # cells that cannot be parsed are left unchanged
+    assert formatter.format_cell("def f(:\n  pass") == "def f(:\n  pass"
+
+
+def test_black_safety_checks(tmp_path, monkeypatch):
+    black = pytest.importorskip("black")
+    format_file_contents = black.format_file_contents
+
+    # like the black command line, we check that the output is equivalent to the
+    # input (i.e., we do not run black in "fast" mode)
+    calls = []
+
+    def checked_format_file_contents(src, fast, mode):
+        calls.append(fast)
+        return format_file_contents(src, fast=fast, mode=mode)
+
+    monkeypatch.setattr(black, "format_file_contents", checked_format_file_contents)
+    assert Formatter(tmp_path).black("x=1\n") == "x = 1\n"
+    assert calls == [False]
+
+
+def test_get_formatter(tmp_path):
+    formatter = get_formatter(tmp_path)
+    assert get_formatter(str(tmp_path)) is formatter
+    assert formatter.black_mode.line_length == 88
+
+    # changing the config creates a new formatter
+    (tmp_path / "pyproject.toml").write_text(
+        "[tool.black]\nline-length = 60\n", encoding="utf-8"
+    )
+    formatter = get_formatter(tmp_path)
+    assert formatter.black_mode.line_length == 60
+    assert get_formatter(tmp_path) is formatter
+
+    # adding a module creates a new formatter (since isort uses the module names)
+    (tmp_path / "module.py").touch()
+    assert get_formatter(tmp_path) is not formatter
+
+
+def test_settings_key(tmp_path):
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text(
+        "# Automatically generated by nengo-bones, do not edit this file directly\n"
+        "# nengo-bones-stamp: inputs=aaaa body=bbbb version=1.0\n"
+        "[tool.black]\n",
+        encoding="utf-8",
+    )
+    key = Formatter(tmp_path).settings_key
+
+    # comments (e.g. generation stamps) and generated modules do not affect the
+    # settings
+    pyproject.write_text(
+        pyproject.read_text(encoding="utf-8").replace("version=1.0", "version=2.0"),
+        encoding="utf-8",
+    )
+    (tmp_path / "setup.py").touch()
+    (tmp_path / "docs").mkdir()
+    assert Formatter(tmp_path).settings_key == key
+
+    # neither do directories that cannot contain first-party modules
+    for dirname in ["build/lib", "dist", "pkg.egg-info", ".tox", "not-a-module"]:
+        (tmp_path / dirname).mkdir(parents=True)
+    (tmp_path / "build" / "lib" / "x.py").touch()
+    assert Formatter(tmp_path).settings_key == key
+
+    # but other changes do
+    (tmp_path / "module.py").touch()
+    assert Formatter(tmp_path).settings_key != key
+
+
+def test_cache(tmp_path, monkeypatch):
+    content_cache = cache.ContentCache(tmp_path / "cache", max_size=2**20)
+    root = tmp_path / "project"
+    root.mkdir()
+    formatter = Formatter(root, cache=content_cache)
+
+    formatted = formatter.format_file(UNFORMATTED)
+    assert formatter.format_cell("x=1") == "x = 1\n"
+
+    # cached results are used without running the formatters
+    monkeypatch.setattr(Formatter, "black", lambda *args: pytest.fail())
+    assert formatter.format_file(UNFORMATTED) == formatted
+    assert Formatter(root, cache=content_cache).format_cell("x=1") == "x = 1\n"
+
+    # changing the config changes the key
+    (root / "pyproject.toml").write_text("[tool.black]\n", encoding="utf-8")
+    with pytest.raises(pytest.fail.Exception):
+        Formatter(root, cache=content_cache).format_cell("x=1")
+
+
+def test_record_timings(tmp_path):
+    formatter = Formatter(tmp_path)
+    with record_timings() as timings:
+        formatter.format_file(UNFORMATTED)
+        assert formatter.format_cell("x=1") == "x = 1\n"
+    assert set(timings) == {"black", "docformatter", "isort"}
+    assert all(t > 0 for t in timings.values())
+
+    # timings are only recorded within the context
+    black_time = timings["black"]
+    formatter.format_cell("y=1")
+    assert timings["black"] == black_time
@@ -7,14 +7,17 @@ the ci scripts of this repository itself, which are generated by this code.
 """
 
 import datetime
+import json
 import os
 import runpy
+import threading
+import time
 from textwrap import dedent
 
 import pytest
 from click.testing import CliRunner
 
-from nengo_bones import all_files, all_sections
+from nengo_bones import all_files, all_sections, formatter, watch
 from nengo_bones.config import license_types
 from nengo_bones.scripts.base import bones
 from nengo_bones.tests.utils import assert_exit, make_has_line, write_file
@@ -680,3 +683,330 @@ def test_license_notice(tmp_path, monkeypatch):
         "All information contained herein"
         in (tmp_path / "dummy" / "version.py").read_text()
     )
+
+
+def test_generate_jobs(tmp_path, monkeypatch):
+    nengo_yml = dedent("""
+        license_rst:
+          add_to_files: true
+        ci_scripts:
+          - template: static
+          - template: test
+          - template: test
+            output_name: test-coverage
+            coverage: true
+          - template: docs
+          - template: deploy
+        """)
+    for configname in all_sections:
+        if configname == "version_py":
+            nengo_yml += "version_py:\n  release: true\n  type: calver\n"
+        elif configname != "license_rst":
+            nengo_yml += f"{configname}: {{}}\n"
+
+    outputs = {}
+    for jobs in (1, 4):
+        root = tmp_path / str(jobs)
+        root.mkdir()
+        write_nengobones(root, nengo_yml)
+        write_file(root, "file.py", "x = 1\n")
+        monkeypatch.chdir(root)
+
+        result = CliRunner().invoke(bones, ["generate", "--jobs", str(jobs)])
+        assert_exit(result, 0)
+        result = CliRunner().invoke(bones, ["generate", "-j", str(jobs), "ci-scripts"])
+        assert_exit(result, 0)
+
+        outputs[jobs] = {
+            str(path.relative_to(root)): path.read_text()
+            for path in sorted(root.rglob("*"))
+            if path.is_file()
+        }
+        outputs[jobs]["output"] = result.output
+
+    assert len(outputs[1]) > len(all_files) + 5
+    assert outputs[1] == outputs[4]
+
+
+def test_generate_jobs_formatted_concurrently(tmp_path, monkeypatch):
+    write_nengobones(
+        tmp_path,
+        """
+        docs_conf_py: {}
+        setup_py: {}
+        version_py:
+          release: true
+          type: calver
+        """,
+    )
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(bones, ["generate"])
+    assert_exit(result, 0)
+
+    # record how many files are being formatted at once
+    lock = threading.Lock()
+    active = [0]
+    max_active = [0]
+    format_file = formatter.Formatter.format_file
+
+    def slow_format_file(self, source):
+        with lock:
+            active[0] += 1
+            max_active[0] = max(max_active[0], active[0])
+        time.sleep(0.2)
+        try:
+            return format_file(self, source)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(formatter.Formatter, "format_file", slow_format_file)
+    result = CliRunner().invoke(bones, ["generate", "--force", "--jobs", "3"])
+    assert_exit(result, 0)
+    assert max_active[0] == 3
+
+    # the files are still formatted with the same settings as when checking them
+    result = CliRunner().invoke(bones, ["check"])
+    assert_exit(result, 0)
+
+
+def test_generate_incremental(tmp_path, monkeypatch):
+    write_nengobones(
+        tmp_path,
+        """
+        contributing_rst: {}
+        license_rst: {}
+        setup_py: {}
+        """,
+    )
+    monkeypatch.chdir(tmp_path)
+
+    def generate(*args):
+        result = CliRunner().invoke(bones, ["generate", *args])
+        assert_exit(result, 0)
+        return result.output
+
+    output = generate()
+    assert "Generating setup.py (not previously generated)" in output
+
+    # nothing changed, so nothing is regenerated (or rewritten)
+    mtime = (tmp_path / "setup.py").stat().st_mtime_ns
+    output = generate()
+    assert "Generating" not in output
+    assert "3 file(s) already up to date" in output
+    assert (tmp_path / "setup.py").stat().st_mtime_ns == mtime
+
+    # build outputs do not change the formatter settings
+    (tmp_path / "build" / "lib").mkdir(parents=True)
+    (tmp_path / "build" / "lib" / "x.py").touch()
+    output = generate()
+    assert "Generating" not in output
+
+    # regenerating a file with the same content does not rewrite it
+    output = generate("--force")
+    assert "Generating setup.py (forced)" in output
+    assert (tmp_path / "setup.py").stat().st_mtime_ns == mtime
+
+    # modified and missing files are regenerated
+    (tmp_path / "setup.py").write_text("modified")
+    (tmp_path / "LICENSE.rst").unlink()
+    output = generate()
+    assert "Generating setup.py (file was modified)" in output
+    assert "Generating LICENSE.rst (file is missing)" in output
+    assert "1 file(s) already up to date" in output
+    assert "setuptools" in (tmp_path / "setup.py").read_text()
+
+    # changing an (overridden) template regenerates the files that use it
+    (tmp_path / ".templates").mkdir()
+    write_file(
+        tmp_path,
+        ".templates/CONTRIBUTING.rst.template",
+        '{% include "templates/CONTRIBUTING.rst.template" %}\nExtra text\n',
+    )
+    output = generate()
+    assert "Generating CONTRIBUTING.rst (templates changed)" in output
+    assert "2 file(s) already up to date" in output
+    assert (tmp_path / "CONTRIBUTING.rst").read_text().endswith("Extra text\n")
+
+    # changing the config regenerates the files that use it
+    with (tmp_path / ".nengobones.yml").open("a") as f:
+        f.write("author: Someone Else\n")
+    output = generate()
+    assert "Generating setup.py (config changed)" in output
+
+    # --force regenerates everything
+    output = generate("--force")
+    assert "Generating setup.py (forced)" in output
+    assert "already up to date" not in output
+
+
+def test_generate_check_stamps(tmp_path, monkeypatch):
+    nengo_yml = "project_name: Dummy\npkg_name: dummy\nrepo_name: dummy/dummy_repo\n"
+    for configname in all_sections:
+        nengo_yml += f"{configname}:"
+        if configname == "version_py":
+            nengo_yml += "\n  release: false\n  type: calver"
+        else:
+            nengo_yml += " {}"
+        nengo_yml += "\n"
+    write_file(tmp_path=tmp_path, filename=".nengobones.yml", contents=nengo_yml)
+    (tmp_path / "dummy").mkdir()
+    (tmp_path / "dummy" / "__init__.py").touch()
+    monkeypatch.chdir(tmp_path)
+
+    result = CliRunner().invoke(bones, ["generate"])
+    assert_exit(result, 0)
+
+    # every file is verified by its stamp, without rendering it
+    result = CliRunner().invoke(bones, ["check", "--report", "json"])
+    assert_exit(result, 0)
+    report = json.loads(result.output)
+    assert len(report["files"]) == len(all_files)
+    for name, file_report in report["files"].items():
+        # py.typed is empty, so it has no stamp (but does not need to be rendered)
+        if name != "dummy/py.typed":
+            assert file_report["status"] == "up-to-date", name
+        assert file_report["render_time"] is None, name
+
+    # and nothing is regenerated
+    result = CliRunner().invoke(bones, ["generate"])
+    assert_exit(result, 0)
+    assert "Generating" not in result.output
+    assert f"{len(all_files)} file(s) already up to date" in result.output
+
+
+def test_generate_watch(tmp_path, monkeypatch):
+    write_nengobones(
+        tmp_path,
+        """
+        contributing_rst: {}
+        license_rst: {}
+        setup_py: {}
+        """,
+    )
+    monkeypatch.chdir(tmp_path)
+
+    class FakeWatcher(watch.Watcher):
+        """Makes a change whenever we wait for one."""
+
+        def __init__(self, changes):
+            super().__init__(files=[], directories=[])
+            self.changes = changes
+
+        def wait(self, timeout=None):
+            if len(self.changes) == 0:
+                raise KeyboardInterrupt()
+            change = self.changes.pop(0)
+            return {change()}
+
+    def override_template():
+        (tmp_path / ".templates").mkdir()
+        write_file(
+            tmp_path,
+            ".templates/CONTRIBUTING.rst.template",
+            '{% include "templates/CONTRIBUTING.rst.template" %}\nExtra text\n',
+        )
+        return tmp_path / ".templates/CONTRIBUTING.rst.template"
+
+    def break_config():
+        with (tmp_path / ".nengobones.yml").open("a") as f:
+            f.write("setup_cfg: [\n")
+        return tmp_path / ".nengobones.yml"
+
+    def fix_config():
+        text = (tmp_path / ".nengobones.yml").read_text()
+        (tmp_path / ".nengobones.yml").write_text(
+            text.replace("setup_cfg: [\n", "license: mit\n")
+        )
+        return tmp_path / ".nengobones.yml"
+
+    watcher = FakeWatcher([override_template, break_config, fix_config])
+    monkeypatch.setattr(watch, "watcher", lambda files, directories: watcher)
+
+    result = CliRunner().invoke(bones, ["generate", "--watch"])
+    assert_exit(result, 0)
+    has_line = make_has_line(result.output.splitlines())
+
+    assert has_line("Generating setup.py (not previously generated)")
+    assert has_line("Watching .nengobones.yml and .templates for changes", strip=True)
+
+    # only the files that depend on the changed template are regenerated
+    assert has_line("Detected changes to CONTRIBUTING.rst.template")
+    assert has_line("Generating CONTRIBUTING.rst (templates changed)")
+    assert has_line("2 file(s) already up to date")
+    assert (tmp_path / "CONTRIBUTING.rst").read_text().endswith("Extra text\n")
+
+    # errors do not stop us watching
+    assert has_line("Detected changes to .nengobones.yml")
+    assert has_line("Error: ", strip=True)
+
+    # only the files that depend on the changed config are regenerated
+    assert has_line("Detected changes to .nengobones.yml")
+    assert has_line("Generating LICENSE.rst (config changed)")
+    assert has_line("Generating setup.py (config changed)")
+    assert has_line("1 file(s) already up to date")
+    assert has_line("Stopped watching")
+
+
+def test_generate_projects(tmp_path, monkeypatch):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        write_nengobones(
+            tmp_path / name,
+            """
+            contributors_rst: {}
+            license_rst:
+              add_to_files: true
+            """,
+        )
+    (tmp_path / "a/.templates").mkdir()
+    write_file(
+        tmp_path,
+        "a/.templates/CONTRIBUTORS.rst.template",
+        '{% include "templates/CONTRIBUTORS.rst.template" %}\nExtra text\n',
+    )
+    (tmp_path / "b/file.py").write_text("x = 1\n")
+    monkeypatch.chdir(tmp_path)
+
+    result = CliRunner().invoke(bones, ["generate", "--all", "--jobs", "2"])
+    assert_exit(result, 0)
+    has_line = make_has_line(result.output.splitlines())
+    assert has_line("Project in a:")
+    assert has_line("Generating a/CONTRIBUTORS.rst (not previously generated)")
+    assert has_line("Generating a/LICENSE.rst (not previously generated)")
+    assert has_line("Project in b:")
+    assert has_line("Generating b/CONTRIBUTORS.rst (not previously generated)")
+    assert has_line("Fixed: ", strip=True)
+
+    # each project uses its own templates, and license notices are added to the
+    # files in each project
+    assert (tmp_path / "a/CONTRIBUTORS.rst").read_text().endswith("Extra text\n")
+    assert not (tmp_path / "b/CONTRIBUTORS.rst").read_text().endswith("Extra text\n")
+    assert (tmp_path / "b/file.py").read_text().startswith("# All information")
+
+    # projects can also be listed explicitly (and subcommands apply to each one)
+    result = CliRunner().invoke(
+        bones,
+        [
+            "generate",
+            "--conf-file",
+            "a/.nengobones.yml",
+            "--conf-file",
+            "b/.nengobones.yml",
+            "contributors-rst",
+        ],
+    )
+    assert_exit(result, 0)
+    assert result.output == (
+        "Project in a:\n1 file(s) already up to date\n"
+        "Project in b:\n1 file(s) already up to date\n"
+    )
+
+    result = CliRunner().invoke(bones, ["generate", "--all", "--watch"])
+    assert_exit(result, 2)
+    assert "--watch can only be used with a single project" in result.output
+
+    monkeypatch.chdir(tmp_path / "a/.templates")
+    result = CliRunner().invoke(bones, ["generate", "--all"])
+    assert_exit(result, 1)
+    assert "Could not find any .nengobones.yml files" in result.output
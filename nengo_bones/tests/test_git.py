@@ -0,0 +1,44 @@
+# pylint: disable=missing-docstring
+
+import pytest
+
+from nengo_bones import git
+
+
+def test_changed_files(tmp_path):
+    git.run_git("init", "-q", cwd=tmp_path)
+    (tmp_path / "committed.txt").write_text("a\n", encoding="utf-8")
+    (tmp_path / "deleted.txt").write_text("a\n", encoding="utf-8")
+    (tmp_path / "ignored.txt").write_text("a\n", encoding="utf-8")
+    (tmp_path / ".gitignore").write_text("ignored.txt\n", encoding="utf-8")
+    git.run_git("add", ".", cwd=tmp_path)
+    git.run_git(
+        "-c",
+        "user.name=Name",
+        "-c",
+        "user.email=a@b.c",
+        "commit",
+        "-qm",
+        "Initial",
+        cwd=tmp_path,
+    )
+    assert git.changed_files("HEAD", cwd=tmp_path) == set()
+
+    (tmp_path / "committed.txt").write_text("b\n", encoding="utf-8")
+    (tmp_path / "deleted.txt").unlink()
+    (tmp_path / "ignored.txt").write_text("b\n", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "untracked.txt").write_text("a\n", encoding="utf-8")
+    root = tmp_path.resolve()
+    assert git.changed_files("HEAD", cwd=tmp_path / "sub") == {
+        root / "committed.txt",
+        root / "deleted.txt",
+        root / "sub" / "untracked.txt",
+    }
+
+    # files are read as they were at the reference
+    assert git.show_file("HEAD", tmp_path / "committed.txt", cwd=tmp_path) == "a\n"
+    assert git.show_file("HEAD", tmp_path / "sub/untracked.txt", cwd=tmp_path) is None
+
+    with pytest.raises(RuntimeError, match="failed with the following error"):
+        git.changed_files("not-a-ref", cwd=tmp_path)
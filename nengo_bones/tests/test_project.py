@@ -0,0 +1,82 @@
+# pylint: disable=missing-docstring
+
+from pathlib import Path
+
+import pytest
+
+from nengo_bones import git
+from nengo_bones import project as project_module
+from nengo_bones.project import Project, find_projects
+from nengo_bones.tests.utils import write_file
+
+
+def test_project_default(monkeypatch):
+    calls = []
+    find_config = project_module.find_config
+    monkeypatch.setattr(
+        project_module, "find_config", lambda: calls.append(1) or find_config()
+    )
+
+    project = Project()
+    repo_root = Path(__file__).parents[2]
+    assert project.conf_file == repo_root / ".nengobones.yml"
+    assert project.root == repo_root
+    assert project.root == repo_root
+    assert len(calls) == 1
+
+    config = project.config
+    assert config["pkg_name"] == "nengo_bones"
+    assert project.config is config
+    env = project.env
+    assert project.env is env
+
+
+def test_project_conf_file(tmp_path, monkeypatch):
+    write_file(
+        tmp_path=tmp_path,
+        filename=".nengobones.yml",
+        contents="""
+        project_name: Dummy
+        pkg_name: dummy
+        repo_name: dummy/dummy_repo
+        """,
+    )
+
+    # tools are run from the project containing the current directory
+    project = Project(tmp_path / ".nengobones.yml")
+    assert project.config["pkg_name"] == "dummy"
+    assert project.root == Path(__file__).parents[2]
+
+    # unless there is no such project
+    monkeypatch.chdir(tmp_path.parent)
+    project = Project(tmp_path / ".nengobones.yml")
+    assert project.root == tmp_path
+
+
+@pytest.mark.parametrize("use_git", (True, False))
+def test_find_projects(tmp_path, use_git):
+    for name in ("a", "b/c", "build/d", "node_modules/e"):
+        (tmp_path / name).mkdir(parents=True)
+        write_file(
+            tmp_path=tmp_path / name,
+            filename=".nengobones.yml",
+            contents=f"""
+            project_name: {name[-1]}
+            pkg_name: {name[-1]}
+            repo_name: dummy/{name[-1]}
+            """,
+        )
+    if use_git:
+        git.run_git("init", "-q", cwd=tmp_path)
+        (tmp_path / ".gitignore").write_text("node_modules/\n")
+        expected = ["a", "b/c", "build/d"]
+    else:
+        expected = ["a", "b/c"]
+
+    projects = find_projects(tmp_path)
+    assert [project.root for project in projects] == [
+        tmp_path.resolve() / name for name in expected
+    ]
+    assert [project.config["pkg_name"] for project in projects] == [
+        name[-1] for name in expected
+    ]
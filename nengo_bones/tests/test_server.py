@@ -0,0 +1,122 @@
+# pylint: disable=missing-docstring
+
+import socket
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from nengo_bones.scripts import server
+from nengo_bones.scripts.base import bones
+from nengo_bones.tests.utils import assert_exit, write_file
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Server requires unix sockets"
+)
+
+
+def run_bones(*args, cwd):
+    """Run bones as it would be from the command line."""
+    return subprocess.run(
+        [sys.executable, "-c", "from nengo_bones.scripts.base import bones; bones()"]
+        + list(args),
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        encoding="utf-8",
+        check=False,
+    )
+
+
+def test_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("NENGO_BONES_SERVER_SOCKET", str(tmp_path / "bones.sock"))
+    write_file(
+        tmp_path=tmp_path,
+        filename=".nengobones.yml",
+        contents="""
+        project_name: Dummy
+        pkg_name: dummy
+        repo_name: dummy/dummy_repo
+        contributors_rst: {}
+        """,
+    )
+
+    result = CliRunner().invoke(bones, ["server", "status"])
+    assert_exit(result, 1)
+    assert "No server running" in result.output
+
+    result = CliRunner().invoke(bones, ["server", "start", "--background"])
+    assert_exit(result, 0)
+    try:
+        result = run_bones("generate", "contributors-rst", cwd=tmp_path)
+        assert result.returncode == 0, result.stdout
+        assert (tmp_path / "CONTRIBUTORS.rst").exists()
+
+        # errors are streamed back and exit codes are preserved
+        (tmp_path / "CONTRIBUTORS.rst").write_text(
+            ".. Automatically generated by nengo-bones"
+        )
+        result = run_bones("check", cwd=tmp_path)
+        assert result.returncode == 1
+        assert "CONTRIBUTORS.rst:\n  Content does not match" in result.stdout
+
+        # commands that are not forwarded run in-process
+        result = run_bones("server", "status", cwd=tmp_path)
+        assert result.returncode == 0
+        assert "requests handled: 2" in result.stdout
+
+        # only the current user can connect to the server
+        assert (tmp_path / "bones.sock").stat().st_mode & 0o777 == 0o600
+
+        # commands run in-process while the server is busy with another client
+        stuck = server._connect(  # pylint: disable=protected-access
+            tmp_path / "bones.sock"
+        )
+        try:
+            assert server.forward(["check"]) is None
+        finally:
+            stuck.close()
+        assert server.forward(["check", "--help"]) == 0
+    finally:
+        result = CliRunner().invoke(bones, ["server", "stop"])
+        assert_exit(result, 0)
+        assert "Stopped bones server" in result.output
+
+    assert not (tmp_path / "bones.sock").exists()
+
+
+def test_forward_without_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("NENGO_BONES_SERVER_SOCKET", str(tmp_path / "bones.sock"))
+    assert server.forward(["check"]) is None
+
+    (tmp_path / "bones.sock").touch()
+    assert server.forward(["check"]) is None
+
+    monkeypatch.setenv("NENGO_BONES_NO_SERVER", "1")
+    assert server.forward(["check"]) is None
+
+
+def test_socket_path_does_not_create_cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("NENGO_BONES_SERVER_SOCKET", raising=False)
+    monkeypatch.setenv("NENGO_BONES_CACHE_DIR", str(tmp_path / "cache"))
+    assert server.socket_path() == tmp_path / "cache" / "server.sock"
+    assert server.forward(["check"]) is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_background_server_ignores_cwd(tmp_path, monkeypatch):
+    # modules in the directory the server is started from are not imported
+    monkeypatch.setenv("NENGO_BONES_SERVER_SOCKET", str(tmp_path / "bones.sock"))
+    (tmp_path / "click.py").write_text(
+        "import pathlib\npathlib.Path(__file__).with_name('imported').touch()\n"
+    )
+    monkeypatch.chdir(tmp_path)
+
+    result = CliRunner().invoke(bones, ["server", "start", "--background"])
+    assert_exit(result, 0)
+    try:
+        assert not (tmp_path / "imported").exists()
+    finally:
+        result = CliRunner().invoke(bones, ["server", "stop"])
+        assert_exit(result, 0)
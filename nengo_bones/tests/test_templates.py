@@ -0,0 +1,91 @@
+# pylint: disable=missing-docstring
+
+import jinja2
+import pytest
+
+from nengo_bones import templates
+from nengo_bones.tests.utils import write_file
+
+
+def test_precompiled_builtins(bones_cache_dir, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    env = templates.load_env()
+
+    template = env.get_template("setup.py.template")
+    assert template.filename.startswith(str(bones_cache_dir / "templates"))
+    assert env.get_template("templates/setup.py.template").filename == (
+        template.filename
+    )
+
+    # templates are only compiled once
+    monkeypatch.setattr(
+        jinja2.Environment, "compile_templates", lambda *args, **kwargs: pytest.fail()
+    )
+    assert (
+        templates.compile_builtin_templates()
+        == templates.compile_builtin_templates()
+        == bones_cache_dir / "templates" / template.filename.split("/")[-2]
+    )
+
+    # sources are still available
+    sources = templates.template_sources(env, "static.sh.template")
+    assert set(sources) == {"static.sh.template", "base_script.sh.template"}
+
+
+def test_override_bytecode_cache(bones_cache_dir, monkeypatch, tmp_path):
+    (tmp_path / ".templates").mkdir()
+    write_file(
+        tmp_path,
+        ".templates/LICENSE.rst.template",
+        '{% include "templates/LICENSE.rst.template" %}\nOverridden\n',
+    )
+    monkeypatch.chdir(tmp_path)
+
+    env = templates.load_env()
+    template = env.get_template("LICENSE.rst.template")
+    assert template.filename == str(tmp_path / ".templates" / "LICENSE.rst.template")
+    assert any((bones_cache_dir / "bytecode").iterdir())
+
+    # the compiled override is loaded from the bytecode cache by new environments
+    monkeypatch.setattr(
+        jinja2.Environment, "compile", lambda *args, **kwargs: pytest.fail()
+    )
+    templates._create_env.cache_clear()
+    rendered = (
+        templates.load_env()
+        .get_template("LICENSE.rst.template")
+        .render(
+            project_name="Dummy",
+            license_rst={"type": "mit", "text": "Text"},
+            copyright_start=2020,
+            copyright_end=2021,
+            author="Author",
+        )
+    )
+    assert rendered.endswith("Overridden\n")
+
+
+def test_stamp():
+    text = "# Automatically generated by nengo-bones\n\nx = 1\n"
+    stamped = templates.add_stamp(text, "0123456789abcdef", version="1.2.3")
+    lines = stamped.splitlines(keepends=True)
+    assert lines[1] == (
+        f"# nengo-bones-stamp: inputs=0123456789ab "
+        f"body={templates.body_hash(text.splitlines(keepends=True))} version=1.2.3\n"
+    )
+    assert templates.read_stamp(lines) == {
+        "inputs": "0123456789ab",
+        "body": templates.body_hash(lines),
+        "version": "1.2.3",
+    }
+    assert templates.strip_lines(lines) == text.splitlines(keepends=True)
+
+    # lines marked with ``# bones: ignore`` do not change the body hash
+    ignored = stamped.replace("x = 1\n", "x = 1\ny = 2  # bones: ignore\n")
+    assert templates.body_hash(ignored.splitlines(keepends=True)) == (
+        templates.body_hash(lines)
+    )
+
+    # files without a header are not stamped
+    assert templates.add_stamp("x = 1\n", "0123456789abcdef") == "x = 1\n"
+    assert templates.read_stamp(["x = 1\n"]) is None
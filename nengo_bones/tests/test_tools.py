@@ -0,0 +1,54 @@
+# pylint: disable=missing-docstring
+
+import os
+
+import pytest
+
+from nengo_bones import tools
+
+
+@pytest.fixture(name="fake_tool")
+def fixture_fake_tool(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    exe = bin_dir / "black"
+    exe.write_text("#!/bin/sh\nexit 0\n")
+    exe.chmod(0o755)
+
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv("NENGO_BONES_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(tools, "_probed", {})
+    return exe
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Uses a shell script as a fake tool")
+def test_has_tool_cached(fake_tool, monkeypatch):
+    probed = []
+    probe = tools._probe
+    monkeypatch.setattr(
+        tools, "_probe", lambda *args: probed.append(args) or probe(*args)
+    )
+
+    assert tools.has_tool("black")
+    assert len(probed) == 1
+    assert (fake_tool.parents[1] / "cache" / "tools.json").exists()
+
+    # second call uses the in-memory cache, and a new process uses the disk cache
+    assert tools.has_tool("black")
+    monkeypatch.setattr(tools, "_probed", {})
+    assert tools.has_tool("black")
+    assert len(probed) == 1
+
+    # modifying the tool invalidates the cache
+    fake_tool.write_text("#!/bin/sh\nexit 1\n")
+    os.utime(fake_tool, ns=(0, 0))
+    assert not tools.has_tool("black")
+    assert len(probed) == 2
+
+
+def test_missing_tool(fake_tool):
+    fake_tool.unlink()
+    assert not tools.has_tool("black")
+    assert not tools.has_tool("prettier")
+    with pytest.raises(RuntimeError, match="'pylint' is required"):
+        tools.require_tool("pylint")
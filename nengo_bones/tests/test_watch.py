@@ -0,0 +1,57 @@
+# pylint: disable=missing-docstring
+
+import sys
+
+import pytest
+
+from nengo_bones import watch
+
+
+@pytest.mark.parametrize("watcher_type", ["polling", "inotify"])
+def test_watcher(watcher_type, tmp_path):
+    if watcher_type == "inotify":
+        if not sys.platform.startswith("linux"):
+            pytest.skip("inotify is only available on Linux")
+        watcher_cls = watch.InotifyWatcher
+        kwargs = {}
+    else:
+        watcher_cls = watch.PollingWatcher
+        kwargs = {"interval": 0.01}
+
+    config = tmp_path / "config.yml"
+    config.write_text("a", encoding="utf-8")
+    templates = tmp_path / "templates"
+    root = tmp_path.resolve()
+
+    with watcher_cls(files=[config], directories=[templates], **kwargs) as watcher:
+        assert watcher.wait(timeout=0.05) == set()
+
+        # changes to other files are ignored
+        (tmp_path / "other.txt").write_text("a", encoding="utf-8")
+        assert watcher.wait(timeout=0.05) == set()
+
+        config.write_text("b", encoding="utf-8")
+        assert watcher.wait(timeout=1) == {root / "config.yml"}
+
+        # files in watched directories are watched, even if the directories are
+        # created later
+        (templates / "sub").mkdir(parents=True)
+        (templates / "sub" / "a.template").write_text("a", encoding="utf-8")
+        assert root / "templates" / "sub" / "a.template" in watcher.wait(timeout=1)
+
+        (templates / "sub" / "a.template").write_text("b", encoding="utf-8")
+        assert watcher.wait(timeout=1) == {root / "templates" / "sub" / "a.template"}
+
+        # files that are replaced (as some editors do) are detected
+        (tmp_path / "new.yml").write_text("c", encoding="utf-8")
+        (tmp_path / "new.yml").replace(config)
+        assert root / "config.yml" in watcher.wait(timeout=1)
+
+
+def test_watcher_fallback(monkeypatch, tmp_path):
+    def fail(*args, **kwargs):
+        raise OSError("inotify is not available")
+
+    monkeypatch.setattr(watch.InotifyWatcher, "__init__", fail)
+    with watch.watcher(files=[tmp_path / "a"], directories=[]) as watcher:
+        assert isinstance(watcher, watch.PollingWatcher)
@@ -0,0 +1,160 @@
+"""
+Detects which external tools are available.
+
+Probing a tool means starting a process (and for Prettier, ``npx``), which is
+slow, so tools are only probed the first time they are actually needed. The
+results are cached on disk, keyed by everything that could change the outcome
+(the ``PATH``, the modification times of the tool executables and the state of
+any ``node_modules`` directories), so that subsequent runs skip the probe
+entirely.
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+from nengo_bones import cache
+
+probe_commands = {
+    "black": ["black", "--version"],
+    "codespell": ["codespell", "--version"],
+    "flake8": ["flake8", "--version"],
+    "prettier": ["npx", "--no-install", "--quiet", "prettier", "--version"],
+    "pylint": ["pylint", "--version"],
+}
+
+# maximum number of probe results stored on disk for each tool
+max_cached_keys = 32
+
+_probed = {}
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [str(path), st.st_mtime_ns, st.st_size]
+
+
+def _node_modules_state(name, cwd):
+    # npx looks for packages in node_modules directories in cwd and its parents
+    state = []
+    for parent in (cwd, *cwd.parents):
+        node_modules = parent / "node_modules"
+        if node_modules.is_dir():
+            state.append(_stat_key(node_modules))
+            state.append(_stat_key(node_modules / ".bin" / name))
+    return state
+
+
+def probe_key(name, cwd=None):
+    """
+    Compute the cache key for the availability of a tool.
+
+    Parameters
+    ----------
+    name : str
+        Name of the tool (one of the keys of ``probe_commands``).
+    cwd : `pathlib.Path`, optional
+        Directory in which the tool will be run (defaults to the current directory).
+
+    Returns
+    -------
+    key : str
+        A hash that changes whenever the result of probing the tool might change.
+    """
+
+    cwd = Path.cwd() if cwd is None else Path(cwd).resolve()
+    argv = probe_commands[name]
+    path = os.environ.get("PATH", "")
+    exe = shutil.which(argv[0], path=path)
+    return cache.hash_key(
+        argv,
+        path,
+        _stat_key(exe) if exe is not None else None,
+        _node_modules_state(name, cwd) if argv[0] == "npx" else None,
+    )
+
+
+def _probe(name, cwd):
+    argv = probe_commands[name]
+    exe = shutil.which(argv[0])
+    if exe is None:
+        return False
+
+    try:
+        result = subprocess.run(
+            [exe, *argv[1:]],
+            check=False,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            cwd=cwd,
+        )
+    except OSError:
+        return False
+    return result.returncode == 0
+
+
+def has_tool(name, cwd=None):
+    """
+    Check whether an external tool is available.
+
+    Parameters
+    ----------
+    name : str
+        Name of the tool (one of the keys of ``probe_commands``).
+    cwd : `pathlib.Path`, optional
+        Directory in which the tool will be run (defaults to the current directory).
+
+    Returns
+    -------
+    available : bool
+        True if the tool can be run.
+    """
+
+    key = probe_key(name, cwd=cwd)
+    if key in _probed:
+        return _probed[key]
+
+    cache_file = cache.cache_dir() / "tools.json"
+    cached = cache.load_json(cache_file, default={}).get(name, {})
+    if key in cached:
+        _probed[key] = cached[key]
+        return cached[key]
+
+    available = _probe(name, cwd)
+    _probed[key] = available
+
+    # reload in case another process updated the cache while we were probing
+    all_cached = cache.load_json(cache_file, default={})
+    cached = all_cached.setdefault(name, {})
+    cached.pop(key, None)
+    cached[key] = available
+    # only keep the most recent results, so that the file does not grow forever
+    all_cached[name] = dict(list(cached.items())[-max_cached_keys:])
+    cache.dump_json(cache_file, all_cached)
+
+    return available
+
+
+def require_tool(name, cwd=None):
+    """
+    Raise an error if an external tool is not available.
+
+    Parameters
+    ----------
+    name : str
+        Name of the tool (one of the keys of ``probe_commands``).
+    cwd : `pathlib.Path`, optional
+        Directory in which the tool will be run (defaults to the current directory).
+
+    Raises
+    ------
+    RuntimeError
+        If the tool is not available.
+    """
+
+    if not has_tool(name, cwd=cwd):
+        raise RuntimeError(f"'{name}' is required, but it is not installed")
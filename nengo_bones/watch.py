@@ -0,0 +1,313 @@
+"""
+Watches files for changes.
+
+On Linux, changes are detected with inotify (through ``ctypes``, so that no extra
+dependencies are needed), which reports changes as soon as they happen without
+repeatedly scanning the filesystem. Elsewhere (or if inotify is not available),
+files are polled for changes to their modification times and sizes.
+"""
+
+import abc
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+# inotify event flags (see ``man inotify``)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Watcher(abc.ABC):
+    """
+    Watches a set of files and directories for changes.
+
+    Parameters
+    ----------
+    files : list of `pathlib.Path`
+        Files to watch (these do not need to exist).
+    directories : list of `pathlib.Path`
+        Directories to watch (these do not need to exist). Changes to any file
+        within them (including in subdirectories) are detected.
+    debounce : float
+        Time (in seconds) to wait for further changes after a change is
+        detected, so that files that are saved in several steps (or several files
+        that are saved at once) are reported together.
+
+    Attributes
+    ----------
+    files : set of `pathlib.Path`
+        Absolute paths of the watched files.
+    directories : set of `pathlib.Path`
+        Absolute paths of the watched directories.
+    debounce : float
+        Time to wait for further changes after a change is detected.
+    """
+
+    def __init__(self, files, directories, debounce=0.05):
+        self.files = {Path(p).resolve() for p in files}
+        self.directories = {Path(p).resolve() for p in directories}
+        self.debounce = debounce
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_watched(self, path):
+        """
+        Check whether a path is one of the watched files, or in a watched directory.
+
+        Parameters
+        ----------
+        path : `pathlib.Path`
+            Absolute path of a file or directory.
+
+        Returns
+        -------
+        watched : bool
+            True if changes to the path should be reported.
+        """
+        return path in self.files or any(
+            path == d or d in path.parents for d in self.directories
+        )
+
+    @abc.abstractmethod
+    def wait(self, timeout=None):
+        """
+        Wait for any of the watched files to change.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait (in seconds). If None, wait until something changes.
+
+        Returns
+        -------
+        changed : set of `pathlib.Path`
+            Paths of the files that changed (empty if the timeout expired first).
+        """
+
+    def close(self):
+        """Stop watching for changes."""
+
+
+class PollingWatcher(Watcher):
+    """
+    Watches files by polling their modification times and sizes.
+
+    Parameters
+    ----------
+    files : list of `pathlib.Path`
+        Files to watch (these do not need to exist).
+    directories : list of `pathlib.Path`
+        Directories to watch (these do not need to exist).
+    interval : float
+        Time (in seconds) between polls.
+    """
+
+    def __init__(self, files, directories, interval=0.2):
+        super().__init__(files, directories, debounce=interval)
+        self.interval = interval
+        self._state = self._snapshot()
+
+    def _snapshot(self):
+        paths = set(self.files)
+        for directory in self.directories:
+            for dirpath, _, filenames in os.walk(directory):
+                paths.update(Path(dirpath, name) for name in filenames)
+
+        state = {}
+        for path in paths:
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._snapshot()
+            changed = {
+                path
+                for path in set(state) | set(self._state)
+                if state.get(path) != self._state.get(path)
+            }
+            self._state = state
+            if len(changed) > 0:
+                return changed
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+
+class InotifyWatcher(Watcher):
+    """
+    Watches files using inotify (only available on Linux).
+
+    Parameters
+    ----------
+    files : list of `pathlib.Path`
+        Files to watch (these do not need to exist).
+    directories : list of `pathlib.Path`
+        Directories to watch (these do not need to exist).
+    debounce : float
+        Time to wait for further changes after a change is detected.
+
+    Raises
+    ------
+    OSError
+        If inotify is not available.
+    """
+
+    def __init__(self, files, directories, debounce=0.05):
+        super().__init__(files, directories, debounce=debounce)
+
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("Could not find the C library")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "Could not initialize inotify")
+        self._watches = {}
+
+        # we watch the parent directories, so that we see files being created,
+        # deleted or replaced (which is how many editors save files)
+        for path in self.files | self.directories:
+            self._add_watch(path.parent)
+        for directory in self.directories:
+            self._add_tree(directory)
+
+    def _add_watch(self, directory):
+        if directory in self._watches.values():
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_MASK)
+        if wd >= 0:
+            self._watches[wd] = directory
+
+    def _add_tree(self, directory):
+        for dirpath, _, _ in os.walk(directory):
+            self._add_watch(Path(dirpath))
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                # we missed some events, so assume everything changed
+                changed |= self.files | self.directories
+                continue
+            if mask & _IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches:
+                continue
+
+            path = self._watches[wd]
+            if len(name) > 0:
+                path = path / os.fsdecode(name)
+            if not self.is_watched(path):
+                continue
+
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                # watch new directories (and report the files already in them)
+                self._add_tree(path)
+                changed.update(p for p in path.rglob("*") if p.is_file())
+            changed.add(path)
+        return changed
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = set()
+        while True:
+            if len(changed) > 0:
+                # keep collecting changes until things have settled down
+                wait_time = self.debounce
+            elif deadline is None:
+                wait_time = None
+            else:
+                wait_time = max(deadline - time.monotonic(), 0)
+
+            ready, _, _ = select.select([self._fd], [], [], wait_time)
+            if ready:
+                changed |= self._read_events()
+            elif len(changed) > 0 or deadline is not None:
+                return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def watcher(files, directories):
+    """
+    Create a watcher for a set of files and directories.
+
+    Uses inotify (see `.InotifyWatcher`) if it is available, otherwise falls back
+    to polling (see `.PollingWatcher`).
+
+    Parameters
+    ----------
+    files : list of `pathlib.Path`
+        Files to watch (these do not need to exist).
+    directories : list of `pathlib.Path`
+        Directories to watch (these do not need to exist). Changes to any file
+        within them (including in subdirectories) are detected.
+
+    Returns
+    -------
+    watcher : `.Watcher`
+        The watcher.
+    """
+
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(files, directories)
+        except OSError:
+            pass
+    return PollingWatcher(files, directories)
@@ -33,6 +33,7 @@ install_req = [
     "codespell>=2.0.0",
     "docformatter==1.5.0",
     "flake8>=3.7.7",
+    "isort>=5.0.0",
     "jinja2>=2.11",
     "jupyter>=1.0.0",
     "pylint>=2.5.1",